@@ -2,10 +2,23 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import requests
 import json
+import os
+import time
+
+from cache_embeddings import CacheEmbeddings
+from encoders import criar_encoder
+from fontes_dados import resolver_fontes, sincronizar_fontes
+from ingestao import (
+    PROCESSED_DATA_FILE, carregar_fontes_em_memoria, criar_base_streaming, finalizar_base,
+    ler_base_processada, unificar_registros,
+)
+from compatibilidade import calcular_compatibilidade_lote, mascara_textos_validos
+from indice_ann import buscar_top_k, caminho_indice_para, carregar_indice, indice_compativel, indice_quantizado
+from inferencia import carregar_modelo, probabilidade_contratacao
+from matriz_vagas import COLUNAS_VAGA
+from quantizacao import FATOR_RESCORE
+from worker_analise import PoolAnalises, analisar_candidatos
 
 # Configuração inicial da página
 st.set_page_config(layout="wide", page_title="TalentMatch AI", page_icon="✨")
@@ -15,12 +28,10 @@ st.set_page_config(layout="wide", page_title="TalentMatch AI", page_icon="✨")
 # =============================================================================
 
 @st.cache_data(show_spinner=False, ttl=3600)
-def baixar_json_direto(url):
-    """Baixa JSON diretamente sem salvar arquivo"""
+def sincronizar_dados_brutos():
+    """Atualiza o cache local dos JSONs (só transfere o que mudou) e retorna os caminhos"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return sincronizar_fontes(resolver_fontes())
     except Exception as e:
         st.error(f"❌ ERRO ao baixar dados: {e}")
         return None
@@ -28,60 +39,42 @@ def baixar_json_direto(url):
 @st.cache_data(show_spinner=False)
 def carregar_dados_completos():
     """Carrega e processa todos os dados do Google Drive"""
-    # URLs do Google Drive
-    PROSPECTS_URL = "https://drive.google.com/uc?id=1f_NPd0qA0iqqo9Im9FfQi78esPOlf1Bu"
-    APPLICANTS_URL = "https://drive.google.com/uc?id=1jgiuRW402WUp-b5w1yE6nHrfR4KjFuzT"
-    VAGAS_URL = "https://drive.google.com/uc?id=1hmUUdyuAd9hoM84drSXJrQ8EbvFsPEDb"
+    TAMANHO_AMOSTRA = 5000
+    MODO_STREAMING = True
     
     with st.spinner("📥 Baixando dados do Google Drive..."):
-        prospects_data = baixar_json_direto(PROSPECTS_URL)
-        applicants_data = baixar_json_direto(APPLICANTS_URL)
-        vagas_data = baixar_json_direto(VAGAS_URL)
+        caminhos = sincronizar_dados_brutos()
     
-    if not all([prospects_data, applicants_data, vagas_data]):
+    if caminhos is None:
         st.error("❌ Falha no download de um ou mais arquivos.")
         return None
 
+    if MODO_STREAMING:
+        with st.spinner("🔄 Processando candidaturas..."):
+            return criar_base_streaming(caminhos, TAMANHO_AMOSTRA)
+
     with st.spinner("🔄 Processando candidaturas..."):
-        candidaturas_list = []
-        
-        for vaga_id, data in prospects_data.items():
-            for prospect in data.get('prospects', []):
-                candidato_id = str(prospect.get('codigo'))
-                applicant_details = applicants_data.get(candidato_id, {})
-                vaga_details = vagas_data.get(vaga_id, {})
-                
-                infos_basicas = applicant_details.get('infos_basicas', {})
-                nome_candidato = infos_basicas.get('nome')
-
-                candidaturas_list.append({
-                    'candidato_id': candidato_id,
-                    'vaga_id': vaga_id,
-                    'situacao_candidado': prospect.get('situacao_candidado'),
-                    'candidato_nome': nome_candidato,
-                    'candidato_cv': applicant_details.get('cv_pt'),
-                    'vaga_titulo': vaga_details.get('informacoes_basicas', {}).get('titulo_vaga'),
-                    'vaga_competencias': vaga_details.get('perfil_vaga', {}).get('competencia_tecnicas_e_comportamentais'),
-                })
-                
-        df_final = pd.DataFrame(candidaturas_list)
-        
-        # Aplicar amostragem se necessário
-        TAMANHO_AMOSTRA = 5000
-        if TAMANHO_AMOSTRA and len(df_final) > TAMANHO_AMOSTRA:
-            df_final = df_final.sample(n=TAMANHO_AMOSTRA, random_state=42)
-        
-        # Limpeza final
-        for col in df_final.columns:
-            if df_final[col].dtype == 'object':
-                df_final[col] = df_final[col].fillna('Não informado')
+        prospects_data, applicants_data, vagas_data = carregar_fontes_em_memoria(caminhos)
+        df_final = unificar_registros(prospects_data, applicants_data, vagas_data)
+        # Amostragem (se necessário) e limpeza final
+        df_final = finalizar_base(df_final, TAMANHO_AMOSTRA)
     
     return df_final
 
+@st.cache_data(show_spinner=False)
+def carregar_base_processada():
+    """Lê o parquet gerado por `python preprocess.py` (None se ainda não existir)"""
+    if not os.path.exists(PROCESSED_DATA_FILE):
+        return None
+    return finalizar_base(ler_base_processada(PROCESSED_DATA_FILE))
+
 def carregar_dados():
     """Função principal para carregar dados"""
     if 'dados_processados' not in st.session_state:
-        df = carregar_dados_completos()
+        # Preferir a base pré-processada; sem ela, montar a partir dos JSONs
+        df = carregar_base_processada()
+        if df is None:
+            df = carregar_dados_completos()
         if df is not None:
             st.session_state.dados_processados = df
             return df
@@ -95,14 +88,89 @@ def carregar_dados():
 
 @st.cache_resource
 def carregar_encoder():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    """Encoder no backend configurado (TALENTMATCH_ENCODER_BACKEND)"""
+    return criar_encoder()
+
+@st.cache_resource
+def carregar_cache_embeddings():
+    """Cache persistente de embeddings, compartilhado entre sessões e reinícios"""
+    return CacheEmbeddings()
+
+@st.cache_resource
+def carregar_indice_candidatos():
+    """Índice aproximado da base completa, carregado uma vez por processo.
+
+    None se ainda não existir ou se foi gerado com outro encoder/backend (vetores incomparáveis).
+    """
+    caminho = caminho_indice_para(PROCESSED_DATA_FILE)
+    if not os.path.exists(caminho):
+        return None
+    indice = carregar_indice(caminho)
+    if not indice_compativel(indice, carregar_cache_embeddings().identificador):
+        return None
+    return indice
+
+@st.cache_resource
+def carregar_pool_analises():
+    """Pool de análises em segundo plano, único no processo (compartilhado entre sessões)"""
+    return PoolAnalises()
+
+@st.cache_resource
+def carregar_modelo_contratacao():
+    """Modelo de contratação do train_model.py (None se ausente ou treinado com outras features)"""
+    return carregar_modelo(carregar_encoder().get_sentence_embedding_dimension(), carregar_cache_embeddings().identificador)
+
+def calcular_compatibilidade(texto_vaga, cvs):
+    """Calcula a compatibilidade entre a vaga e todos os CVs de uma vez"""
+    return calcular_compatibilidade_lote(text_encoder, cache_embeddings, texto_vaga, cvs)
+
+def buscar_na_base_completa(texto_vaga, df_base, k=50):
+    """Busca os candidatos mais compatíveis com a vaga em toda a base (índice aproximado)"""
+    df_candidatos = df_base.drop_duplicates('candidato_id').set_index('candidato_id')
+    if not mascara_textos_validos([texto_vaga])[0]:
+        return df_candidatos.iloc[0:0].reset_index().assign(compatibilidade=0.0)
+
+    vetor_vaga = cache_embeddings.codificar(text_encoder, [texto_vaga])[0]
+    quantizado = indice_quantizado(indice_candidatos)
+    ids, scores = buscar_top_k(indice_candidatos, vetor_vaga, k=k * FATOR_RESCORE if quantizado else k)
+    
+    # O índice é construído offline: ignorar candidatos que não estão na base carregada
+    encontrados = pd.Series(scores, index=ids)
+    encontrados = encontrados[encontrados.index.isin(df_candidatos.index)]
+    df_resultado = df_candidatos.loc[encontrados.index].reset_index()
+    df_resultado['compatibilidade'] = encontrados.to_numpy()
+    if quantizado:
+        # Scores do índice são aproximados: reordenar pelo cosseno exato (vetores float32 do cache)
+        df_resultado['compatibilidade'] = calcular_compatibilidade(texto_vaga, df_resultado['candidato_cv'])
+        df_resultado = df_resultado.sort_values('compatibilidade', ascending=False, kind='stable').head(k).reset_index(drop=True)
+    return df_resultado
+
+def analisar_base_completa(tarefa, vaga, df_base):
+    """Tarefa do pool: melhores candidatos de toda a base para a vaga (dict com as COLUNAS_VAGA)"""
+    tarefa.verificar_cancelamento()
+    df_vaga = buscar_na_base_completa(vaga['vaga_competencias'], df_base, k=TOP_K_BASE_COMPLETA)
+    # As linhas vêm de candidaturas a outras vagas: as features do modelo devem usar a vaga analisada
+    df_vaga = df_vaga.assign(**vaga)
+    if len(df_vaga) > 0 and modelo_contratacao is not None:
+        df_vaga['probabilidade_contratacao'] = probabilidade_contratacao(
+            modelo_contratacao, text_encoder, cache_embeddings, df_vaga
+        )
+    tarefa.avancar(1, df_vaga)
+    return df_vaga
+
+def descartar_resultados_parciais():
+    """Resultados parciais de uma análise que não vai terminar não devem ficar na tela"""
+    resultados = st.session_state.get('resultados_analise')
+    if resultados is not None and resultados.get('parcial'):
+        st.session_state.resultados_analise = None
 
-def calcular_compatibilidade(texto_vaga, texto_cv):
-    """Calcula compatibilidade entre vaga e CV usando embeddings"""
-    if not isinstance(texto_vaga, str) or not isinstance(texto_cv, str) or not texto_vaga or not texto_cv:
-        return 0.0
-    embeddings = text_encoder.encode([texto_vaga, texto_cv])
-    return cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
+def cancelar_analise_em_andamento():
+    """Desiste da análise desta sessão (outras sessões com o mesmo pedido continuam recebendo)"""
+    analise = st.session_state.get('analise_em_andamento')
+    if analise is not None:
+        pool_analises.cancelar(analise['id'])
+        st.session_state.analise_em_andamento = None
+        descartar_resultados_parciais()
 
 # =============================================================================
 # INTERFACE PRINCIPAL
@@ -121,6 +189,10 @@ st.sidebar.header("📊 Estatísticas da Base")
 # Carregar dados
 df_completo = carregar_dados()
 text_encoder = carregar_encoder()
+cache_embeddings = carregar_cache_embeddings()
+indice_candidatos = carregar_indice_candidatos()
+modelo_contratacao = carregar_modelo_contratacao()
+pool_analises = carregar_pool_analises()
 
 # Inicializar estados da sessão
 if 'pagina_atual_analise' not in st.session_state:
@@ -129,7 +201,14 @@ if 'pagina_atual_analise' not in st.session_state:
 if 'resultados_analise' not in st.session_state:
     st.session_state.resultados_analise = None
 
+if 'analise_em_andamento' not in st.session_state:
+    st.session_state.analise_em_andamento = None
+
 ITENS_POR_PAGINA_ANALISE = 10
+INTERVALO_ATUALIZACAO = 0.5
+TOP_K_BASE_COMPLETA = 50
+MODO_CANDIDATOS_VAGA = "Candidatos da vaga"
+MODO_BASE_COMPLETA = "Toda a base de candidatos"
 
 # =============================================================================
 # SEÇÃO PRINCIPAL DE ANÁLISE
@@ -185,6 +264,7 @@ if df_completo is not None:
             st.write("")  
             st.write("")  
             if st.button("🗑️ Limpar Buscas", use_container_width=True):
+                cancelar_analise_em_andamento()
                 st.session_state.reset_count = reset_key_suffix + 1
                 st.session_state.resultados_analise = None
                 st.session_state.pagina_atual_analise = 1
@@ -208,6 +288,18 @@ if df_completo is not None:
             if st.session_state.resultados_analise is None:
                 st.warning("⚠️ Selecione pelo menos um critério de busca (título ou ID da vaga)")
         
+        # Escopo da análise
+        modo_analise = st.radio(
+            'Escopo da análise',
+            options=[MODO_CANDIDATOS_VAGA, MODO_BASE_COMPLETA],
+            horizontal=True,
+            help="Analisar apenas quem se candidatou à vaga ou buscar os melhores candidatos em toda a base",
+            key=f'modo_analise_{reset_key_suffix}'
+        )
+        if modo_analise == MODO_BASE_COMPLETA and indice_candidatos is None:
+            st.warning("⚠️ Índice da base completa não encontrado ou gerado com outro encoder. Execute 'python indice_ann.py' primeiro.")
+            vaga_para_analise = None
+        
         # Botão de análise
         col_analise1, col_analise2 = st.columns([3, 1])
         with col_analise1:
@@ -225,28 +317,64 @@ if df_completo is not None:
                     st.warning("Nenhum candidato com nome informado para esta vaga.")
                     st.session_state.resultados_analise = None
                 else:
-                    with st.spinner("Analisando currículos com IA... Isso pode levar um momento."):
-                        texto_vaga_base = df_vaga['vaga_competencias'].iloc[0] if 'vaga_competencias' in df_vaga.columns else ""
-                        df_vaga['compatibilidade'] = df_vaga['candidato_cv'].apply(
-                            lambda cv: calcular_compatibilidade(texto_vaga_base, cv)
+                    # A análise roda no pool do processo: interações com a página não a interrompem
+                    cancelar_analise_em_andamento()
+                    texto_vaga_base = df_vaga['vaga_competencias'].iloc[0] if 'vaga_competencias' in df_vaga.columns else ""
+                    chave = (modo_analise, tipo_busca, vaga_para_analise, len(df_com_nome))
+                    if modo_analise == MODO_BASE_COMPLETA:
+                        vaga = df_vaga[COLUNAS_VAGA].iloc[0].to_dict()
+                        tarefa = pool_analises.submeter(chave, 1, analisar_base_completa, vaga, df_com_nome)
+                    else:
+                        tarefa = pool_analises.submeter(
+                            chave, len(df_vaga), analisar_candidatos,
+                            df_vaga, texto_vaga_base, text_encoder, cache_embeddings, modelo_contratacao
                         )
-                        df_vaga = df_vaga.sort_values('compatibilidade', ascending=False)
-                    
-                    st.session_state.resultados_analise = {
-                        'df_vaga': df_vaga,
+                    st.session_state.analise_em_andamento = {
+                        'id': tarefa.id,
                         'titulo_vaga': titulo_vaga,
                         'tipo_busca': tipo_busca
                     }
+                    st.session_state.resultados_analise = None
                     st.session_state.pagina_atual_analise = 1
                     st.rerun()
         
         with col_analise2:
             if st.session_state.resultados_analise is not None:
                 if st.button("🔄 Nova Análise", use_container_width=True):
+                    cancelar_analise_em_andamento()
                     st.session_state.resultados_analise = None
                     st.session_state.pagina_atual_analise = 1
                     st.rerun()
         
+        # Acompanhar a análise em segundo plano
+        analise = st.session_state.analise_em_andamento
+        if analise is not None:
+            tarefa = pool_analises.obter(analise['id'])
+            if tarefa is None or tarefa.estado == "cancelada":
+                st.session_state.analise_em_andamento = None
+                descartar_resultados_parciais()
+            elif tarefa.estado == "erro":
+                st.error(f"❌ Erro na análise: {tarefa.erro}")
+                st.session_state.analise_em_andamento = None
+                descartar_resultados_parciais()
+            elif tarefa.ativa:
+                col_progresso, col_cancelar = st.columns([3, 1])
+                with col_progresso:
+                    st.progress(tarefa.progresso, text=f"Analisando currículos com IA... {tarefa.concluidos}/{tarefa.total}")
+                with col_cancelar:
+                    if st.button("⏹️ Cancelar Análise", use_container_width=True):
+                        cancelar_analise_em_andamento()
+                        st.rerun()
+                if tarefa.parcial is not None and len(tarefa.parcial) > 0:
+                    st.session_state.resultados_analise = {**analise, 'df_vaga': tarefa.parcial, 'parcial': True}
+            else:
+                st.session_state.analise_em_andamento = None
+                if len(tarefa.resultado) == 0:
+                    st.warning("Esta vaga não tem competências informadas para comparar com a base.")
+                    st.session_state.resultados_analise = None
+                else:
+                    st.session_state.resultados_analise = {**analise, 'df_vaga': tarefa.resultado}
+        
         # Exibir resultados
         if st.session_state.resultados_analise is not None:
             resultados = st.session_state.resultados_analise
@@ -254,6 +382,11 @@ if df_completo is not None:
             titulo_vaga = resultados['titulo_vaga']
             
             st.subheader(f"Resultados para: {titulo_vaga}")
+            if resultados.get('parcial'):
+                st.caption("⏳ Resultados parciais: a lista é atualizada enquanto a análise continua.")
+            if 'probabilidade_contratacao' not in df_vaga.columns:
+                st.info("ℹ️ Probabilidade de contratação indisponível: nenhum modelo treinado com as features e o "
+                        "encoder atuais. Execute 'python train_model.py' e reinicie o app para exibi-la.")
             
             # Métricas
             col1, col2, col3 = st.columns(3)
@@ -320,6 +453,8 @@ if df_completo is not None:
                             st.metric("Compatibilidade", f"{score_percent:.1f}%", "Média", delta_color="off")
                         else:
                             st.metric("Compatibilidade", f"{score_percent:.1f}%", "Baixa", delta_color="off")
+                        if 'probabilidade_contratacao' in candidato:
+                            st.caption(f"🎯 Prob. de contratação: {candidato['probabilidade_contratacao'] * 100:.1f}%")
                     
                     with st.expander("📄 Ver detalhes completos"):
                         st.write(f"**ID do Candidato:** {candidato.get('candidato_id', 'N/A')}")
@@ -327,7 +462,7 @@ if df_completo is not None:
                         st.write(f"**Situação:** {situacao}")
                         
                         cv_preview = candidato.get('candidato_cv', '')
-                        if cv_preview and cv_preview != 'Não informado':
+                        if isinstance(cv_preview, str) and cv_preview and cv_preview != 'Não informado':
                             st.write("**Currículo Completo:**")
                             st.text_area(
                                 "Conteúdo do CV:",
@@ -346,3 +481,8 @@ if df_completo is not None:
 
 else:
     st.error("❌ Não foi possível carregar os dados. Verifique a conexão com a internet.")
+
+# Análise em segundo plano: atualizar a página até a tarefa terminar
+if st.session_state.analise_em_andamento is not None:
+    time.sleep(INTERVALO_ATUALIZACAO)
+    st.rerun()
@@ -0,0 +1,124 @@
+# agendador_lotes.py
+# Lotes de codificação por orçamento de tokens: textos de tamanho parecido juntos, menos padding.
+import argparse
+import time
+
+import numpy as np
+
+# CONFIGURAÇÕES
+# Tokens (com padding) por lote: 64 CVs no tamanho máximo do MiniLM (256 tokens)
+ORCAMENTO_TOKENS = 16384
+MAX_TEXTOS_LOTE = 256
+LOTE_TOKENIZACAO = 1024
+AMOSTRA_BENCHMARK = 2000
+RANDOM_STATE = 42
+
+
+def comprimentos_tokens(encoder, textos):
+    """Tokens de cada texto após o truncamento do encoder (sem tokenizer: estimativa por palavras)"""
+    tokenizer = getattr(encoder, "tokenizer", None)
+    limite = getattr(encoder, "max_seq_length", None)
+    if tokenizer is None:
+        comprimentos = np.array([len(texto.split()) + 2 for texto in textos], dtype=np.int64)
+        return np.minimum(comprimentos, limite) if limite else comprimentos
+
+    comprimentos = np.empty(len(textos), dtype=np.int64)
+    for inicio in range(0, len(textos), LOTE_TOKENIZACAO):
+        trecho = textos[inicio:inicio + LOTE_TOKENIZACAO]
+        ids = tokenizer(trecho, truncation=limite is not None, max_length=limite)["input_ids"]
+        comprimentos[inicio:inicio + len(trecho)] = [len(tokens) for tokens in ids]
+    return comprimentos
+
+
+def montar_lotes(comprimentos, orcamento_tokens=ORCAMENTO_TOKENS, max_textos=MAX_TEXTOS_LOTE):
+    """Posições dos textos agrupadas em lotes, do mais longo ao mais curto.
+
+    Cada lote custa (textos no lote) x (maior comprimento do lote), que é o
+    tamanho do tensor com padding; um lote recebe textos enquanto esse custo
+    cabe no orçamento. Um texto sozinho sempre forma um lote.
+    """
+    ordem = np.argsort(-np.asarray(comprimentos), kind="stable")
+    lotes = []
+    inicio = 0
+    while inicio < len(ordem):
+        # Ordem decrescente: o primeiro texto do lote é o mais longo
+        maior = max(int(comprimentos[ordem[inicio]]), 1)
+        tamanho = max(1, min(max_textos, orcamento_tokens // maior))
+        lotes.append(ordem[inicio:inicio + tamanho])
+        inicio += tamanho
+    return lotes
+
+
+def custo_com_padding(comprimentos, lotes):
+    """Total de posições de token processadas (reais + padding)"""
+    return int(sum(len(lote) * comprimentos[lote].max() for lote in lotes if len(lote)))
+
+
+def codificar_agendado(encoder, textos, orcamento_tokens=ORCAMENTO_TOKENS, max_textos=MAX_TEXTOS_LOTE,
+                       normalize_embeddings=True, mostrar_progresso=False):
+    """Embeddings float32 dos textos, na ordem de entrada, codificados em lotes por orçamento de tokens"""
+    textos = [str(texto) for texto in textos]
+    if not textos:
+        return np.zeros((0, encoder.get_sentence_embedding_dimension()), dtype=np.float32)
+    lotes = montar_lotes(comprimentos_tokens(encoder, textos), orcamento_tokens, max_textos)
+    if mostrar_progresso:
+        from tqdm.auto import tqdm
+
+        lotes = tqdm(lotes, desc="Codificando", unit="lote")
+
+    vetores = None
+    for lote in lotes:
+        codificados = encoder.encode(
+            [textos[i] for i in lote], batch_size=len(lote),
+            normalize_embeddings=normalize_embeddings, show_progress_bar=False,
+        )
+        codificados = np.asarray(codificados, dtype=np.float32)
+        if vetores is None:
+            vetores = np.empty((len(textos), codificados.shape[1]), dtype=np.float32)
+        vetores[lote] = codificados
+    return vetores
+
+
+def main(argv=None):
+    from cache_embeddings import BATCH_SIZE_ENCODE
+    from compatibilidade import mascara_textos_validos
+    from encoders import criar_encoder
+    from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+
+    parser = argparse.ArgumentParser(description="Compara lotes de tamanho fixo com lotes por orçamento de tokens.")
+    parser.add_argument('--base', default=PROCESSED_DATA_FILE, help="Parquet processado (fonte dos CVs)")
+    parser.add_argument('--amostra', type=int, default=AMOSTRA_BENCHMARK, help="Número de CVs sorteados")
+    parser.add_argument('--orcamento', type=int, default=ORCAMENTO_TOKENS, help="Tokens (com padding) por lote")
+    args = parser.parse_args(argv)
+
+    cvs = ler_base_processada(args.base, colunas=["candidato_cv"])["candidato_cv"].astype(object).dropna().unique()
+    cvs = cvs[mascara_textos_validos(cvs)]
+    rng = np.random.default_rng(RANDOM_STATE)
+    cvs = cvs[rng.choice(len(cvs), min(args.amostra, len(cvs)), replace=False)].tolist()
+    encoder = criar_encoder()
+
+    comprimentos = comprimentos_tokens(encoder, cvs)
+    limite = getattr(encoder, "max_seq_length", None)
+    # O encode do SentenceTransformer ordena por número de caracteres e usa lotes de tamanho fixo
+    por_caracteres = np.argsort([-len(cv) for cv in cvs], kind="stable")
+    lotes_fixos = [por_caracteres[i:i + BATCH_SIZE_ENCODE] for i in range(0, len(cvs), BATCH_SIZE_ENCODE)]
+    lotes_orcamento = montar_lotes(comprimentos, args.orcamento)
+    reais = int(comprimentos.sum())
+
+    inicio = time.perf_counter()
+    encoder.encode(cvs, batch_size=BATCH_SIZE_ENCODE, normalize_embeddings=True, show_progress_bar=False)
+    tempo_fixo = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    codificar_agendado(encoder, cvs, args.orcamento)
+    tempo_agendado = time.perf_counter() - inicio
+
+    print(f"{len(cvs)} CVs, {reais} tokens; {int((comprimentos >= limite).sum()) if limite else 0} truncados em {limite} tokens.\n")
+    for nome, lotes, tempo in [(f"Lotes fixos ({BATCH_SIZE_ENCODE})", lotes_fixos, tempo_fixo),
+                               (f"Orçamento ({args.orcamento} tokens)", lotes_orcamento, tempo_agendado)]:
+        custo = custo_com_padding(comprimentos, lotes)
+        print(f"{nome:<28} {len(lotes):>5} lotes  padding {1 - reais / custo:>6.1%}  {len(cvs) / tempo:>8.1f} CVs/s")
+    print(f"\nSpeedup: {tempo_fixo / tempo_agendado:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# agregados.py
+# Cubo de contagens (vaga x situação x dimensão do perfil) para o painel dos contratados.
+import os
+
+import numpy as np
+import pandas as pd
+
+from compatibilidade import VALOR_NAO_INFORMADO
+
+# CONFIGURAÇÕES
+SUFIXO_AGREGADOS = ".agregados.parquet"
+CHAVES_CUBO = ['vaga_titulo', 'situacao_candidado']
+COLUNAS_CUBO = CHAVES_CUBO + ['dimensao', 'valor', 'contagem']
+DIMENSOES_PERFIL = ['anos_experiencia', 'nivel_ingles', 'nivel_formacao']
+COLUNAS_ORIGEM = CHAVES_CUBO + DIMENSOES_PERFIL + ['competencias_mascara']
+
+
+def caminho_agregados_para(caminho_parquet):
+    """Caminho do cubo gravado ao lado do parquet processado"""
+    raiz, _ = os.path.splitext(caminho_parquet)
+    return raiz + SUFIXO_AGREGADOS
+
+
+def construir_cubo(df, nomes_competencias):
+    """Contagens por (vaga, situação, dimensão, valor); perfis não especificados ficam de fora.
+
+    A dimensão 'total' conta as candidaturas e 'competencia' conta os CVs com cada competência.
+    """
+    chaves = df[CHAVES_CUBO].astype(object).fillna(VALOR_NAO_INFORMADO)
+    partes = []
+
+    total = chaves.groupby(CHAVES_CUBO).size().rename('contagem').reset_index()
+    partes.append(total.assign(dimensao='total', valor=''))
+
+    for dimensao in DIMENSOES_PERFIL:
+        valores = df[dimensao].astype(object)
+        validos = valores.notna().to_numpy()
+        grupo = chaves[validos].assign(valor=valores[validos].astype(str))
+        contagem = grupo.groupby(CHAVES_CUBO + ['valor']).size().rename('contagem').reset_index()
+        partes.append(contagem.assign(dimensao=dimensao))
+
+    # Um bit por competência: soma das colunas de bits dentro de cada grupo
+    mascaras = df['competencias_mascara'].to_numpy(dtype=np.uint64)
+    bits = {
+        nome: (mascaras & np.uint64(1 << indice)) != 0
+        for indice, nome in enumerate(nomes_competencias)
+    }
+    if bits:
+        somas = pd.DataFrame(bits, index=chaves.index).groupby([chaves[c] for c in CHAVES_CUBO]).sum()
+        competencias = somas.stack().reset_index()
+        competencias.columns = CHAVES_CUBO + ['valor', 'contagem']
+        partes.append(competencias[competencias['contagem'] > 0].assign(dimensao='competencia'))
+
+    cubo = pd.concat(partes, ignore_index=True)[COLUNAS_CUBO]
+    cubo['contagem'] = cubo['contagem'].astype(np.int64)
+    for coluna in ['vaga_titulo', 'situacao_candidado', 'dimensao']:
+        cubo[coluna] = cubo[coluna].astype('category')
+    return cubo
+
+
+def gravar_cubo(cubo, caminho):
+    temporario = caminho + '.tmp'
+    cubo.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def carregar_cubo(caminho):
+    return pd.read_parquet(caminho)
+
+
+def contagem_por_situacao(cubo, vaga_titulo=None):
+    """Número de candidaturas por situação (opcionalmente de uma vaga), em ordem decrescente"""
+    recorte = cubo[cubo['dimensao'] == 'total']
+    if vaga_titulo is not None:
+        recorte = recorte[recorte['vaga_titulo'] == vaga_titulo]
+    contagem = recorte.groupby('situacao_candidado', observed=True)['contagem'].sum()
+    return contagem[contagem > 0].sort_values(ascending=False, kind='stable')
+
+
+def resumir(cubo, vaga_titulo=None, situacoes=None):
+    """Contagens de cada dimensão no recorte pedido: {dimensão: Series valor -> contagem}"""
+    recorte = cubo
+    if vaga_titulo is not None:
+        recorte = recorte[recorte['vaga_titulo'] == vaga_titulo]
+    if situacoes is not None:
+        recorte = recorte[recorte['situacao_candidado'].isin(situacoes)]
+    somas = recorte.groupby(['dimensao', 'valor'], observed=True)['contagem'].sum()
+    resumo = {dimensao: pd.Series(dtype=np.int64) for dimensao in ['total', 'competencia'] + DIMENSOES_PERFIL}
+    for dimensao, contagens in somas.groupby(level='dimensao', observed=True):
+        resumo[dimensao] = contagens.droplevel('dimensao')
+    return resumo
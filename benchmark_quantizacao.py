@@ -0,0 +1,94 @@
+# benchmark_quantizacao.py
+# Compara float32, float16 e int8 nos embeddings dos CVs da base: memória, tempo por consulta e sobreposição do top-K.
+import argparse
+import time
+
+import numpy as np
+
+from cache_embeddings import CacheEmbeddings
+from compatibilidade import mascara_textos_validos
+from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+from quantizacao import FATOR_RESCORE, TIPOS_QUANTIZACAO, pontuar, quantizar, reordenar_exato, top_k
+
+# CONFIGURAÇÕES
+N_CONSULTAS = 200
+TOP_K = 50
+REPETICOES = 3
+RANDOM_STATE = 42
+
+
+def carregar_vetores(caminho=PROCESSED_DATA_FILE, n_consultas=N_CONSULTAS):
+    """(vetores dos CVs distintos, vetores de uma amostra das vagas) via cache de embeddings"""
+    from encoders import criar_encoder
+
+    df = ler_base_processada(caminho, colunas=["candidato_cv", "vaga_competencias"])
+    cvs = df["candidato_cv"].astype(object).dropna().unique()
+    cvs = cvs[mascara_textos_validos(cvs)]
+    vagas = df["vaga_competencias"].astype(object).dropna().unique()
+    vagas = vagas[mascara_textos_validos(vagas)]
+    rng = np.random.default_rng(RANDOM_STATE)
+    vagas = vagas[rng.choice(len(vagas), min(n_consultas, len(vagas)), replace=False)]
+
+    encoder = criar_encoder()
+    cache = CacheEmbeddings()
+    return cache.codificar(encoder, cvs.tolist()), cache.codificar(encoder, vagas.tolist())
+
+
+def medir(funcao, consultas, repeticoes=REPETICOES):
+    """Resultados da função para cada consulta + melhor tempo médio por consulta (ms)"""
+    melhor = np.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultados = [funcao(consulta) for consulta in consultas]
+        melhor = min(melhor, (time.perf_counter() - inicio) / len(consultas))
+    return resultados, melhor * 1000
+
+
+def sobreposicao(referencia, resultado):
+    """Fração média do top-K float32 recuperada"""
+    return float(np.mean([len(np.intersect1d(r, x)) / len(r) for r, x in zip(referencia, resultado) if len(r)]))
+
+
+def comparar(vetores, consultas, k=TOP_K, fator_rescore=FATOR_RESCORE):
+    """Uma linha de resultados por tipo de quantização (e por tipo com reordenação exata)"""
+    referencia, tempo_base = medir(lambda q: top_k(vetores @ q, k), consultas)
+    linhas = []
+    for tipo in TIPOS_QUANTIZACAO:
+        codigos, escalas = quantizar(vetores, tipo)
+        memoria = codigos.nbytes + (escalas.nbytes if escalas is not None else 0)
+        aproximados, tempo = medir(lambda q: top_k(pontuar(codigos, escalas, q), k), consultas)
+        linhas.append((tipo, memoria, tempo, sobreposicao(referencia, aproximados)))
+        if tipo == "float32":
+            continue
+
+        def com_rescore(q):
+            candidatos = top_k(pontuar(codigos, escalas, q), k * fator_rescore)
+            return reordenar_exato(candidatos, vetores[candidatos], q, k)[0]
+
+        reordenados, tempo = medir(com_rescore, consultas)
+        linhas.append((f"{tipo} + rescore", memoria, tempo, sobreposicao(referencia, reordenados)))
+    return tempo_base, linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da quantização dos embeddings dos CVs.")
+    parser.add_argument('--base', default=PROCESSED_DATA_FILE, help="Parquet processado")
+    parser.add_argument('--consultas', type=int, default=N_CONSULTAS, help="Número de vagas usadas como consulta")
+    parser.add_argument('--k', type=int, default=TOP_K, help="Tamanho do top-K comparado")
+    args = parser.parse_args(argv)
+
+    print(f"A carregar embeddings de '{args.base}' (apenas os ausentes do cache são codificados)...")
+    vetores, consultas = carregar_vetores(args.base, args.consultas)
+    print(f"{len(vetores)} CVs distintos x {vetores.shape[1]} dimensões, {len(consultas)} consultas, top-{args.k}.\n")
+
+    tempo_base, linhas = comparar(vetores, consultas, args.k)
+    memoria_base = vetores.nbytes
+    print(f"{'Armazenamento':<18}{'Memória (MB)':>14}{'Economia':>10}{'ms/consulta':>13}{'Speedup':>9}{'Top-K igual':>13}")
+    for tipo, memoria, tempo, taxa in linhas:
+        print(f"{tipo:<18}{memoria / 1e6:>14.1f}{1 - memoria / memoria_base:>10.0%}"
+              f"{tempo:>13.2f}{tempo_base / tempo:>8.2f}x{taxa:>13.1%}")
+    print(f"\nReferência: produto float32 sem blocos, {tempo_base:.2f} ms/consulta.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# busca_hibrida.py
+# Busca híbrida: ranking léxico (BM25) + similaridade semântica dos CVs, fundidos por RRF.
+from functools import lru_cache
+
+import numpy as np
+
+from cache_embeddings import normalizar_texto
+from indice_busca import CAMPO_RELEVANCIA
+
+# CONFIGURAÇÕES
+TAMANHO_CACHE_CONSULTAS = 256
+CONSTANTE_RRF = 60
+CANDIDATOS_POR_RANKING = 1000
+LIMITE_HIBRIDO = 500
+
+
+class CodificadorConsultas:
+    """Embeddings de consultas com cache LRU: a mesma busca não volta ao encoder"""
+
+    def __init__(self, encoder, tamanho_cache=TAMANHO_CACHE_CONSULTAS):
+        self.encoder = encoder
+        self._vetor = lru_cache(maxsize=tamanho_cache)(self._codificar)
+
+    def _codificar(self, texto):
+        vetor = self.encoder.encode([texto], normalize_embeddings=True)[0]
+        vetor = np.asarray(vetor, dtype=np.float32)
+        vetor.flags.writeable = False
+        return vetor
+
+    def vetor(self, texto):
+        return self._vetor(normalizar_texto(texto))
+
+
+def construir_matriz_cvs(indice_busca, cache):
+    """(matriz, faltantes): embeddings dos CVs do índice já presentes no cache + quantos CVs não têm vetor.
+
+    As linhas seguem os IDs dos valores distintos do campo do CV; textos inválidos
+    e CVs fora do cache ficam com vetor zero. Nada é codificado aqui: o cache é
+    preenchido offline (codificacao_paralela.py, indice_ann.py ou train_model.py).
+    """
+    campo = indice_busca.campos[CAMPO_RELEVANCIA]
+    validos = np.flatnonzero(campo.validos)
+    linhas = cache.linhas_de(campo.valores[validos].tolist())
+    presentes = linhas >= 0
+    dimensao = cache.matriz.shape[1] if presentes.any() else 0
+    matriz = np.zeros((len(campo.valores), dimensao), dtype=np.float32)
+    if presentes.any():
+        matriz[validos[presentes]] = cache.matriz[linhas[presentes]]
+    return matriz, int(np.count_nonzero(~presentes))
+
+
+def fundir_rrf(rankings, constante=CONSTANTE_RRF):
+    """Reciprocal rank fusion: soma de 1 / (constante + posição) de cada linha em cada ranking"""
+    linhas = np.unique(np.concatenate(rankings)) if rankings else np.zeros(0, dtype=np.int64)
+    scores = np.zeros(len(linhas), dtype=np.float64)
+    for ranking in rankings:
+        scores[np.searchsorted(linhas, ranking)] += 1.0 / (constante + 1 + np.arange(len(ranking)))
+    ordem = np.lexsort((linhas, -scores))
+    return linhas[ordem], scores[ordem]
+
+
+def ranking_semantico(indice_busca, matriz_cvs, vetor_consulta, limite=CANDIDATOS_POR_RANKING):
+    """Linhas dos CVs mais próximos da consulta (cosseno), melhores primeiro"""
+    campo = indice_busca.campos[CAMPO_RELEVANCIA]
+    codigos = campo.codigos
+    limite = min(limite, int(np.count_nonzero(campo.validos)))
+    if limite == 0:
+        return np.zeros(0, dtype=np.int64)
+    scores = np.where(campo.validos, matriz_cvs @ vetor_consulta, -np.inf)
+    melhores = np.argpartition(-scores, limite - 1)[:limite]
+    melhores = melhores[np.argsort(-scores[melhores], kind="stable")]
+
+    # Cada CV pode estar em várias candidaturas: todas herdam a posição do texto
+    posicao = np.full(len(scores) + 1, len(melhores), dtype=np.int64)
+    posicao[melhores] = np.arange(len(melhores))
+    posicao_linhas = posicao[codigos]
+    linhas = np.flatnonzero(posicao_linhas < len(melhores))
+    return linhas[np.argsort(posicao_linhas[linhas], kind="stable")]
+
+
+def buscar_hibrido(indice_busca, matriz_cvs, vetor_consulta, keywords, estrito=False, limite=LIMITE_HIBRIDO):
+    """Funde o ranking BM25 das keywords com o ranking semântico da consulta.
+
+    Retorna (linhas, scores, flags, matches) no formato de IndiceBusca.ranquear:
+    linhas vindas só do ranking semântico têm flags e matches zerados. No modo
+    estrito ficam apenas as linhas que passam pelo filtro das keywords.
+    """
+    lexicas, _, flags_lexicas, matches_lexicas, _ = indice_busca.ranquear(
+        keywords, estrito=estrito, limite=CANDIDATOS_POR_RANKING
+    )
+    semanticas = ranking_semantico(indice_busca, matriz_cvs, vetor_consulta)
+    linhas, scores = fundir_rrf([lexicas, semanticas])
+
+    # Posição de cada linha no ranking léxico (-1 quando veio só do semântico)
+    posicao_lexica = np.full(len(indice_busca.campos[CAMPO_RELEVANCIA].codigos), -1, dtype=np.int64)
+    posicao_lexica[lexicas] = np.arange(len(lexicas))
+    posicoes = posicao_lexica[linhas]
+    if estrito:
+        linhas, scores, posicoes = linhas[posicoes >= 0], scores[posicoes >= 0], posicoes[posicoes >= 0]
+    linhas, scores, posicoes = linhas[:limite], scores[:limite], posicoes[:limite]
+
+    presentes = posicoes >= 0
+    flags = np.zeros(len(linhas), dtype=flags_lexicas.dtype)
+    matches = np.zeros(len(linhas), dtype=np.int64)
+    flags[presentes] = flags_lexicas[posicoes[presentes]]
+    matches[presentes] = matches_lexicas[posicoes[presentes]]
+    return linhas, scores.astype(np.float32), flags, matches
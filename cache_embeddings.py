@@ -0,0 +1,228 @@
+# cache_embeddings.py
+# Armazenamento persistente de embeddings de CVs, endereçado pelo conteúdo.
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a trava entre threads
+    fcntl = None
+
+from agendador_lotes import ORCAMENTO_TOKENS, codificar_agendado
+
+# =============================================================================
+# CONFIGURAÇÕES
+# =============================================================================
+NOME_ENCODER = "all-MiniLM-L6-v2"
+DIRETORIO_CACHE = "cache_embeddings"
+ARQUIVO_VETORES = "vetores.f32"
+ARQUIVO_INDICE = "indice.json"
+# Trava entre processos (App, treino, índice ANN e codificação paralela usam o mesmo diretório)
+ARQUIVO_TRAVA = "indice.lock"
+BATCH_SIZE_ENCODE = 64
+# Backend do encoder (torch, torch-int8, onnx; ver encoders.py). Entra na chave do cache,
+# então vetores de backends diferentes nunca se misturam
+VARIAVEL_BACKEND_ENCODER = "TALENTMATCH_ENCODER_BACKEND"
+BACKEND_PADRAO = "torch"
+
+
+def normalizar_texto(texto):
+    """Normaliza o texto para gerar a chave (unicode NFC e espaços colapsados)"""
+    texto = unicodedata.normalize("NFC", str(texto))
+    return " ".join(texto.split())
+
+
+def backend_configurado():
+    """Backend escolhido pela variável de ambiente (padrão: torch)"""
+    return os.environ.get(VARIAVEL_BACKEND_ENCODER, "").strip() or BACKEND_PADRAO
+
+
+def identificador_encoder(nome_encoder=NOME_ENCODER, backend=None):
+    """Nome do encoder + backend; o backend padrão mantém as chaves já gravadas"""
+    backend = backend or backend_configurado()
+    return nome_encoder if backend == BACKEND_PADRAO else f"{nome_encoder}@{backend}"
+
+
+def chave_texto(texto, identificador=NOME_ENCODER):
+    """Chave de conteúdo: hash do texto normalizado + identificador do encoder"""
+    conteudo = f"{identificador}\x00{normalizar_texto(texto)}".encode("utf-8")
+    return hashlib.sha1(conteudo).hexdigest()
+
+
+class CacheEmbeddings:
+    """Matriz float32 mapeada em memória + mapa chave -> linha, gravados em disco.
+
+    Os vetores são acrescentados ao fim do arquivo binário; o índice JSON é
+    regravado de forma atômica depois de cada lote, então um processo que cai
+    no meio de uma gravação perde no máximo o último lote. Cada inserção trava
+    o diretório (flock), relê o índice do disco e numera as linhas novas pelo
+    tamanho do arquivo, então vários processos podem gravar no mesmo cache.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, nome_encoder=NOME_ENCODER, backend=None):
+        self.diretorio = diretorio
+        self.nome_encoder = nome_encoder
+        self.backend = backend or backend_configurado()
+        self.identificador = identificador_encoder(nome_encoder, self.backend)
+        self.caminho_vetores = os.path.join(diretorio, ARQUIVO_VETORES)
+        self.caminho_indice = os.path.join(diretorio, ARQUIVO_INDICE)
+        self.caminho_trava = os.path.join(diretorio, ARQUIVO_TRAVA)
+        self._lock = threading.Lock()
+        self._linhas = {}
+        self._dimensao = None
+        self._matriz = None
+        os.makedirs(diretorio, exist_ok=True)
+        self.recarregar()
+
+    # -------------------------------------------------------------------------
+    # Persistência
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def _travar(self):
+        """Exclusão entre threads deste processo e, via flock, entre processos"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.caminho_trava, "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _sincronizar_indice(self):
+        """Relê o índice do disco e o alinha ao arquivo binário (chamar com a trava)"""
+        linhas, dimensao = {}, None
+        if os.path.exists(self.caminho_indice):
+            with open(self.caminho_indice, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            linhas, dimensao = dados.get("linhas", {}), dados.get("dimensao")
+        tamanho_arquivo = os.path.getsize(self.caminho_vetores) if os.path.exists(self.caminho_vetores) else 0
+
+        tamanho_esperado = 0
+        if dimensao:
+            tamanho_linha = 4 * dimensao
+            # Gravação interrompida: entradas sem vetor são descartadas
+            linhas = {k: v for k, v in linhas.items() if v < tamanho_arquivo // tamanho_linha}
+            if len(set(linhas.values())) != len(linhas) or (linhas and max(linhas.values()) >= len(linhas)):
+                raise ValueError(
+                    f"Índice '{self.caminho_indice}' não corresponde a '{self.caminho_vetores}' "
+                    "(linhas repetidas ou faltando); apague o diretório do cache."
+                )
+            tamanho_esperado = len(linhas) * tamanho_linha
+        if tamanho_arquivo != tamanho_esperado:
+            # Vetores sem entrada no índice (processo interrompido antes de gravá-lo)
+            with open(self.caminho_vetores, "r+b") as f:
+                f.truncate(tamanho_esperado)
+
+        self._linhas = linhas
+        self._dimensao = dimensao
+        self._matriz = None
+
+    def recarregar(self):
+        """Relê o índice gravado em disco (inclui os vetores acrescentados por outros processos)"""
+        with self._travar():
+            self._sincronizar_indice()
+
+    def _salvar_indice(self):
+        temporario = self.caminho_indice + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"dimensao": self._dimensao, "linhas": self._linhas}, f)
+        os.replace(temporario, self.caminho_indice)
+
+    def _mapear(self):
+        """(Re)abre a matriz mapeada em memória com o número atual de linhas"""
+        n = len(self._linhas)
+        if n == 0 or not self._dimensao:
+            self._matriz = None
+            return
+        self._matriz = np.memmap(self.caminho_vetores, dtype=np.float32, mode="r", shape=(n, self._dimensao))
+
+    @property
+    def matriz(self):
+        """Matriz completa (somente leitura) com todos os vetores armazenados"""
+        if self._matriz is None or self._matriz.shape[0] != len(self._linhas):
+            self._mapear()
+        return self._matriz
+
+    def __len__(self):
+        return len(self._linhas)
+
+    # -------------------------------------------------------------------------
+    # Consulta e inserção
+    # -------------------------------------------------------------------------
+    def linhas_de(self, textos):
+        """Retorna as linhas da matriz para cada texto (-1 quando ausente)"""
+        return np.array(
+            [self._linhas.get(chave_texto(t, self.identificador), -1) for t in textos],
+            dtype=np.int64,
+        )
+
+    def adicionar(self, textos, vetores):
+        """Acrescenta vetores ao armazenamento (textos já presentes são ignorados)"""
+        vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+        if len(textos) == 0:
+            return
+        with self._travar():
+            # Outro processo pode ter acrescentado vetores desde a última leitura
+            self._sincronizar_indice()
+            if self._dimensao is None:
+                self._dimensao = int(vetores.shape[1])
+            elif vetores.shape[1] != self._dimensao:
+                raise ValueError(
+                    f"Dimensão {vetores.shape[1]} incompatível com o cache ({self._dimensao})."
+                )
+
+            # Linhas numeradas pelo arquivo (já alinhado ao índice), não pelo que este processo conhecia
+            primeira = os.path.getsize(self.caminho_vetores) // (4 * self._dimensao) if os.path.exists(self.caminho_vetores) else 0
+            novas_linhas = {}
+            novos = []
+            for texto, vetor in zip(textos, vetores):
+                chave = chave_texto(texto, self.identificador)
+                if chave not in self._linhas and chave not in novas_linhas:
+                    novas_linhas[chave] = primeira + len(novas_linhas)
+                    novos.append(vetor)
+            if not novos:
+                return
+
+            with open(self.caminho_vetores, "ab") as f:
+                f.write(np.asarray(novos, dtype=np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            # Só depois da gravação: outras threads lendo a matriz nunca veem linhas ainda fora do arquivo
+            self._linhas = {**self._linhas, **novas_linhas}
+            self._salvar_indice()
+            self._matriz = None
+
+    def codificar(self, encoder, textos, orcamento_tokens=ORCAMENTO_TOKENS):
+        """Retorna os embeddings (normalizados) dos textos, codificando apenas os que faltam.
+
+        Os textos novos são codificados em lotes por orçamento de tokens (agendador_lotes.py).
+        """
+        textos = [str(t) for t in textos]
+        linhas = self.linhas_de(textos)
+        faltantes = np.flatnonzero(linhas < 0)
+
+        if len(faltantes) > 0:
+            # Outro processo pode já ter codificado parte dos textos
+            self.recarregar()
+            linhas = self.linhas_de(textos)
+            faltantes = np.flatnonzero(linhas < 0)
+
+        if len(faltantes) > 0:
+            # Deduplicar textos novos para não codificar o mesmo CV duas vezes
+            unicos = list(dict.fromkeys(textos[i] for i in faltantes))
+            vetores = codificar_agendado(encoder, unicos, orcamento_tokens, mostrar_progresso=len(unicos) > 1000)
+            self.adicionar(unicos, vetores)
+            linhas = self.linhas_de(textos)
+
+        if len(textos) == 0:
+            return np.zeros((0, self._dimensao or 0), dtype=np.float32)
+        return np.asarray(self.matriz[linhas], dtype=np.float32)
@@ -0,0 +1,121 @@
+# codificacao_paralela.py
+# Preenchimento do cache de embeddings em um pool de processos (um encoder por processo).
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from agendador_lotes import ORCAMENTO_TOKENS, codificar_agendado
+from cache_embeddings import CacheEmbeddings, chave_texto
+from compatibilidade import mascara_textos_validos
+from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+
+# CONFIGURAÇÕES
+# Textos por tarefa do pool; o cache é gravado em disco a cada lote concluído (checkpoint)
+LOTE_CHECKPOINT = 4096
+COLUNAS_TEXTO = ["candidato_cv", "vaga_competencias"]
+
+# Encoder do processo do pool (carregado uma vez, no inicializador)
+_encoder = None
+
+
+def _iniciar_processo(nome_encoder, backend, threads):
+    """Limita as threads do torch antes de carregar o encoder do processo"""
+    global _encoder
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+
+    from encoders import criar_encoder
+
+    torch.set_num_threads(threads)
+    _encoder = criar_encoder(backend, nome_encoder)
+
+
+def _codificar_lote(textos, orcamento_tokens):
+    return codificar_agendado(_encoder, textos, orcamento_tokens)
+
+
+def textos_faltantes(cache, textos):
+    """Textos distintos (pela chave do cache) ainda sem embedding, na ordem de entrada"""
+    textos = [str(t) for t in textos]
+    faltantes = {}
+    for texto, linha in zip(textos, cache.linhas_de(textos)):
+        if linha < 0:
+            faltantes.setdefault(chave_texto(texto, cache.identificador), texto)
+    return list(faltantes.values())
+
+
+def codificar_em_processos(textos, cache=None, n_processos=None, threads_por_processo=None,
+                           tamanho_lote=LOTE_CHECKPOINT, orcamento_tokens=ORCAMENTO_TOKENS):
+    """Codifica os textos ausentes do cache em vários processos; retorna quantos foram codificados.
+
+    Os lotes voltam na ordem de entrada e são gravados no cache assim que
+    chegam, então uma execução interrompida recomeça do primeiro lote que
+    não chegou ao disco.
+    """
+    if cache is None:
+        cache = CacheEmbeddings()
+    faltantes = textos_faltantes(cache, textos)
+    if not faltantes:
+        return 0
+
+    lotes = [faltantes[i:i + tamanho_lote] for i in range(0, len(faltantes), tamanho_lote)]
+    nucleos = os.cpu_count() or 1
+    n_processos = max(1, min(n_processos or nucleos, len(lotes)))
+    threads = threads_por_processo or max(1, nucleos // n_processos)
+    print(f"A codificar {len(faltantes)} textos em {n_processos} processos ({threads} threads cada)...")
+
+    concluidos = 0
+    inicio = time.perf_counter()
+    pendentes = deque()
+
+    def gravar_primeiro():
+        nonlocal concluidos
+        lote, futuro = pendentes.popleft()
+        cache.adicionar(lote, futuro.result())
+        concluidos += len(lote)
+        print(f"  {concluidos}/{len(faltantes)} textos ({concluidos / (time.perf_counter() - inicio):.0f}/s)")
+
+    # spawn: cada processo inicia limpo, sem herdar o estado do torch do processo principal
+    executor = ProcessPoolExecutor(
+        max_workers=n_processos, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_processo, initargs=(cache.nome_encoder, cache.backend, threads),
+    )
+    try:
+        for lote in lotes:
+            pendentes.append((lote, executor.submit(_codificar_lote, lote, orcamento_tokens)))
+            # No máximo 2 lotes em voo por processo: memória limitada e gravação na ordem de entrada
+            if len(pendentes) >= 2 * n_processos:
+                gravar_primeiro()
+        while pendentes:
+            gravar_primeiro()
+    finally:
+        # Interrompido: lotes ainda não iniciados são cancelados; os já gravados ficam no cache
+        executor.shutdown(wait=True, cancel_futures=True)
+    return concluidos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preenche o cache de embeddings com os textos da base processada.")
+    parser.add_argument('--base', default=PROCESSED_DATA_FILE, help="Parquet processado")
+    parser.add_argument('--processos', type=int, default=None, help="Processos do pool (padrão: todos os núcleos)")
+    parser.add_argument('--threads', type=int, default=None, help="Threads do torch por processo (padrão: núcleos / processos)")
+    parser.add_argument('--lote', type=int, default=LOTE_CHECKPOINT, help="Textos por checkpoint")
+    args = parser.parse_args(argv)
+
+    df = ler_base_processada(args.base, colunas=COLUNAS_TEXTO)
+    textos = []
+    for coluna in COLUNAS_TEXTO:
+        valores = df[coluna].astype(object).dropna().unique()
+        textos.extend(valores[mascara_textos_validos(valores)].tolist())
+
+    cache = CacheEmbeddings()
+    print(f"{len(textos)} textos distintos na base; {len(cache)} vetores já no cache.")
+    codificados = codificar_em_processos(textos, cache, args.processos, args.threads, args.lote)
+    print(f"\n✅ {codificados} textos codificados; o cache tem {len(cache)} vetores.")
+
+
+if __name__ == "__main__":
+    main()
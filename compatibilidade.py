@@ -0,0 +1,35 @@
+# compatibilidade.py
+# Pontuação vetorizada de compatibilidade vaga x CVs.
+import numpy as np
+import pandas as pd
+
+VALOR_NAO_INFORMADO = "Não informado"
+
+
+def mascara_textos_validos(textos):
+    """Máscara booleana dos textos utilizáveis (não nulos, não vazios, não 'Não informado')"""
+    serie = pd.Series(textos, dtype=object)
+    texto = serie.where(serie.notna(), "").astype(str).str.strip()
+    return ((texto != "") & (texto != VALOR_NAO_INFORMADO)).to_numpy()
+
+
+def calcular_compatibilidade_lote(encoder, cache, texto_vaga, cvs):
+    """Compatibilidade de uma vaga com vários CVs em um único produto matriz-vetor.
+
+    O texto da vaga é codificado uma vez, os CVs válidos são codificados em lotes
+    por orçamento de tokens (reaproveitando o cache de embeddings) e CVs vazios recebem 0.0.
+    """
+    cvs = list(cvs)
+    scores = np.zeros(len(cvs), dtype=np.float32)
+    if not isinstance(texto_vaga, str) or not texto_vaga.strip() or texto_vaga == VALOR_NAO_INFORMADO:
+        return scores
+
+    mascara = mascara_textos_validos(cvs)
+    if not mascara.any():
+        return scores
+
+    vetor_vaga = cache.codificar(encoder, [texto_vaga])[0]
+    matriz_cvs = cache.codificar(encoder, [cvs[i] for i in np.flatnonzero(mascara)])
+    # Embeddings normalizados: o produto escalar é a similaridade de cosseno
+    scores[mascara] = matriz_cvs @ vetor_vaga
+    return scores
@@ -0,0 +1,181 @@
+# competencias.py
+# Extração de competências técnicas em uma única passada (Aho–Corasick sobre tokens).
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from compatibilidade import VALOR_NAO_INFORMADO
+from indice_busca import PADRAO_TOKEN, tokenizar
+
+# CONFIGURAÇÕES
+# Arquivo opcional {"competência": ["alias", ...]} que substitui o dicionário padrão
+ARQUIVO_COMPETENCIAS = "competencias.json"
+# A base processada guarda as competências de cada CV em um uint64
+MAX_COMPETENCIAS_MASCARA = 64
+
+COMPETENCIAS_PADRAO = {
+    'python': [],
+    'java': [],
+    'javascript': ['js'],
+    'sql': [],
+    'html': ['html5'],
+    'css': ['css3'],
+    'react': ['reactjs', 'react.js'],
+    'angular': ['angularjs'],
+    'vue': ['vuejs', 'vue.js'],
+    'node.js': ['nodejs', 'node js'],
+    'docker': [],
+    'kubernetes': ['k8s'],
+    'aws': ['amazon web services'],
+    'azure': [],
+    'gcp': ['google cloud', 'google cloud platform'],
+    'git': [],
+    'jenkins': [],
+    'machine learning': ['aprendizado de máquina', 'aprendizado de maquina'],
+    'ai': ['inteligência artificial', 'inteligencia artificial', 'artificial intelligence'],
+    'data science': ['ciência de dados', 'ciencia de dados'],
+    'big data': [],
+    'tableau': [],
+    'power bi': ['powerbi'],
+    'excel': [],
+    'word': [],
+    'powerpoint': ['power point'],
+    'project management': ['gestão de projetos', 'gestao de projetos', 'gerenciamento de projetos'],
+    'scrum': [],
+    'agile': ['ágil', 'metodologias ágeis', 'metodologias ageis'],
+    'linux': [],
+    'windows': [],
+    'macos': ['mac os'],
+    'oracle': [],
+    'mysql': [],
+    'postgresql': ['postgres'],
+    'mongodb': ['mongo'],
+    'php': [],
+    'c#': ['csharp'],
+    'c++': ['cpp'],
+    'ruby': [],
+    'go': ['golang'],
+    'rust': [],
+    'swift': [],
+    'kotlin': [],
+}
+
+
+def carregar_dicionario(caminho=ARQUIVO_COMPETENCIAS):
+    """Dicionário competência -> aliases (arquivo JSON, se existir, ou o padrão)"""
+    if caminho and os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return dict(COMPETENCIAS_PADRAO)
+
+
+class ExtratorCompetencias:
+    """Autômato Aho–Corasick cujo alfabeto são tokens: só casa termos inteiros.
+
+    Assim 'go' não casa com "google" nem 'sql' com "mysql", e competências de
+    várias palavras ("power bi") casam com a sequência de tokens correspondente.
+    """
+
+    def __init__(self, dicionario=None):
+        dicionario = COMPETENCIAS_PADRAO if dicionario is None else dicionario
+        self.nomes = list(dicionario)
+        self._transicoes = [{}]
+        self._falhas = [0]
+        self._saidas = [[]]
+        for indice, (nome, aliases) in enumerate(dicionario.items()):
+            for variante in [nome, *aliases]:
+                tokens = tokenizar(variante)
+                if tokens:
+                    self._inserir(tokens, indice)
+        self._construir_falhas()
+
+    def _inserir(self, tokens, indice):
+        estado = 0
+        for token in tokens:
+            proximo = self._transicoes[estado].get(token)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes.append({})
+                self._falhas.append(0)
+                self._saidas.append([])
+                self._transicoes[estado][token] = proximo
+            estado = proximo
+        self._saidas[estado].append((indice, len(tokens)))
+
+    def _construir_falhas(self):
+        """Links de falha em largura; cada estado herda as saídas do seu sufixo"""
+        fila = list(self._transicoes[0].values())
+        for estado in fila:
+            for token, filho in self._transicoes[estado].items():
+                falha = self._falhas[estado]
+                while falha and token not in self._transicoes[falha]:
+                    falha = self._falhas[falha]
+                destino = self._transicoes[falha].get(token, 0)
+                self._falhas[filho] = destino if destino != filho else 0
+                self._saidas[filho] = self._saidas[filho] + self._saidas[self._falhas[filho]]
+                fila.append(filho)
+
+    def _avancar(self, estado, token):
+        while estado and token not in self._transicoes[estado]:
+            estado = self._falhas[estado]
+        return self._transicoes[estado].get(token, 0)
+
+    def encontrar(self, texto):
+        """Ocorrências (competência, início, fim) no texto em minúsculas, na ordem do texto"""
+        ocorrencias = []
+        tokens = list(PADRAO_TOKEN.finditer(texto.lower()))
+        estado = 0
+        for posicao, token in enumerate(tokens):
+            estado = self._avancar(estado, token.group())
+            for indice, tamanho in self._saidas[estado]:
+                ocorrencias.append((self.nomes[indice], tokens[posicao - tamanho + 1].start(), token.end()))
+        return ocorrencias
+
+    def contar(self, texto):
+        """Número de ocorrências de cada competência"""
+        contagem = dict.fromkeys(self.nomes, 0)
+        estado = 0
+        for token in tokenizar(texto):
+            estado = self._avancar(estado, token)
+            for indice, _ in self._saidas[estado]:
+                contagem[self.nomes[indice]] += 1
+        return contagem
+
+    def mascara(self, texto):
+        """Competências presentes como inteiro com um bit por competência do dicionário"""
+        mascara = 0
+        for indice in self._indices_presentes(texto):
+            mascara |= 1 << indice
+        return mascara
+
+    def extrair(self, texto):
+        """Competências presentes no texto, na ordem do dicionário"""
+        return [self.nomes[indice] for indice in sorted(self._indices_presentes(texto))]
+
+    def _indices_presentes(self, texto):
+        encontradas = set()
+        if not isinstance(texto, str) or texto.strip() in ('', VALOR_NAO_INFORMADO):
+            return encontradas
+        estado = 0
+        for token in tokenizar(texto):
+            estado = self._avancar(estado, token)
+            for indice, _ in self._saidas[estado]:
+                encontradas.add(indice)
+        return encontradas
+
+
+def nomes_da_mascara(mascara, nomes):
+    """Lista de competências codificada em uma máscara de bits"""
+    mascara = int(mascara)
+    return [nome for indice, nome in enumerate(nomes) if mascara >> indice & 1]
+
+
+def contar_mascaras(mascaras, nomes):
+    """Quantas máscaras contêm cada competência (Series nome -> contagem)"""
+    mascaras = np.asarray(mascaras, dtype=np.uint64)
+    return pd.Series(
+        [int(np.count_nonzero(mascaras & np.uint64(1 << indice))) for indice in range(len(nomes))],
+        index=list(nomes),
+    )
@@ -0,0 +1,162 @@
+# encoders.py
+# Backends do encoder de texto para CPU: PyTorch, PyTorch com quantização dinâmica int8 e ONNX Runtime.
+import argparse
+import importlib.util
+import os
+import time
+
+import numpy as np
+
+from agendador_lotes import codificar_agendado
+from cache_embeddings import NOME_ENCODER, VARIAVEL_BACKEND_ENCODER, backend_configurado
+from compatibilidade import mascara_textos_validos
+from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+
+# CONFIGURAÇÕES
+BACKENDS = ["torch", "torch-int8", "onnx"]
+DIRETORIO_EXPORTADOS = "encoders_exportados"
+OPSET_ONNX = 14
+AMOSTRA_VALIDACAO = 500
+RANDOM_STATE = 42
+
+
+def exportar_onnx(modelo, caminho):
+    """Exporta o transformer do SentenceTransformer para ONNX (saída: embeddings dos tokens)"""
+    import torch
+
+    transformer = modelo[0]
+    exemplo = transformer.tokenizer(["exemplo de currículo"], return_tensors="pt")
+    nomes = list(exemplo.keys())
+
+    class Exportavel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.modelo = transformer.auto_model
+
+        def forward(self, *entradas):
+            return self.modelo(**dict(zip(nomes, entradas)))[0]
+
+    eixos = {nome: {0: "lote", 1: "tokens"} for nome in nomes + ["tokens"]}
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            Exportavel().eval(), tuple(exemplo[nome] for nome in nomes), temporario,
+            input_names=nomes, output_names=["tokens"], dynamic_axes=eixos, opset_version=OPSET_ONNX,
+        )
+    os.replace(temporario, caminho)
+
+
+class EncoderOnnx:
+    """Mesmo pipeline do SentenceTransformer (tokenização, média dos tokens, normalização) no ONNX Runtime.
+
+    Expõe o subconjunto de SentenceTransformer usado no projeto: encode e
+    get_sentence_embedding_dimension.
+    """
+
+    def __init__(self, modelo, caminho):
+        import onnxruntime
+        from sentence_transformers.models import Normalize
+
+        pooling = modelo[1]
+        if not getattr(pooling, "pooling_mode_mean_tokens", False):
+            raise ValueError("O backend onnx suporta apenas encoders com pooling pela média dos tokens.")
+        self.tokenizer = modelo[0].tokenizer
+        self.max_seq_length = modelo[0].max_seq_length
+        self.dimensao = modelo.get_sentence_embedding_dimension()
+        self.normaliza = any(isinstance(modulo, Normalize) for modulo in modelo)
+
+        if not os.path.exists(caminho):
+            exportar_onnx(modelo, caminho)
+        self.sessao = onnxruntime.InferenceSession(caminho, providers=["CPUExecutionProvider"])
+        self.entradas = {entrada.name for entrada in self.sessao.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimensao
+
+    def _codificar_lote(self, textos):
+        tokens = self.tokenizer(textos, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        entradas = {nome: valores.astype(np.int64) for nome, valores in tokens.items() if nome in self.entradas}
+        saida = self.sessao.run(None, entradas)[0]
+        mascara = tokens["attention_mask"][..., None].astype(np.float32)
+        return (saida * mascara).sum(axis=1) / np.clip(mascara.sum(axis=1), 1e-9, None)
+
+    def encode(self, textos, batch_size=32, normalize_embeddings=False, show_progress_bar=False, **_):
+        textos = [str(texto) for texto in textos]
+        vetores = np.zeros((len(textos), self.dimensao), dtype=np.float32)
+        # Textos de tamanho parecido no mesmo lote (menos padding), como no SentenceTransformer
+        ordem = np.argsort([-len(texto) for texto in textos], kind="stable")
+        for inicio in range(0, len(ordem), batch_size):
+            posicoes = ordem[inicio:inicio + batch_size]
+            vetores[posicoes] = self._codificar_lote([textos[i] for i in posicoes])
+        if normalize_embeddings or self.normaliza:
+            vetores /= np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores
+
+
+def caminho_onnx(nome_encoder=NOME_ENCODER, diretorio=DIRETORIO_EXPORTADOS):
+    return os.path.join(diretorio, nome_encoder.replace("/", "_") + ".onnx")
+
+
+def criar_encoder(backend=None, nome_encoder=NOME_ENCODER):
+    """Encoder de CPU no backend pedido (padrão: variável TALENTMATCH_ENCODER_BACKEND ou torch)"""
+    backend = backend or backend_configurado()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend '{backend}' desconhecido em {VARIAVEL_BACKEND_ENCODER} (use {', '.join(BACKENDS)}).")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(nome_encoder)
+    modelo = SentenceTransformer(nome_encoder, device="cpu")
+    if backend == "torch-int8":
+        import torch
+
+        # Pesos das camadas lineares em int8; ativações quantizadas em tempo de execução
+        return torch.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8)
+    if importlib.util.find_spec("onnxruntime") is None:
+        raise ImportError("O backend onnx precisa do pacote onnxruntime (pip install onnxruntime).")
+    return EncoderOnnx(modelo, caminho_onnx(nome_encoder))
+
+
+def _codificar_cronometrado(encoder, textos):
+    inicio = time.perf_counter()
+    vetores = codificar_agendado(encoder, textos)
+    return vetores, time.perf_counter() - inicio
+
+
+def validar_backend(backend, textos, nome_encoder=NOME_ENCODER):
+    """Concordância (cosseno) com o encoder torch de referência e vazão de cada um, em CVs por segundo"""
+    referencia, tempo_referencia = _codificar_cronometrado(criar_encoder("torch", nome_encoder), textos)
+    vetores, tempo = _codificar_cronometrado(criar_encoder(backend, nome_encoder), textos)
+    cossenos = np.einsum("ij,ij->i", referencia, vetores)
+    return {
+        "cosseno_medio": float(cossenos.mean()),
+        "cosseno_minimo": float(cossenos.min()),
+        "cvs_por_segundo_referencia": len(textos) / tempo_referencia,
+        "cvs_por_segundo": len(textos) / tempo,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida um backend do encoder contra o modelo PyTorch de referência.")
+    parser.add_argument('--backend', choices=BACKENDS, default=backend_configurado(), help="Backend a validar")
+    parser.add_argument('--base', default=PROCESSED_DATA_FILE, help="Parquet processado (fonte dos CVs)")
+    parser.add_argument('--amostra', type=int, default=AMOSTRA_VALIDACAO, help="Número de CVs sorteados")
+    args = parser.parse_args(argv)
+
+    cvs = ler_base_processada(args.base, colunas=["candidato_cv"])["candidato_cv"].astype(object).dropna().unique()
+    cvs = cvs[mascara_textos_validos(cvs)]
+    rng = np.random.default_rng(RANDOM_STATE)
+    cvs = cvs[rng.choice(len(cvs), min(args.amostra, len(cvs)), replace=False)].tolist()
+
+    print(f"A codificar {len(cvs)} CVs com torch (referência) e {args.backend}...")
+    resultado = validar_backend(args.backend, cvs)
+    print(f"\nCosseno com a referência: média {resultado['cosseno_medio']:.4f}, mínimo {resultado['cosseno_minimo']:.4f}")
+    print(f"Vazão: {resultado['cvs_por_segundo']:.1f} CVs/s ({args.backend}) x "
+          f"{resultado['cvs_por_segundo_referencia']:.1f} CVs/s (torch), "
+          f"{resultado['cvs_por_segundo'] / resultado['cvs_por_segundo_referencia']:.2f}x")
+    print(f"\nPara usar: {VARIAVEL_BACKEND_ENCODER}={args.backend} (os vetores ficam no cache separados por backend).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# features.py
+# Features do modelo de contratação, as mesmas no treino (train_model.py) e na inferência (App).
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from cache_embeddings import identificador_encoder
+from compatibilidade import mascara_textos_validos
+from perfil_cv import TERMOS_FORMACAO, TIPO_NIVEL_FORMACAO, TIPO_NIVEL_INGLES
+
+# CONFIGURAÇÕES
+VERSAO_FEATURES = 1
+DIRETORIO_FEATURES = "features_modelo"
+ARQUIVO_MATRIZ = "X.npy"
+ARQUIVO_ROTULOS = "y.npy"
+ARQUIVO_META = "meta.json"
+BLOCO_FEATURES = 8192
+PREFIXO_EMBEDDING = "embed_"
+COLUNA_TEXTO = "texto_completo"
+# Colunas derivadas da base + cosseno CV x vaga
+COLUNAS_DERIVADAS = ['anos_experiencia', 'pretensao_salarial', 'candidato_nivel_ingles_num', 'candidato_nivel_academico_num']
+COLUNAS_NUMERICAS = COLUNAS_DERIVADAS + ['compatibilidade']
+
+# Situações que encerram a candidatura: 1 = contratado, 0 = não contratado (as demais ficam sem rótulo)
+STATUS_SUCESSO = ['Contratado pela Decision', 'Contratado como Hunting', 'Aprovado', 'Proposta Aceita']
+STATUS_FRACASSO = [
+    'Não Aprovado pelo Cliente', 'Não Aprovado pelo RH', 'Não Aprovado pelo Requisitante',
+    'Desistiu', 'Desistiu da Contratação', 'Recusado', 'Sem interesse nesta vaga',
+]
+
+# Nível de inglês declarado no cadastro (applicants.json)
+NIVEIS_INGLES_CANDIDATO = {'nenhum': 0, 'básico': 1, 'intermediário': 2, 'avançado': 3, 'fluente': 4}
+# Nível acadêmico declarado: termos extras além dos usados no CV
+TERMOS_ACADEMICOS = {**TERMOS_FORMACAO, 'Pós-graduação': TERMOS_FORMACAO['Pós-graduação'] + ['pós', 'pos graduação'],
+                     'Graduação': TERMOS_FORMACAO['Graduação'] + ['superior']}
+PADRAO_VALOR = re.compile(r"\d[\d.,]*")
+
+
+def rotulo_sucesso(situacoes):
+    """1.0 (contratado), 0.0 (não contratado) ou NaN (candidatura em andamento)"""
+    situacoes = pd.Series(situacoes).astype(object)
+    return np.where(situacoes.isin(STATUS_SUCESSO), 1.0, np.where(situacoes.isin(STATUS_FRACASSO), 0.0, np.nan))
+
+
+def converter_remuneracao(texto):
+    """Valor numérico de textos como "R$ 5.000,00", "7.500" ou "10k" (NaN se não houver número)"""
+    if not isinstance(texto, str):
+        return np.nan
+    encontrado = PADRAO_VALOR.search(texto)
+    if not encontrado:
+        return np.nan
+    numero = encontrado.group().rstrip('.,')
+    # Vírgula decimal brasileira e ponto como separador de milhar
+    if ',' in numero:
+        numero = numero.replace('.', '').replace(',', '.')
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", numero):
+        numero = numero.replace('.', '')
+    valor = float(numero)
+    if texto[encontrado.end():].strip().lower().startswith('k'):
+        valor *= 1000
+    return valor
+
+
+def _nivel_ingles_declarado(texto):
+    if not isinstance(texto, str):
+        return np.nan
+    return NIVEIS_INGLES_CANDIDATO.get(texto.strip().lower(), np.nan)
+
+
+def _nivel_academico_declarado(texto):
+    """Posição na escala de formação do CV (1 = ensino médio), pelo primeiro nível cujo termo aparece"""
+    if not isinstance(texto, str):
+        return np.nan
+    texto = texto.lower()
+    for nivel, termos in TERMOS_ACADEMICOS.items():
+        if any(termo in texto for termo in termos):
+            return TIPO_NIVEL_FORMACAO.categories.get_loc(nivel) + 1
+    return np.nan
+
+
+def _codigo_ordinal(serie, tipo):
+    """1 = menor nível da escala, NaN = não especificado"""
+    codigos = pd.Categorical(serie, dtype=tipo).codes.astype(np.float64) + 1
+    codigos[codigos == 0] = np.nan
+    return codigos
+
+
+def _coluna(df, coluna):
+    return df[coluna] if coluna in df.columns else pd.Series(np.nan, index=df.index)
+
+
+def _valores_distintos(serie, funcao):
+    """Aplica a função uma vez por valor distinto (colunas repetitivas)"""
+    codigos, valores = pd.factorize(pd.Series(serie).astype(object))
+    resultado = np.array([funcao(valor) for valor in valores] + [np.nan], dtype=np.float64)
+    return resultado[codigos]
+
+
+def derivar_colunas(df):
+    """sucesso, texto_completo e as colunas numéricas (sem compatibilidade) a partir da base unificada.
+
+    Níveis declarados no cadastro têm prioridade; sem eles vale o nível extraído do CV.
+    """
+    colunas = pd.DataFrame(index=df.index)
+    colunas['sucesso'] = rotulo_sucesso(df['situacao_candidado'])
+    colunas[COLUNA_TEXTO] = df['candidato_cv'].astype(object)
+    colunas['anos_experiencia'] = pd.to_numeric(_coluna(df, 'anos_experiencia'), errors='coerce').astype(np.float64)
+    colunas['pretensao_salarial'] = _valores_distintos(_coluna(df, 'candidato_remuneracao'), converter_remuneracao)
+
+    ingles = _valores_distintos(_coluna(df, 'candidato_nivel_ingles'), _nivel_ingles_declarado)
+    if 'nivel_ingles' in df.columns:
+        ingles = np.where(np.isnan(ingles), _codigo_ordinal(df['nivel_ingles'], TIPO_NIVEL_INGLES), ingles)
+    colunas['candidato_nivel_ingles_num'] = ingles
+
+    academico = _valores_distintos(_coluna(df, 'candidato_nivel_academico'), _nivel_academico_declarado)
+    if 'nivel_formacao' in df.columns:
+        academico = np.where(np.isnan(academico), _codigo_ordinal(df['nivel_formacao'], TIPO_NIVEL_FORMACAO), academico)
+    colunas['candidato_nivel_academico_num'] = academico
+    return colunas
+
+
+def colunas_features(dimensao):
+    return [f'{PREFIXO_EMBEDDING}{i}' for i in range(dimensao)] + COLUNAS_NUMERICAS
+
+
+def construir_features(df, encoder, cache, saida=None, bloco=BLOCO_FEATURES):
+    """Matriz float32 (linhas x colunas_features) de um DataFrame da base.
+
+    Embeddings do CV e das competências da vaga vêm do cache (só textos novos
+    são codificados); compatibilidade é o cosseno entre os dois. Valores
+    ausentes viram 0. Se `saida` for informada (ex.: um memmap), é preenchida
+    em blocos de `bloco` linhas, limitando a memória. Retorna (X, colunas).
+    """
+    derivadas = derivar_colunas(df)
+    dimensao = encoder.get_sentence_embedding_dimension()
+    colunas = colunas_features(dimensao)
+    X = np.zeros((len(df), len(colunas)), dtype=np.float32) if saida is None else saida
+
+    for inicio in range(0, len(df), bloco):
+        fatia = slice(inicio, min(inicio + bloco, len(df)))
+        cvs = derivadas[COLUNA_TEXTO].iloc[fatia].tolist()
+        vagas = df['vaga_competencias'].iloc[fatia].astype(object).tolist()
+        validos_cv = mascara_textos_validos(cvs)
+        validos_vaga = mascara_textos_validos(vagas)
+
+        embeddings = np.zeros((len(cvs), dimensao), dtype=np.float32)
+        if validos_cv.any():
+            embeddings[validos_cv] = cache.codificar(encoder, [cvs[i] for i in np.flatnonzero(validos_cv)])
+        vetores_vaga = np.zeros_like(embeddings)
+        if validos_vaga.any():
+            vetores_vaga[validos_vaga] = cache.codificar(encoder, [vagas[i] for i in np.flatnonzero(validos_vaga)])
+
+        X[fatia, :dimensao] = embeddings
+        X[fatia, dimensao:-1] = derivadas[COLUNAS_DERIVADAS].iloc[fatia].fillna(0).to_numpy(dtype=np.float32)
+        X[fatia, -1] = np.einsum('ij,ij->i', embeddings, vetores_vaga)
+    return X, colunas
+
+
+def textos_features(df):
+    """Textos distintos e válidos (CVs e competências das vagas) que as features das candidaturas rotuladas codificam"""
+    rotuladas = df[~np.isnan(rotulo_sucesso(df['situacao_candidado']))]
+    textos = []
+    for coluna in ['candidato_cv', 'vaga_competencias']:
+        valores = rotuladas[coluna].astype(object).dropna().unique()
+        textos.extend(valores[mascara_textos_validos(valores)].tolist())
+    return textos
+
+
+def impressao_base(caminho_parquet, identificador=None):
+    """Identifica a versão da base + encoder (com o backend) + formato das features"""
+    estado = os.stat(caminho_parquet)
+    identificador = identificador or identificador_encoder()
+    conteudo = f"{VERSAO_FEATURES}\x00{identificador}\x00{estado.st_size}\x00{estado.st_mtime_ns}"
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def gravar_features(df, encoder, cache, impressao, diretorio=DIRETORIO_FEATURES):
+    """Grava as features das candidaturas rotuladas em .npy mapeáveis em memória.
+
+    O meta.json é gravado por último: sem ele (gravação interrompida) o artefato
+    é considerado inexistente.
+    """
+    rotulos = rotulo_sucesso(df['situacao_candidado'])
+    rotuladas = df[~np.isnan(rotulos)]
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_meta = os.path.join(diretorio, ARQUIVO_META)
+    if os.path.exists(caminho_meta):
+        os.remove(caminho_meta)
+
+    colunas = colunas_features(encoder.get_sentence_embedding_dimension())
+    caminho_matriz = os.path.join(diretorio, ARQUIVO_MATRIZ)
+    X = np.lib.format.open_memmap(caminho_matriz, mode='w+', dtype=np.float32, shape=(len(rotuladas), len(colunas)))
+    construir_features(rotuladas, encoder, cache, saida=X)
+    X.flush()
+    del X
+    np.save(os.path.join(diretorio, ARQUIVO_ROTULOS), rotulos[~np.isnan(rotulos)].astype(np.int8))
+
+    temporario = caminho_meta + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_FEATURES, 'impressao': impressao, 'colunas': colunas}, f)
+    os.replace(temporario, caminho_meta)
+
+
+def carregar_features(impressao, diretorio=DIRETORIO_FEATURES):
+    """(X memmap somente leitura, y, colunas) se o artefato corresponder à impressão; senão None"""
+    caminho_meta = os.path.join(diretorio, ARQUIVO_META)
+    if not os.path.exists(caminho_meta):
+        return None
+    with open(caminho_meta, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('versao') != VERSAO_FEATURES or meta.get('impressao') != impressao:
+        return None
+    X = np.load(os.path.join(diretorio, ARQUIVO_MATRIZ), mmap_mode='r')
+    y = np.load(os.path.join(diretorio, ARQUIVO_ROTULOS))
+    return X, y, meta['colunas']
@@ -0,0 +1,152 @@
+# fontes_dados.py
+# Cache local dos JSONs brutos com revalidação condicional e downloads concorrentes.
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+
+# =============================================================================
+# CONFIGURAÇÕES
+# =============================================================================
+PROSPECTS_URL = "https://drive.google.com/uc?id=1f_NPd0qA0iqqo9Im9FfQi78esPOlf1Bu"
+APPLICANTS_URL = "https://drive.google.com/uc?id=1jgiuRW402WUp-b5w1yE6nHrfR4KjFuzT"
+VAGAS_URL = "https://drive.google.com/uc?id=1hmUUdyuAd9hoM84drSXJrQ8EbvFsPEDb"
+FONTES_GOOGLE_DRIVE = {'prospects': PROSPECTS_URL, 'applicants': APPLICANTS_URL, 'vagas': VAGAS_URL}
+
+# Diretório local, URL file:// ou URL http(s) base contendo prospects.json, applicants.json e vagas.json
+VARIAVEL_FONTE_DADOS = "TALENTMATCH_FONTE_DADOS"
+DIRETORIO_CACHE_FONTES = "cache_fontes"
+TIMEOUT_DOWNLOAD = (10, 60)
+TAMANHO_CHUNK = 1 << 20
+
+
+def resolver_fontes(base=None):
+    """Mapa nome -> URL/caminho de cada fonte (Google Drive, ou a base configurada)"""
+    base = base or os.environ.get(VARIAVEL_FONTE_DADOS)
+    if not base:
+        return dict(FONTES_GOOGLE_DRIVE)
+    separador = '' if base.endswith(('/', os.sep)) else '/'
+    return {nome: f"{base}{separador}{nome}.json" for nome in FONTES_GOOGLE_DRIVE}
+
+
+def _caminho_local(fonte):
+    """Caminho no disco para fontes locais (caminho simples ou file://); None para http(s)"""
+    if fonte.startswith('file://'):
+        return url2pathname(urlparse(fonte).path)
+    if fonte.startswith(('http://', 'https://')):
+        return None
+    return fonte
+
+
+def _ler_meta(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _gravar_meta(caminho, meta):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporario, caminho)
+
+
+def _sincronizar_local(origem, destino, caminho_meta):
+    """Fonte local: copia apenas se tamanho/data de modificação mudaram"""
+    estado = os.stat(origem)
+    validador = f"{estado.st_size}-{estado.st_mtime_ns}"
+    if os.path.exists(destino) and _ler_meta(caminho_meta).get('validador') == validador:
+        return destino
+
+    parcial = destino + '.part'
+    shutil.copyfile(origem, parcial)
+    os.replace(parcial, destino)
+    _gravar_meta(caminho_meta, {'fonte': origem, 'validador': validador, 'verificado_em': time.time()})
+    return destino
+
+
+def _sincronizar_http(url, destino, caminho_meta, sessao):
+    """Fonte HTTP: GET condicional (ETag/Last-Modified) e retomada de downloads parciais"""
+    meta = _ler_meta(caminho_meta)
+    parcial = destino + '.part'
+    caminho_meta_parcial = parcial + '.meta.json'
+    headers = {}
+
+    if os.path.exists(destino) and meta.get('url') == url:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    # Retomar um download interrompido, desde que seja da mesma versão do arquivo
+    meta_parcial = _ler_meta(caminho_meta_parcial)
+    ja_baixado = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    validador_parcial = meta_parcial.get('etag') or meta_parcial.get('last_modified')
+    if ja_baixado and meta_parcial.get('url') == url and validador_parcial:
+        headers['Range'] = f"bytes={ja_baixado}-"
+        headers['If-Range'] = validador_parcial
+
+    with sessao.get(url, headers=headers, stream=True, timeout=TIMEOUT_DOWNLOAD) as response:
+        if response.status_code == 304:
+            meta['verificado_em'] = time.time()
+            _gravar_meta(caminho_meta, meta)
+            return destino
+        response.raise_for_status()
+
+        nova_meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        retomando = response.status_code == 206
+        if not retomando:
+            ja_baixado = 0
+        _gravar_meta(caminho_meta_parcial, nova_meta)
+
+        with open(parcial, 'ab' if retomando else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=TAMANHO_CHUNK):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        esperado = response.headers.get('Content-Length')
+        if esperado is not None and 'Content-Encoding' not in response.headers:
+            recebido = os.path.getsize(parcial) - ja_baixado
+            if recebido != int(esperado):
+                raise IOError(f"Download incompleto de {url}: {recebido} de {esperado} bytes.")
+
+    os.replace(parcial, destino)
+    os.remove(caminho_meta_parcial)
+    nova_meta['verificado_em'] = time.time()
+    _gravar_meta(caminho_meta, nova_meta)
+    return destino
+
+
+def sincronizar_fonte(nome, fonte, diretorio=DIRETORIO_CACHE_FONTES, sessao=None):
+    """Garante uma cópia local atualizada da fonte e retorna o caminho dela"""
+    os.makedirs(diretorio, exist_ok=True)
+    destino = os.path.join(diretorio, f"{nome}.json")
+    caminho_meta = destino + '.meta.json'
+
+    origem_local = _caminho_local(fonte)
+    if origem_local is not None:
+        return _sincronizar_local(origem_local, destino, caminho_meta)
+    return _sincronizar_http(fonte, destino, caminho_meta, sessao or requests.Session())
+
+
+def sincronizar_fontes(fontes=None, diretorio=DIRETORIO_CACHE_FONTES, max_workers=3):
+    """Sincroniza todas as fontes em paralelo; retorna nome -> caminho local"""
+    fontes = fontes or resolver_fontes()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {
+            nome: executor.submit(sincronizar_fonte, nome, fonte, diretorio)
+            for nome, fonte in fontes.items()
+        }
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
@@ -0,0 +1,172 @@
+# incremental.py
+# Pré-processamento incremental: recalcula apenas as candidaturas afetadas por mudanças nas fontes.
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from competencias import carregar_dicionario
+from fontes_dados import sincronizar_fontes
+from ingestao import (
+    COLUNAS_CANDIDATO, COLUNAS_UNIFICADAS, PROCESSED_DATA_FILE, TAMANHO_ROW_GROUP, abrir_fonte, amostra_da_base,
+    calcular_colunas_perfil, criar_base_streaming, gravar_base_processada, iterar_objeto_json, ler_base_processada,
+    projetar_candidato, projetar_vaga,
+)
+
+# CONFIGURAÇÕES
+SUFIXO_MANIFESTO = ".manifest.json"
+SUFIXO_DELTA = ".delta.json"
+VERSAO_MANIFESTO = 3
+
+
+def hash_registro(valor):
+    """Hash curto e estável do conteúdo projetado de um registro"""
+    serializado = json.dumps(valor, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(serializado.encode('utf-8')).hexdigest()[:16]
+
+
+def _hashes_fonte(fonte, projetar):
+    with abrir_fonte(fonte) as arquivo:
+        return {chave: hash_registro(projetar(valor)) for chave, valor in iterar_objeto_json(arquivo)}
+
+
+def _ler_prospects(fonte):
+    """Hash por vaga da lista de prospects + tabela compacta (vaga, candidato, situação) na ordem original"""
+    hashes, linhas = {}, []
+    with abrir_fonte(fonte) as arquivo:
+        for vaga_id, data in iterar_objeto_json(arquivo):
+            entradas = [
+                (str(prospect.get('codigo')), prospect.get('situacao_candidado'))
+                for prospect in data.get('prospects', [])
+            ]
+            hashes[vaga_id] = hash_registro(entradas)
+            linhas.extend((vaga_id, candidato_id, situacao) for candidato_id, situacao in entradas)
+    prospects = pd.DataFrame(linhas, columns=['vaga_id', 'candidato_id', 'situacao_candidado'])
+    return hashes, prospects
+
+
+def _alterados(antigos, novos):
+    """Chaves criadas, removidas ou com conteúdo diferente"""
+    return {chave for chave in antigos.keys() | novos.keys() if antigos.get(chave) != novos.get(chave)}
+
+
+def _ordem_por_ocorrencia(df):
+    """Chave (vaga, candidato, n-ésima ocorrência) que identifica cada candidatura"""
+    ocorrencia = df.groupby(['vaga_id', 'candidato_id'], sort=False, observed=True).cumcount()
+    return pd.MultiIndex.from_arrays([df['vaga_id'], df['candidato_id'], ocorrencia])
+
+
+def _candidatos_projetados(fonte_applicants, candidato_ids):
+    """Campos projetados apenas dos candidatos pedidos, em uma passada pelo arquivo"""
+    encontrados = {}
+    with abrir_fonte(fonte_applicants) as arquivo:
+        for candidato_id, detalhes in iterar_objeto_json(arquivo):
+            if candidato_id in candidato_ids:
+                encontrados[candidato_id] = projetar_candidato(detalhes)
+    return encontrados
+
+
+def _gravar_json(caminho, dados):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def descartar_manifesto(caminho_saida=PROCESSED_DATA_FILE):
+    """Remove manifesto e delta de um parquet que vai ser regravado fora do modo incremental"""
+    for sufixo in (SUFIXO_MANIFESTO, SUFIXO_DELTA):
+        if os.path.exists(caminho_saida + sufixo):
+            os.remove(caminho_saida + sufixo)
+
+
+def atualizar_base_incremental(caminhos, caminho_saida=PROCESSED_DATA_FILE, tamanho_row_group=TAMANHO_ROW_GROUP,
+                               n_processos=None):
+    """Atualiza a base processada (completa, sem amostragem) recalculando só as linhas afetadas.
+
+    Retorna (df, delta), onde delta lista os vaga_id e candidato_id alterados para
+    que caches derivados (índices, matrizes de embeddings) invalidem só o necessário.
+    O delta também é gravado ao lado do parquet. `tamanho_row_group` e `n_processos`
+    têm o mesmo efeito que em gravar_base_processada.
+    """
+    if os.path.exists(caminho_saida) and amostra_da_base(caminho_saida):
+        raise ValueError(f"'{caminho_saida}' é uma amostra; gere a base completa sem o modo incremental.")
+
+    caminho_manifesto = caminho_saida + SUFIXO_MANIFESTO
+    manifesto = {}
+    hash_competencias = hash_registro(carregar_dicionario())
+    if os.path.exists(caminho_manifesto) and os.path.exists(caminho_saida):
+        with open(caminho_manifesto, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+        # Outro formato ou outro dicionário de competências: as colunas de perfil mudam
+        if manifesto.get('versao') != VERSAO_MANIFESTO or manifesto.get('competencias') != hash_competencias:
+            manifesto = {}
+
+    hashes_vagas = _hashes_fonte(caminhos['vagas'], projetar_vaga)
+    hashes_candidatos = _hashes_fonte(caminhos['applicants'], projetar_candidato)
+    hashes_prospects, prospects = _ler_prospects(caminhos['prospects'])
+
+    if not manifesto:
+        # Sem manifesto anterior: reconstrução completa
+        df_final = criar_base_streaming(caminhos, preencher_nulos=False)
+        delta = {'completo': True, 'vaga_id': sorted(hashes_prospects), 'candidato_id': sorted(hashes_candidatos)}
+    else:
+        vagas_alteradas = _alterados(manifesto['vagas'], hashes_vagas) | _alterados(manifesto['prospects'], hashes_prospects)
+        candidatos_alterados = _alterados(manifesto['candidatos'], hashes_candidatos)
+        delta = {'completo': False, 'vaga_id': sorted(vagas_alteradas), 'candidato_id': sorted(candidatos_alterados)}
+
+        df_existente = ler_base_processada(caminho_saida)
+        afetadas = df_existente['vaga_id'].isin(vagas_alteradas) | df_existente['candidato_id'].isin(candidatos_alterados)
+        df_mantido = df_existente[~afetadas]
+
+        # Recalcular as candidaturas afetadas a partir dos dados novos
+        novas = prospects[prospects['vaga_id'].isin(vagas_alteradas) | prospects['candidato_id'].isin(candidatos_alterados)].copy()
+        detalhes = _candidatos_projetados(caminhos['applicants'], set(novas['candidato_id']))
+        vagas_necessarias = set(novas['vaga_id'])
+        with abrir_fonte(caminhos['vagas']) as arquivo:
+            vagas = {
+                vaga_id: projetar_vaga(valor)
+                for vaga_id, valor in iterar_objeto_json(arquivo)
+                if vaga_id in vagas_necessarias
+            }
+        vazio = (None,) * len(COLUNAS_CANDIDATO)
+        for i, coluna in enumerate(COLUNAS_CANDIDATO):
+            novas[coluna] = [detalhes.get(c, vazio)[i] for c in novas['candidato_id']]
+        novas['vaga_titulo'] = [vagas.get(v, (None, None))[0] for v in novas['vaga_id']]
+        novas['vaga_competencias'] = [vagas.get(v, (None, None))[1] for v in novas['vaga_id']]
+        novas = novas[COLUNAS_UNIFICADAS]
+        novas = novas.join(calcular_colunas_perfil(novas['candidato_cv'], n_processos=n_processos))
+
+        # Mesclar e restaurar a ordem de prospects.json (igual a uma reconstrução completa)
+        df_final = pd.concat([df_mantido.astype(object), novas.astype(object)], ignore_index=True)
+        posicao = pd.Series(range(len(prospects)), index=_ordem_por_ocorrencia(prospects))
+        df_final = df_final.iloc[posicao.reindex(_ordem_por_ocorrencia(df_final)).to_numpy().argsort(kind='stable')]
+        df_final = df_final.reset_index(drop=True)
+
+    gravar_base_processada(df_final, caminho_saida, tamanho_row_group, n_processos)
+    _gravar_json(caminho_manifesto, {
+        'versao': VERSAO_MANIFESTO,
+        'competencias': hash_competencias,
+        'vagas': hashes_vagas,
+        'candidatos': hashes_candidatos,
+        'prospects': hashes_prospects,
+    })
+    _gravar_json(caminho_saida + SUFIXO_DELTA, delta)
+    return df_final, delta
+
+
+def main():
+    print("A sincronizar as fontes de dados...")
+    caminhos = sincronizar_fontes()
+    print(f"A atualizar '{PROCESSED_DATA_FILE}' de forma incremental...")
+    df, delta = atualizar_base_incremental(caminhos)
+    if delta['completo']:
+        print(f"Reconstrução completa: {len(df)} candidaturas.")
+    else:
+        print(f"{len(delta['vaga_id'])} vagas e {len(delta['candidato_id'])} candidatos alterados.")
+    print(f"\n✅ Base atualizada com {len(df)} candidaturas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# indice_ann.py
+# Índice aproximado (IVF) sobre os embeddings dos CVs de toda a base de candidatos.
+import argparse
+import os
+
+import numpy as np
+
+from cache_embeddings import CacheEmbeddings, NOME_ENCODER
+from codificacao_paralela import codificar_em_processos
+from compatibilidade import mascara_textos_validos
+from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+from quantizacao import TIPOS_QUANTIZACAO, pontuar, quantizar, top_k
+
+# CONFIGURAÇÕES
+INDICE_OUTPUT_FILE = "indice_candidatos.npz"
+N_PROBE_PADRAO = 8
+ITERACOES_KMEANS = 10
+AMOSTRA_TREINO_KMEANS = 50000
+BLOCO_ATRIBUICAO = 16384
+RANDOM_STATE = 42
+
+
+def caminho_indice_para(caminho_parquet):
+    """Caminho do índice gravado ao lado do parquet processado"""
+    return os.path.join(os.path.dirname(os.path.abspath(caminho_parquet)), INDICE_OUTPUT_FILE)
+
+
+def _atribuir(vetores, centroides):
+    """Lista (centroide mais próximo) de cada vetor, em blocos para limitar memória"""
+    atribuicao = np.empty(len(vetores), dtype=np.int32)
+    for inicio in range(0, len(vetores), BLOCO_ATRIBUICAO):
+        bloco = vetores[inicio:inicio + BLOCO_ATRIBUICAO]
+        atribuicao[inicio:inicio + len(bloco)] = np.argmax(bloco @ centroides.T, axis=1)
+    return atribuicao
+
+
+def treinar_centroides(vetores, n_listas, iteracoes=ITERACOES_KMEANS):
+    """K-means esférico (similaridade de cosseno) sobre uma amostra dos vetores"""
+    rng = np.random.default_rng(RANDOM_STATE)
+    if len(vetores) > AMOSTRA_TREINO_KMEANS:
+        amostra = vetores[rng.choice(len(vetores), AMOSTRA_TREINO_KMEANS, replace=False)]
+    else:
+        amostra = vetores
+    centroides = amostra[rng.choice(len(amostra), n_listas, replace=False)].copy()
+
+    for _ in range(iteracoes):
+        atribuicao = _atribuir(amostra, centroides)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, atribuicao, amostra)
+        normas = np.linalg.norm(somas, axis=1, keepdims=True)
+        vazias = normas[:, 0] == 0
+        # Listas vazias são reiniciadas com pontos aleatórios da amostra
+        somas[vazias] = amostra[rng.choice(len(amostra), int(vazias.sum()), replace=False)]
+        normas[vazias] = 1.0
+        centroides = (somas / normas).astype(np.float32)
+    return centroides
+
+
+def construir_indice(vetores, ids, n_listas=None, quantizacao="float32"):
+    """Constrói o índice IVF: centroides + vetores agrupados contiguamente por lista.
+
+    Com quantizacao "float16" ou "int8" os vetores são guardados nesse tipo
+    (int8 com uma escala por vetor), ocupando 1/2 ou 1/4 da memória.
+    """
+    vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+    ids = np.asarray(ids).astype(str)
+    if n_listas is None:
+        n_listas = max(1, int(4 * np.sqrt(len(vetores))))
+    n_listas = min(n_listas, len(vetores))
+
+    centroides = treinar_centroides(vetores, n_listas)
+    atribuicao = _atribuir(vetores, centroides)
+    ordem = np.argsort(atribuicao, kind="stable")
+    offsets = np.zeros(n_listas + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(atribuicao, minlength=n_listas))
+
+    codigos, escalas = quantizar(vetores[ordem], quantizacao)
+    indice = {
+        "centroides": centroides,
+        "offsets": offsets,
+        "vetores": codigos,
+        "ids": ids[ordem],
+    }
+    if escalas is not None:
+        indice["escalas"] = escalas
+    return indice
+
+
+def indice_quantizado(indice):
+    """True se os scores do índice são aproximados (vetores em float16/int8)"""
+    return indice["vetores"].dtype != np.float32
+
+
+def salvar_indice(indice, caminho, nome_encoder=NOME_ENCODER):
+    np.savez(caminho, nome_encoder=np.array(nome_encoder), **indice)
+
+
+def carregar_indice(caminho):
+    with np.load(caminho) as dados:
+        return {chave: dados[chave] for chave in dados.files}
+
+
+def indice_compativel(indice, identificador):
+    """True se o índice foi gerado com o encoder/backend de `identificador` (o do cache em uso)"""
+    return str(indice.get("nome_encoder", NOME_ENCODER)) == identificador
+
+
+def buscar_top_k(indice, vetor_consulta, k=20, n_probe=N_PROBE_PADRAO):
+    """Top-K (ids, scores) por similaridade de cosseno, visitando só as n_probe listas mais próximas.
+
+    Em índices quantizados os scores são calculados direto sobre os códigos.
+    """
+    centroides = indice["centroides"]
+    offsets = indice["offsets"]
+    n_probe = min(n_probe, len(centroides))
+
+    scores_listas = centroides @ vetor_consulta
+    listas = np.argpartition(-scores_listas, n_probe - 1)[:n_probe]
+    posicoes = np.concatenate([np.arange(offsets[l], offsets[l + 1]) for l in listas])
+    if len(posicoes) == 0:
+        return np.array([], dtype=str), np.array([], dtype=np.float32)
+
+    scores = pontuar(indice["vetores"], indice.get("escalas"), vetor_consulta, posicoes)
+    melhores = top_k(scores, k)
+    return indice["ids"][posicoes[melhores]], scores[melhores]
+
+
+def main(argv=None):
+    from encoders import criar_encoder
+
+    parser = argparse.ArgumentParser(description="Constrói o índice aproximado dos CVs da base completa.")
+    parser.add_argument('--quantizacao', choices=TIPOS_QUANTIZACAO, default="float32",
+                        help="Tipo dos vetores guardados no índice (float16/int8 reduzem a memória)")
+    args = parser.parse_args(argv)
+
+    print(f"A carregar dados de '{PROCESSED_DATA_FILE}'...")
+    df = ler_base_processada(PROCESSED_DATA_FILE, colunas=["candidato_id", "candidato_cv"])
+    df = df.drop_duplicates("candidato_id")
+    df = df[mascara_textos_validos(df["candidato_cv"])]
+    print(f"{len(df)} candidatos com CV para indexar.")
+
+    print("A gerar embeddings (apenas os que não estão no cache)...")
+    cache = CacheEmbeddings()
+    codificar_em_processos(df["candidato_cv"].tolist(), cache)
+    model_st = criar_encoder()
+    vetores = cache.codificar(model_st, df["candidato_cv"].tolist())
+
+    print("A construir o índice IVF...")
+    indice = construir_indice(vetores, df["candidato_id"].to_numpy(), quantizacao=args.quantizacao)
+    caminho = caminho_indice_para(PROCESSED_DATA_FILE)
+    salvar_indice(indice, caminho, cache.identificador)
+    tamanho_mb = (indice["vetores"].nbytes + (indice["escalas"].nbytes if "escalas" in indice else 0)) / 1e6
+    print(f"\n✅ Índice com {len(indice['ids'])} candidatos e {len(indice['centroides'])} listas salvo em '{caminho}' "
+          f"(vetores {args.quantizacao}: {tamanho_mb:.1f} MB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# indice_busca.py
+# Índice invertido por tokens para a busca por palavras-chave nas informações do candidato.
+import re
+from collections import Counter
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from compatibilidade import mascara_textos_validos
+
+# CONFIGURAÇÕES
+# Tokens preservam termos técnicos como "c++", "c#" e "node.js"
+PADRAO_TOKEN = re.compile(r"\w[\w#+]*(?:\.\w[\w#+]*)*")
+PADRAO_PALAVRA = re.compile(r"\w+")
+CAMPOS_CANDIDATO = {
+    "candidato_cv": "CV do Candidato",
+    "candidato_nome": "Nome do Candidato",
+    "situacao_candidado": "Situação da Candidatura",
+}
+# Relevância: BM25 sobre o CV, devolvendo só os melhores resultados
+CAMPO_RELEVANCIA = "candidato_cv"
+K1_BM25 = 1.2
+B_BM25 = 0.75
+LIMITE_RANKING = 500
+
+
+def tokenizar(texto):
+    return PADRAO_TOKEN.findall(texto.lower())
+
+
+class IndiceCampo:
+    """Postings de um campo: termo -> valores distintos que o contêm -> linhas do DataFrame.
+
+    Textos repetidos (o mesmo CV em várias candidaturas) são tokenizados uma única vez.
+    Cada posting guarda a frequência do termo no texto e cada texto o seu número
+    de tokens, as estatísticas usadas pelo BM25.
+    """
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+        valores = np.asarray(valores, dtype=object)
+        validos = mascara_textos_validos(valores) if len(valores) else np.zeros(0, dtype=bool)
+        self.codigos = codigos.astype(np.int32)
+        self.valores = valores
+        self.validos = validos
+
+        # Postings achatados: [id_valor, frequência, id_valor, frequência, ...]
+        postings = {}
+        self.comprimentos = np.zeros(len(valores), dtype=np.int32)
+        for id_valor in np.flatnonzero(validos):
+            tokens = tokenizar(valores[id_valor])
+            self.comprimentos[id_valor] = len(tokens)
+            for termo, frequencia in Counter(tokens).items():
+                postings.setdefault(termo, []).extend((id_valor, frequencia))
+        self.n_documentos = int(np.count_nonzero(validos))
+        self.comprimento_medio = float(self.comprimentos.sum()) / max(self.n_documentos, 1)
+
+        # Vocabulário ordenado em um único texto para buscar substrings em C (re)
+        self.termos = sorted(postings)
+        self.vocabulario = "".join(termo + "\n" for termo in self.termos)
+        self.inicio_termos = np.zeros(len(self.termos), dtype=np.int64)
+        if self.termos:
+            self.inicio_termos[1:] = np.cumsum([len(termo) + 1 for termo in self.termos[:-1]])
+        # Frequência de documento de cada termo = tamanho da sua lista de postings
+        self.frequencia_documentos = np.array([len(postings[termo]) // 2 for termo in self.termos], dtype=np.int64)
+        self.offsets = np.zeros(len(self.termos) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(self.frequencia_documentos)
+        pares = np.fromiter(
+            (valor for termo in self.termos for valor in postings[termo]),
+            dtype=np.int32, count=2 * int(self.offsets[-1]),
+        ).reshape(-1, 2)
+        self.postings = np.ascontiguousarray(pares[:, 0])
+        self.frequencias = np.ascontiguousarray(pares[:, 1])
+
+    def _termos_contendo(self, fragmento):
+        """Índices dos termos do vocabulário que contêm o fragmento"""
+        posicoes = [m.start() for m in re.finditer(re.escape(fragmento), self.vocabulario)]
+        if not posicoes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.searchsorted(self.inicio_termos, posicoes, side="right") - 1)
+
+    def _valores_com_termos(self, termos):
+        if len(termos) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate([self.postings[self.offsets[t]:self.offsets[t + 1]] for t in termos]))
+
+    def valores_com(self, keyword):
+        """IDs dos valores distintos cujo texto contém a keyword (mesma semântica de `in`)"""
+        keyword = keyword.lower()
+        if PADRAO_PALAVRA.fullmatch(keyword):
+            # Uma sequência de \w nunca atravessa a fronteira de um token: o índice basta
+            return self._valores_com_termos(self._termos_contendo(keyword))
+
+        # Frases e termos com pontuação: intersecção dos postings + verificação no texto
+        tokens = tokenizar(keyword)
+        if tokens:
+            candidatos = reduce(np.intersect1d, (self._valores_com_termos(self._termos_contendo(t)) for t in tokens))
+        else:
+            candidatos = np.flatnonzero(self.validos)
+        return np.array([v for v in candidatos if keyword in self.valores[v].lower()], dtype=np.int32)
+
+    def _frequencias_keyword(self, keyword):
+        """Ocorrências da keyword em cada valor distinto (soma das frequências dos termos que a contêm)"""
+        keyword = keyword.lower()
+        if PADRAO_PALAVRA.fullmatch(keyword):
+            termos = self._termos_contendo(keyword)
+            if len(termos) == 0:
+                return np.zeros(len(self.valores), dtype=np.float64)
+            fatias = [slice(self.offsets[t], self.offsets[t + 1]) for t in termos]
+            return np.bincount(
+                np.concatenate([self.postings[f] for f in fatias]),
+                weights=np.concatenate([self.frequencias[f] for f in fatias]),
+                minlength=len(self.valores),
+            )
+        # Frases e termos com pontuação: contagem direta nos textos que os contêm
+        frequencias = np.zeros(len(self.valores), dtype=np.float64)
+        for id_valor in self.valores_com(keyword):
+            frequencias[id_valor] = self.valores[id_valor].lower().count(keyword)
+        return frequencias
+
+    def pontuar(self, keywords, k1=K1_BM25, b=B_BM25):
+        """Score BM25 das keywords em cada valor distinto, acumulado keyword a keyword"""
+        scores = np.zeros(len(self.valores), dtype=np.float64)
+        normalizacao = k1 * (1 - b + b * self.comprimentos / max(self.comprimento_medio, 1e-9))
+        for keyword in dict.fromkeys(keywords):
+            frequencias = self._frequencias_keyword(keyword)
+            n_com_keyword = np.count_nonzero(frequencias)
+            if n_com_keyword == 0:
+                continue
+            idf = np.log(1 + (self.n_documentos - n_com_keyword + 0.5) / (n_com_keyword + 0.5))
+            scores += idf * frequencias * (k1 + 1) / (frequencias + normalizacao)
+        return scores
+
+    def linhas_com(self, keyword):
+        """Linhas (ordenadas) do DataFrame cujo campo contém a keyword"""
+        mascara = np.zeros(len(self.valores) + 1, dtype=bool)
+        mascara[self.valores_com(keyword)] = True
+        # O código -1 (nulo) aponta para a última posição, sempre False
+        return np.flatnonzero(mascara[self.codigos])
+
+
+class IndiceBusca:
+    """Índice invertido dos campos do candidato (CV, nome e situação)"""
+
+    def __init__(self, df, campos=CAMPOS_CANDIDATO):
+        self.campos = {coluna: IndiceCampo(df[coluna]) for coluna in campos if coluna in df.columns}
+        self.rotulos = {coluna: campos[coluna] for coluna in self.campos}
+
+    def pares(self, keywords):
+        """(keyword, campo) na ordem dos bits das flags de `buscar`"""
+        return [(keyword, coluna) for keyword in dict.fromkeys(keywords) for coluna in self.campos]
+
+    def buscar(self, keywords):
+        """Linhas que contêm TODAS as keywords + onde cada uma foi encontrada.
+
+        Retorna (linhas, flags): flags[i] tem um bit por par de `pares(keywords)`,
+        ligado quando a keyword está naquele campo da linha linhas[i].
+        """
+        if not keywords:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        linhas_por_campo = self._linhas_por_campo(keywords)
+        linhas = reduce(np.intersect1d, self._linhas_por_keyword(linhas_por_campo))
+        return linhas, self._flags(keywords, linhas, linhas_por_campo)
+
+    def ranquear(self, keywords, estrito=False, limite=LIMITE_RANKING):
+        """Linhas mais relevantes pelo BM25 do CV (maior score primeiro).
+
+        No modo estrito só entram linhas com TODAS as keywords (mesmo filtro de
+        `buscar`); senão basta uma. Retorna (linhas, scores, flags, matches, total),
+        com no máximo `limite` linhas, matches = keywords encontradas em cada linha
+        e total = número de linhas que passaram pelo filtro.
+        """
+        vazio = np.zeros(0, dtype=np.int64)
+        if not keywords:
+            return vazio, np.zeros(0, dtype=np.float32), vazio, vazio, 0
+
+        linhas_por_campo = self._linhas_por_campo(keywords)
+        linhas_por_keyword = self._linhas_por_keyword(linhas_por_campo)
+        combinar = np.intersect1d if estrito else np.union1d
+        linhas = reduce(combinar, linhas_por_keyword)
+        total = len(linhas)
+
+        # Score por texto distinto; o código -1 (sem CV) aponta para o 0 no fim
+        scores = np.zeros(len(linhas))
+        indice = self.campos.get(CAMPO_RELEVANCIA)
+        if indice is not None:
+            scores_valores = np.append(indice.pontuar(keywords), 0.0)
+            scores = scores_valores[indice.codigos[linhas]]
+
+        # Seleção parcial dos melhores; só eles são ordenados
+        if total > limite:
+            melhores = np.argpartition(-scores, limite - 1)[:limite]
+            linhas, scores = linhas[melhores], scores[melhores]
+        ordem = np.lexsort((linhas, -scores))
+        linhas, scores = linhas[ordem], scores[ordem]
+
+        matches = sum(np.isin(linhas, linhas_keyword).astype(np.int64) for linhas_keyword in linhas_por_keyword)
+        return linhas, scores.astype(np.float32), self._flags(keywords, linhas, linhas_por_campo), matches, total
+
+    def _linhas_por_campo(self, keywords):
+        return {
+            keyword: {coluna: indice.linhas_com(keyword) for coluna, indice in self.campos.items()}
+            for keyword in keywords
+        }
+
+    def _linhas_por_keyword(self, linhas_por_campo):
+        return [
+            reduce(np.union1d, campos.values(), np.zeros(0, dtype=np.int64))
+            for campos in linhas_por_campo.values()
+        ]
+
+    def _flags(self, keywords, linhas, linhas_por_campo):
+        # Cada linha recebe um código com um bit por (keyword, campo)
+        pares = self.pares(keywords)
+        flags = np.zeros(len(linhas), dtype=object if len(pares) > 62 else np.int64)
+        for bit, (keyword, coluna) in enumerate(pares):
+            flags += np.isin(linhas, linhas_por_campo[keyword][coluna]).astype(flags.dtype) << bit
+        return flags
+
+    def encontrado_em(self, keywords, flag):
+        """Flags de uma linha no formato {keyword: [rótulos dos campos]}"""
+        encontrado = {keyword: [] for keyword in dict.fromkeys(keywords)}
+        for bit, (keyword, coluna) in enumerate(self.pares(keywords)):
+            if (int(flag) >> bit) & 1:
+                encontrado[keyword].append(self.rotulos[coluna])
+        return encontrado
+
+
+class IndiceIds:
+    """Hash candidato_id -> posições das linhas (um candidato tem várias candidaturas)"""
+
+    def __init__(self, serie):
+        self.codigos, valores = pd.factorize(pd.Series(serie).astype("string"), use_na_sentinel=True)
+        self.posicao_id = {valor: i for i, valor in enumerate(valores)}
+        # Linhas agrupadas por ID em um único array (ordem original dentro de cada ID)
+        self.linhas = np.argsort(self.codigos, kind="stable")[np.count_nonzero(self.codigos < 0):]
+        self.offsets = np.zeros(len(valores) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(self.codigos[self.codigos >= 0], minlength=len(valores)))
+
+    def linhas_do_id(self, candidato_id):
+        """Posições (ordenadas) das linhas com o ID exato"""
+        i = self.posicao_id.get(str(candidato_id))
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.linhas[self.offsets[i]:self.offsets[i + 1]]
@@ -0,0 +1,129 @@
+# indice_nomes.py
+# Índice de trigramas dos nomes dos candidatos: busca sem acentos/maiúsculas e busca aproximada.
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from compatibilidade import mascara_textos_validos
+
+# CONFIGURAÇÕES
+LIMIAR_SIMILARIDADE = 0.4
+LIMITE_NOMES_SEMELHANTES = 100
+PADRAO_SEPARADOR = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar_nome(texto):
+    """Nome sem acentos, em minúsculas e com palavras separadas por um único espaço"""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return PADRAO_SEPARADOR.sub(" ", sem_acentos.lower()).strip()
+
+
+def trigramas(nome_normalizado):
+    """Trigramas de cada palavra com bordas ("  jo", " jo", ...), como no pg_trgm"""
+    gramas = set()
+    for palavra in nome_normalizado.split():
+        palavra = f"  {palavra} "
+        gramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return gramas
+
+
+def _trigramas_internos(consulta):
+    """Trigramas sem bordas: presentes em qualquer nome que contenha a consulta"""
+    gramas = set()
+    for palavra in consulta.split():
+        gramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return gramas
+
+
+class IndiceNomes:
+    """Postings trigrama -> nomes distintos -> linhas do DataFrame.
+
+    Cada nome distinto é normalizado e decomposto uma única vez; as consultas
+    só percorrem os postings dos trigramas da própria consulta.
+    """
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+        valores = np.asarray(valores, dtype=object)
+        validos = mascara_textos_validos(valores) if len(valores) else np.zeros(0, dtype=bool)
+        self.codigos = codigos.astype(np.int32)
+        self.nomes = [normalizar_nome(valor) if valido else "" for valor, valido in zip(valores, validos)]
+
+        postings = {}
+        self.n_trigramas = np.zeros(len(self.nomes), dtype=np.int32)
+        for id_nome, nome in enumerate(self.nomes):
+            gramas = trigramas(nome)
+            self.n_trigramas[id_nome] = len(gramas)
+            for grama in gramas:
+                postings.setdefault(grama, []).append(id_nome)
+
+        self.id_trigrama = {grama: i for i, grama in enumerate(postings)}
+        tamanhos = np.array([len(ids) for ids in postings.values()], dtype=np.int64)
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(tamanhos)
+        self.postings = np.fromiter(
+            (id_nome for ids in postings.values() for id_nome in ids),
+            dtype=np.int32, count=int(self.offsets[-1]),
+        )
+
+    def _postings_de(self, grama):
+        i = self.id_trigrama.get(grama)
+        if i is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _linhas_dos_nomes(self, ids_nomes):
+        mascara = np.zeros(len(self.nomes) + 1, dtype=bool)
+        mascara[ids_nomes] = True
+        # O código -1 (nulo) aponta para a última posição, sempre False
+        return np.flatnonzero(mascara[self.codigos])
+
+    def exatos(self, consulta):
+        """Linhas (ordenadas) cujo nome contém a consulta, ignorando acentos e maiúsculas"""
+        consulta = normalizar_nome(consulta)
+        if not consulta:
+            return np.zeros(0, dtype=np.int64)
+        gramas = _trigramas_internos(consulta)
+        if gramas:
+            candidatos = self._postings_de(gramas.pop())
+            for grama in gramas:
+                candidatos = np.intersect1d(candidatos, self._postings_de(grama), assume_unique=True)
+        else:
+            # Consultas curtas (palavras com menos de 3 letras) verificam todos os nomes
+            candidatos = range(len(self.nomes))
+        ids = [i for i in candidatos if consulta in self.nomes[i]]
+        return self._linhas_dos_nomes(np.array(ids, dtype=np.int64))
+
+    def semelhantes(self, consulta, limite=LIMITE_NOMES_SEMELHANTES, limiar=LIMIAR_SIMILARIDADE):
+        """Linhas dos nomes mais parecidos com a consulta e a similaridade (0 a 1) de cada uma.
+
+        A similaridade é a fração dos trigramas da consulta presentes no nome,
+        o que favorece nomes parciais ("joao silva" em "João da Silva"); empates
+        são desfeitos pela similaridade de Jaccard. Retorna (linhas, similaridades)
+        em ordem decrescente, com no máximo `limite` nomes distintos.
+        """
+        gramas = trigramas(normalizar_nome(consulta))
+        if not gramas:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Trigramas em comum com cada nome: contagem dos IDs nos postings da consulta
+        listas = [self._postings_de(grama) for grama in gramas]
+        comuns = np.bincount(np.concatenate(listas), minlength=len(self.nomes))
+        cobertura = comuns / len(gramas)
+        ids = np.flatnonzero(cobertura >= limiar)
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        jaccard = comuns[ids] / (len(gramas) + self.n_trigramas[ids] - comuns[ids])
+        ordem = np.lexsort((ids, -jaccard, -cobertura[ids]))[:limite]
+        ids = ids[ordem]
+
+        # Cada nome pode aparecer em várias candidaturas: expandir para as linhas
+        posicao = np.full(len(self.nomes) + 1, -1, dtype=np.int64)
+        posicao[ids] = np.arange(len(ids))
+        linhas = self._linhas_dos_nomes(ids)
+        linhas = linhas[np.argsort(posicao[self.codigos[linhas]], kind="stable")]
+        return linhas, cobertura[self.codigos[linhas]].astype(np.float32)
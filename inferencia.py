@@ -0,0 +1,67 @@
+# inferencia.py
+# Probabilidade de contratação com o modelo do train_model.py, em lote para todos os candidatos de uma vaga.
+import json
+import os
+
+import joblib
+import numpy as np
+
+from features import VERSAO_FEATURES, colunas_features, construir_features
+
+# CONFIGURAÇÕES
+MODEL_FILE = "modelo_contratacao.pkl"
+# Versão e colunas das features do treino e encoder dos embeddings, gravados ao lado do modelo
+META_FILE = "modelo_contratacao.meta.json"
+
+
+class ModeloContratacao:
+    """Modelo + colunas das features com que foi treinado"""
+
+    def __init__(self, modelo, colunas):
+        self.modelo = modelo
+        self.colunas = list(colunas)
+
+    def probabilidades(self, X):
+        """Probabilidade da classe 'contratado' para todas as linhas em uma única chamada"""
+        if len(X) == 0:
+            return np.zeros(0, dtype=np.float32)
+        # lgb.Booster: predict já devolve a probabilidade da classe positiva
+        return np.asarray(self.modelo.predict(X), dtype=np.float32)
+
+
+def salvar_modelo(modelo, colunas, identificador, caminho_modelo=MODEL_FILE, caminho_meta=META_FILE):
+    """Grava o modelo e, por último, os metadados que o validam na carga"""
+    joblib.dump(modelo, caminho_modelo)
+    temporario = caminho_meta + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_FEATURES, 'colunas': list(colunas), 'encoder': identificador}, f)
+    os.replace(temporario, caminho_meta)
+
+
+def carregar_modelo(dimensao, identificador, caminho_modelo=MODEL_FILE, caminho_meta=META_FILE):
+    """Modelo salvo pelo train_model.py, ou None se faltar ou se foi treinado com outras features.
+
+    `dimensao` e `identificador` descrevem o encoder em uso (identificador_encoder):
+    embeddings de outro backend não são os que o modelo viu no treino.
+    """
+    if not (os.path.exists(caminho_modelo) and os.path.exists(caminho_meta)):
+        return None
+    with open(caminho_meta, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('versao') != VERSAO_FEATURES or meta.get('colunas') != colunas_features(dimensao):
+        return None
+    if meta.get('encoder') != identificador:
+        return None
+    return ModeloContratacao(joblib.load(caminho_modelo), meta['colunas'])
+
+
+def probabilidade_contratacao(modelo, encoder, cache, df):
+    """Probabilidade de contratação de cada linha do DataFrame.
+
+    As features são as mesmas do treino (features.py); os embeddings vêm do
+    cache, os mesmos já usados na compatibilidade.
+    """
+    X, colunas = construir_features(df, encoder, cache)
+    if colunas != modelo.colunas:
+        raise ValueError("As features não correspondem às do treino; execute 'python train_model.py' novamente.")
+    return modelo.probabilidades(X)
@@ -0,0 +1,473 @@
+# ingestao.py
+# Unificação de prospects/applicants/vagas em uma tabela de candidaturas.
+import codecs
+import json
+import os
+import sqlite3
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from agregados import COLUNAS_ORIGEM, caminho_agregados_para, construir_cubo, gravar_cubo
+from competencias import MAX_COMPETENCIAS_MASCARA, ExtratorCompetencias, carregar_dicionario
+from perfil_cv import TIPO_NIVEL_FORMACAO, TIPO_NIVEL_INGLES, extrair_perfis
+
+# =============================================================================
+# CONFIGURAÇÕES
+# =============================================================================
+# Campos de applicants.json, na ordem retornada por projetar_candidato
+COLUNAS_CANDIDATO = [
+    'candidato_nome', 'candidato_cv', 'candidato_nivel_academico', 'candidato_nivel_ingles', 'candidato_remuneracao',
+]
+COLUNAS_UNIFICADAS = [
+    'candidato_id', 'vaga_id', 'situacao_candidado', 'candidato_nome',
+    'candidato_cv', 'vaga_titulo', 'vaga_competencias',
+    'candidato_nivel_academico', 'candidato_nivel_ingles', 'candidato_remuneracao',
+]
+SCHEMA_UNIFICADO = pa.schema([(coluna, pa.string()) for coluna in COLUNAS_UNIFICADAS])
+# Colunas de baixa cardinalidade (ou texto repetido por candidatura) ficam como dicionário
+COLUNAS_DICIONARIO = [
+    'vaga_id', 'situacao_candidado', 'vaga_titulo', 'vaga_competencias',
+    'candidato_nivel_academico', 'candidato_nivel_ingles',
+]
+# Perfil derivado do CV, calculado uma única vez no pré-processamento
+COLUNAS_PERFIL = ['anos_experiencia', 'nivel_ingles', 'nivel_formacao', 'competencias_mascara']
+TIPOS_ORDINAIS = {'nivel_ingles': TIPO_NIVEL_INGLES, 'nivel_formacao': TIPO_NIVEL_FORMACAO}
+SCHEMA_PERFIL = pa.schema([
+    ('anos_experiencia', pa.int16()),
+    ('nivel_ingles', pa.string()),
+    ('nivel_formacao', pa.string()),
+    ('competencias_mascara', pa.uint64()),
+])
+SCHEMA_PROCESSADO = pa.schema([
+    (campo.name, pa.dictionary(pa.int32(), pa.string()) if campo.name in COLUNAS_DICIONARIO or campo.name in TIPOS_ORDINAIS else campo.type)
+    for campo in list(SCHEMA_UNIFICADO) + list(SCHEMA_PERFIL)
+])
+# Nomes das competências (ordem dos bits de competencias_mascara) nos metadados do parquet
+CHAVE_METADADOS_COMPETENCIAS = b'competencias'
+# Tamanho pedido da amostra, quando o parquet não é a base completa
+CHAVE_METADADOS_AMOSTRA = b'amostra'
+PROCESSED_DATA_FILE = 'dados_processados.parquet'
+TAMANHO_ROW_GROUP = 16384
+VALOR_NAO_INFORMADO = 'Não informado'
+RANDOM_STATE = 42
+TAMANHO_BLOCO_LEITURA = 1 << 20
+TAMANHO_LOTE = 10000
+# Limite de parâmetros por consulta ao sqlite temporário dos candidatos
+MAX_PARAMETROS_SQLITE = 900
+TIMEOUT_DOWNLOAD = 60
+
+# =============================================================================
+# PROJEÇÃO DOS REGISTROS (comum aos modos em memória e streaming)
+# =============================================================================
+
+def projetar_candidato(applicant_details):
+    """(nome, cv, nível acadêmico, nível de inglês, remuneração) de um registro de applicants.json"""
+    infos_basicas = applicant_details.get('infos_basicas', {})
+    formacao = applicant_details.get('formacao_e_idiomas', {})
+    remuneracao = applicant_details.get('informacoes_profissionais', {}).get('remuneracao')
+    return (
+        infos_basicas.get('nome'),
+        applicant_details.get('cv_pt'),
+        formacao.get('nivel_academico'),
+        formacao.get('nivel_ingles'),
+        None if remuneracao is None else str(remuneracao),
+    )
+
+def projetar_vaga(vaga_details):
+    """(título, competências) de um registro de vagas.json"""
+    return (
+        vaga_details.get('informacoes_basicas', {}).get('titulo_vaga'),
+        vaga_details.get('perfil_vaga', {}).get('competencia_tecnicas_e_comportamentais'),
+    )
+
+def unificar_registros(prospects_data, applicants_data, vagas_data):
+    """Combina os 3 dicionários já carregados em um DataFrame de candidaturas"""
+    candidaturas_list = []
+
+    for vaga_id, data in prospects_data.items():
+        vaga_titulo, vaga_competencias = projetar_vaga(vagas_data.get(vaga_id, {}))
+        for prospect in data.get('prospects', []):
+            candidato_id = str(prospect.get('codigo'))
+            candidato = projetar_candidato(applicants_data.get(candidato_id, {}))
+
+            candidaturas_list.append({
+                'candidato_id': candidato_id,
+                'vaga_id': vaga_id,
+                'situacao_candidado': prospect.get('situacao_candidado'),
+                'vaga_titulo': vaga_titulo,
+                'vaga_competencias': vaga_competencias,
+                **dict(zip(COLUNAS_CANDIDATO, candidato)),
+            })
+
+    return pd.DataFrame(candidaturas_list, columns=COLUNAS_UNIFICADAS)
+
+def carregar_fontes_em_memoria(caminhos):
+    """Lê os 3 JSONs locais inteiros (modo em memória)"""
+    dados = {}
+    for nome in ('prospects', 'applicants', 'vagas'):
+        with open(caminhos[nome], 'r', encoding='utf-8') as f:
+            dados[nome] = json.load(f)
+    return dados['prospects'], dados['applicants'], dados['vagas']
+
+def posicoes_amostra(total, tamanho_amostra):
+    """Posições sorteadas por DataFrame.sample(n=tamanho_amostra, random_state=RANDOM_STATE)"""
+    return np.random.RandomState(RANDOM_STATE).choice(total, size=tamanho_amostra, replace=False)
+
+def finalizar_base(df_final, tamanho_amostra=None):
+    """Amostragem opcional + preenchimento dos nulos"""
+    if tamanho_amostra and len(df_final) > tamanho_amostra:
+        df_final = df_final.sample(n=tamanho_amostra, random_state=RANDOM_STATE)
+
+    for col in df_final.columns:
+        if col in COLUNAS_PERFIL:
+            # Nulo no perfil significa "não especificado" e mantém o tipo da coluna
+            continue
+        if isinstance(df_final[col].dtype, pd.CategoricalDtype):
+            # Colunas de dicionário: o valor padrão entra como mais uma categoria
+            if df_final[col].isna().any():
+                if VALOR_NAO_INFORMADO not in df_final[col].cat.categories:
+                    df_final[col] = df_final[col].cat.add_categories(VALOR_NAO_INFORMADO)
+                df_final[col] = df_final[col].fillna(VALOR_NAO_INFORMADO)
+        elif df_final[col].dtype == 'object' or pd.api.types.is_string_dtype(df_final[col].dtype):
+            df_final[col] = df_final[col].fillna(VALOR_NAO_INFORMADO)
+    return df_final
+
+# =============================================================================
+# MODO STREAMING (memória limitada pelo tamanho do lote)
+# =============================================================================
+
+@contextmanager
+def abrir_fonte(fonte):
+    """Abre um caminho local ou URL como arquivo binário sem carregá-lo inteiro"""
+    if str(fonte).startswith(('http://', 'https://')):
+        with requests.get(fonte, stream=True, timeout=TIMEOUT_DOWNLOAD) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield response.raw
+    else:
+        with open(fonte, 'rb') as arquivo:
+            yield arquivo
+
+def iterar_objeto_json(arquivo, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    """Percorre incrementalmente um objeto JSON de topo, gerando pares (chave, valor).
+
+    Só o registro atual (e o bloco de leitura) fica em memória, então o custo não
+    depende do tamanho total do arquivo.
+    """
+    decodificador_utf8 = codecs.getincrementaldecoder('utf-8')()
+    decodificador_json = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    fim_arquivo = False
+
+    def ler_mais(minimo=tamanho_bloco):
+        nonlocal buffer, pos, fim_arquivo
+        bloco = arquivo.read(max(minimo, tamanho_bloco))
+        fim_arquivo = not bloco
+        buffer = buffer[pos:] + decodificador_utf8.decode(bloco, final=fim_arquivo)
+        pos = 0
+
+    def proximo_caractere():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n\ufeff':
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if fim_arquivo:
+                raise ValueError("JSON terminou inesperadamente.")
+            ler_mais()
+
+    def decodificar_valor():
+        nonlocal pos
+        while True:
+            try:
+                valor, fim = decodificador_json.raw_decode(buffer, pos)
+                # Um valor que termina no fim do buffer pode estar truncado (ex.: número)
+                if fim < len(buffer) or fim_arquivo:
+                    pos = fim
+                    return valor
+            except json.JSONDecodeError:
+                if fim_arquivo:
+                    raise
+            ler_mais(minimo=len(buffer) - pos)
+
+    def esperar(caractere):
+        nonlocal pos
+        encontrado = proximo_caractere()
+        if encontrado != caractere:
+            raise ValueError(f"JSON inválido: esperado '{caractere}', encontrado '{encontrado}'.")
+        pos += 1
+
+    esperar('{')
+    if proximo_caractere() == '}':
+        return
+    while True:
+        proximo_caractere()
+        chave = decodificar_valor()
+        esperar(':')
+        proximo_caractere()
+        yield chave, decodificar_valor()
+        separador = proximo_caractere()
+        pos += 1
+        if separador == '}':
+            return
+        if separador != ',':
+            raise ValueError(f"JSON inválido: esperado ',' ou '}}', encontrado '{separador}'.")
+
+def _carregar_vagas_projetadas(fonte_vagas):
+    with abrir_fonte(fonte_vagas) as arquivo:
+        return {vaga_id: projetar_vaga(detalhes) for vaga_id, detalhes in iterar_objeto_json(arquivo)}
+
+@contextmanager
+def _candidatos_projetados(fonte_applicants, tamanho_lote):
+    """Campos projetados dos candidatos em um sqlite temporário, com chave candidato_id.
+
+    Os candidatos são gravados em disco lote a lote e consultados por lote de
+    candidaturas, então applicants.json nunca fica inteiro em memória. O arquivo
+    é apagado ao final.
+    """
+    with tempfile.TemporaryDirectory(prefix='talentmatch_') as diretorio:
+        conexao = sqlite3.connect(os.path.join(diretorio, 'candidatos.sqlite'))
+        try:
+            # Arquivo descartável: sem journal nem fsync
+            conexao.execute('PRAGMA journal_mode = OFF')
+            conexao.execute('PRAGMA synchronous = OFF')
+            campos = ', '.join(f'{coluna} TEXT' for coluna in COLUNAS_CANDIDATO)
+            conexao.execute(f'CREATE TABLE candidatos (candidato_id TEXT PRIMARY KEY, {campos}) WITHOUT ROWID')
+            # Chave repetida: vale o último registro, como em json.load
+            insercao = f"INSERT OR REPLACE INTO candidatos VALUES ({', '.join('?' * (len(COLUNAS_CANDIDATO) + 1))})"
+            registros = []
+            with abrir_fonte(fonte_applicants) as arquivo:
+                for candidato_id, detalhes in iterar_objeto_json(arquivo):
+                    registros.append((candidato_id, *projetar_candidato(detalhes)))
+                    if len(registros) >= tamanho_lote:
+                        conexao.executemany(insercao, registros)
+                        registros.clear()
+            conexao.executemany(insercao, registros)
+            conexao.commit()
+            yield conexao
+        finally:
+            conexao.close()
+
+def _buscar_candidatos(conexao, candidato_ids):
+    """Arrays Arrow com os campos projetados de cada id (nulos para ids ausentes), na ordem pedida"""
+    encontrados = {}
+    distintos = list(dict.fromkeys(candidato_ids))
+    for inicio in range(0, len(distintos), MAX_PARAMETROS_SQLITE):
+        trecho = distintos[inicio:inicio + MAX_PARAMETROS_SQLITE]
+        consulta = f"SELECT * FROM candidatos WHERE candidato_id IN ({', '.join('?' * len(trecho))})"
+        for candidato_id, *campos in conexao.execute(consulta, trecho):
+            encontrados[candidato_id] = campos
+    vazio = [None] * len(COLUNAS_CANDIDATO)
+    linhas = [encontrados.get(candidato_id, vazio) for candidato_id in candidato_ids]
+    return {coluna: pa.array([linha[i] for linha in linhas], type=pa.string()) for i, coluna in enumerate(COLUNAS_CANDIDATO)}
+
+def iterar_lotes_unificados(fontes, tamanho_lote=TAMANHO_LOTE, posicoes=None):
+    """Gera (RecordBatch, posições) com as candidaturas unificadas, na ordem de prospects.json.
+
+    `fontes` mapeia 'prospects', 'applicants' e 'vagas' para caminhos ou URLs.
+    Se `posicoes` for informado, apenas as candidaturas nessas posições são geradas.
+    """
+    vagas = _carregar_vagas_projetadas(fontes['vagas'])
+    selecionadas = None if posicoes is None else set(int(p) for p in posicoes)
+
+    colunas = {coluna: [] for coluna in ('candidato_id', 'vaga_id', 'situacao_candidado', 'vaga_titulo', 'vaga_competencias')}
+    posicoes_lote = []
+
+    def montar_lote(candidatos):
+        arrays = {coluna: pa.array(valores, type=pa.string()) for coluna, valores in colunas.items()}
+        arrays.update(_buscar_candidatos(candidatos, colunas['candidato_id']))
+        lote = pa.record_batch([arrays[coluna] for coluna in COLUNAS_UNIFICADAS], schema=SCHEMA_UNIFICADO)
+        posicoes_geradas = list(posicoes_lote)
+        for valores in colunas.values():
+            valores.clear()
+        posicoes_lote.clear()
+        return lote, posicoes_geradas
+
+    posicao = 0
+    with _candidatos_projetados(fontes['applicants'], tamanho_lote) as candidatos, \
+            abrir_fonte(fontes['prospects']) as arquivo:
+        for vaga_id, data in iterar_objeto_json(arquivo):
+            vaga_titulo, vaga_competencias = vagas.get(vaga_id, (None, None))
+            for prospect in data.get('prospects', []):
+                if selecionadas is None or posicao in selecionadas:
+                    colunas['candidato_id'].append(str(prospect.get('codigo')))
+                    colunas['vaga_id'].append(vaga_id)
+                    colunas['situacao_candidado'].append(prospect.get('situacao_candidado'))
+                    colunas['vaga_titulo'].append(vaga_titulo)
+                    colunas['vaga_competencias'].append(vaga_competencias)
+                    posicoes_lote.append(posicao)
+                    if len(posicoes_lote) >= tamanho_lote:
+                        yield montar_lote(candidatos)
+                posicao += 1
+        if posicoes_lote:
+            yield montar_lote(candidatos)
+
+def contar_candidaturas(fonte_prospects):
+    """Número total de candidaturas, sem manter prospects.json em memória"""
+    with abrir_fonte(fonte_prospects) as arquivo:
+        return sum(len(data.get('prospects', [])) for _, data in iterar_objeto_json(arquivo))
+
+def criar_base_streaming(fontes, tamanho_amostra=None, tamanho_lote=TAMANHO_LOTE, preencher_nulos=True):
+    """Mesmo resultado de unificar_registros + finalizar_base, lendo as fontes em streaming"""
+    posicoes = None
+    if tamanho_amostra:
+        total = contar_candidaturas(fontes['prospects'])
+        if total > tamanho_amostra:
+            posicoes = posicoes_amostra(total, tamanho_amostra)
+
+    lotes, indice = [], []
+    for lote, posicoes_lote in iterar_lotes_unificados(fontes, tamanho_lote, posicoes):
+        lotes.append(lote)
+        indice.extend(posicoes_lote)
+
+    df_final = pa.Table.from_batches(lotes, schema=SCHEMA_UNIFICADO).to_pandas()
+    if posicoes is not None:
+        # Mesmos rótulos e ordem de linhas produzidos por DataFrame.sample
+        df_final.index = pd.Index(indice)
+        df_final = df_final.loc[posicoes]
+    return finalizar_base(df_final) if preencher_nulos else df_final
+
+# =============================================================================
+# BASE PROCESSADA (parquet tipado)
+# =============================================================================
+
+def criar_extrator_competencias():
+    """Extrator usado para a coluna competencias_mascara"""
+    extrator = ExtratorCompetencias(carregar_dicionario())
+    if len(extrator.nomes) > MAX_COMPETENCIAS_MASCARA:
+        raise ValueError(f"O dicionário tem {len(extrator.nomes)} competências; o máximo é {MAX_COMPETENCIAS_MASCARA}.")
+    return extrator
+
+def calcular_colunas_perfil(cvs, extrator=None, n_processos=None):
+    """Colunas de perfil (experiência, inglês, formação e competências) de uma série de CVs"""
+    return extrair_perfis(cvs, n_processos, extrator or criar_extrator_competencias())
+
+def _tipar_lote(tabela, extrator):
+    """Converte as colunas para o schema processado (dicionários + nulos reais + perfil do CV)"""
+    if not set(COLUNAS_PERFIL) <= set(tabela.column_names):
+        # O lote roda em um processo do pool: o perfil é calculado aqui mesmo, sem novo paralelismo
+        perfis = calcular_colunas_perfil(tabela.column('candidato_cv').to_pandas(), extrator, n_processos=1)
+        for campo in SCHEMA_PERFIL:
+            tabela = tabela.append_column(campo, pa.array(perfis[campo.name].astype(object), type=campo.type, from_pandas=True))
+
+    colunas = []
+    for campo in SCHEMA_PROCESSADO:
+        coluna = tabela.column(campo.name)
+        if pa.types.is_dictionary(coluna.type):
+            coluna = coluna.cast(pa.string())
+        if pa.types.is_dictionary(campo.type):
+            coluna = coluna.dictionary_encode()
+        else:
+            coluna = coluna.cast(campo.type)
+        colunas.append(coluna)
+    return pa.Table.from_arrays(colunas, schema=SCHEMA_PROCESSADO)
+
+def _tabela_de_df(df):
+    """Tabela Arrow das colunas unificadas (e do perfil, se o DataFrame já o tiver)"""
+    colunas = COLUNAS_UNIFICADAS + [coluna for coluna in COLUNAS_PERFIL if coluna in df.columns]
+    df = df[colunas].astype(object)
+    # Texto de preenchimento antigo vira nulo de verdade
+    df = df.mask(df == VALOR_NAO_INFORMADO)
+    schema = pa.schema([campo for campo in list(SCHEMA_UNIFICADO) + list(SCHEMA_PERFIL) if campo.name in colunas])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def _mapear_em_processos(funcao, itens, n_processos):
+    """map ordenado em um pool de processos, com no máximo 2 itens em voo por processo"""
+    if n_processos <= 1:
+        yield from map(funcao, itens)
+        return
+    with ProcessPoolExecutor(max_workers=n_processos) as executor:
+        pendentes = deque()
+        for item in itens:
+            pendentes.append(executor.submit(funcao, item))
+            if len(pendentes) >= 2 * n_processos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+def gravar_base_processada(dados, caminho=PROCESSED_DATA_FILE, tamanho_row_group=TAMANHO_ROW_GROUP, n_processos=None,
+                           amostra=None):
+    """Grava a base unificada em parquet tipado, de forma atômica.
+
+    `dados` pode ser um DataFrame ou um iterável de RecordBatches (modo streaming,
+    com memória limitada ao lote). As colunas de perfil do CV são calculadas em
+    paralelo, lote a lote, quando ainda não estão presentes. Ao final o cubo de
+    agregados do painel dos contratados é gravado ao lado do parquet. `amostra`
+    marca nos metadados que o parquet é uma amostra, e não a base completa.
+    """
+    extrator = criar_extrator_competencias()
+    if isinstance(dados, pd.DataFrame):
+        lotes = _tabela_de_df(dados).to_batches(max_chunksize=TAMANHO_LOTE)
+    else:
+        lotes = dados
+    tabelas = _mapear_em_processos(
+        partial(_tipar_lote, extrator=extrator),
+        (pa.Table.from_batches([lote]) for lote in lotes),
+        n_processos or os.cpu_count() or 1,
+    )
+
+    metadados = {CHAVE_METADADOS_COMPETENCIAS: json.dumps(extrator.nomes)}
+    if amostra:
+        metadados[CHAVE_METADADOS_AMOSTRA] = str(int(amostra))
+    schema = SCHEMA_PROCESSADO.with_metadata(metadados)
+    temporario = caminho + '.tmp'
+    with pq.ParquetWriter(temporario, schema, compression='zstd') as escritor:
+        # Lotes acumulados até completar um row group; só a sobra fica para o próximo
+        pendentes, linhas_pendentes = [], 0
+        for tabela in tabelas:
+            pendentes.append(tabela.replace_schema_metadata(schema.metadata))
+            linhas_pendentes += tabela.num_rows
+            if linhas_pendentes >= tamanho_row_group:
+                acumulada = pa.concat_tables(pendentes)
+                completas = linhas_pendentes - linhas_pendentes % tamanho_row_group
+                escritor.write_table(acumulada.slice(0, completas), row_group_size=tamanho_row_group)
+                pendentes, linhas_pendentes = [acumulada.slice(completas)], linhas_pendentes - completas
+        if linhas_pendentes:
+            escritor.write_table(pa.concat_tables(pendentes), row_group_size=tamanho_row_group)
+    os.replace(temporario, caminho)
+
+    # Só colunas pequenas (sem texto de CV) são relidas para o cubo
+    origem = ler_base_processada(caminho, colunas=COLUNAS_ORIGEM)
+    gravar_cubo(construir_cubo(origem, extrator.nomes), caminho_agregados_para(caminho))
+
+def escrever_base_streaming(fontes, caminho=PROCESSED_DATA_FILE, tamanho_lote=TAMANHO_LOTE,
+                            tamanho_row_group=TAMANHO_ROW_GROUP, n_processos=None):
+    """Unifica as fontes e grava o parquet sem nunca materializar a base inteira"""
+    lotes = (lote for lote, _ in iterar_lotes_unificados(fontes, tamanho_lote))
+    gravar_base_processada(lotes, caminho, tamanho_row_group, n_processos)
+
+def ler_base_processada(caminho=PROCESSED_DATA_FILE, colunas=None):
+    """Lê a base processada (colunas de dicionário chegam como category; níveis como ordinais)"""
+    df = pd.read_parquet(caminho, columns=colunas)
+    if 'anos_experiencia' in df.columns:
+        df['anos_experiencia'] = df['anos_experiencia'].astype('Int16')
+    for coluna, tipo in TIPOS_ORDINAIS.items():
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(object).astype(tipo)
+    return df
+
+def colunas_da_base(caminho=PROCESSED_DATA_FILE):
+    """Colunas presentes no parquet, sem ler os dados"""
+    return pq.read_schema(caminho).names
+
+def competencias_da_base(caminho=PROCESSED_DATA_FILE):
+    """Nomes das competências na ordem dos bits de competencias_mascara"""
+    metadados = pq.read_schema(caminho).metadata or {}
+    return json.loads(metadados.get(CHAVE_METADADOS_COMPETENCIAS, b'[]'))
+
+def amostra_da_base(caminho=PROCESSED_DATA_FILE):
+    """Tamanho da amostra gravada no parquet, ou None se ele é a base completa"""
+    metadados = pq.read_schema(caminho).metadata or {}
+    amostra = metadados.get(CHAVE_METADADOS_AMOSTRA)
+    return int(amostra) if amostra else None
@@ -0,0 +1,76 @@
+# matriz_vagas.py
+# Matriz pré-calculada de embeddings das vagas para recomendação reversa (candidato -> vagas).
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_embeddings import NOME_ENCODER
+from compatibilidade import VALOR_NAO_INFORMADO, mascara_textos_validos
+
+# CONFIGURAÇÕES
+MATRIZ_VAGAS_FILE = "matriz_vagas.npz"
+COLUNAS_VAGA = ["vaga_id", "vaga_titulo", "vaga_competencias"]
+
+
+def extrair_vagas(df):
+    """Uma linha por vaga com competências válidas, ordenada por ID"""
+    vagas = df[COLUNAS_VAGA].drop_duplicates("vaga_id")
+    vagas = vagas[mascara_textos_validos(vagas["vaga_competencias"])]
+    vagas = vagas.astype(object).fillna(VALOR_NAO_INFORMADO).astype(str)
+    return vagas.sort_values("vaga_id").reset_index(drop=True)
+
+
+def impressao_digital_vagas(vagas, nome_encoder=NOME_ENCODER):
+    """Hash do conjunto de vagas: muda sempre que uma vaga é criada, removida ou editada"""
+    h = hashlib.sha1(nome_encoder.encode("utf-8"))
+    for linha in vagas.itertuples(index=False):
+        h.update("\x00".join(linha).encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+def construir_matriz_vagas(vagas, encoder, cache, nome_encoder=NOME_ENCODER):
+    """Codifica cada texto distinto de competências uma única vez"""
+    textos, linha_texto = np.unique(vagas["vaga_competencias"].to_numpy(dtype=str), return_inverse=True)
+    vetores = cache.codificar(encoder, textos.tolist())
+    return {
+        "impressao": np.array(impressao_digital_vagas(vagas, nome_encoder)),
+        "vaga_ids": vagas["vaga_id"].to_numpy(dtype=str),
+        "vaga_titulos": vagas["vaga_titulo"].to_numpy(dtype=str),
+        "linha_texto": linha_texto.astype(np.int32),
+        "vetores": np.ascontiguousarray(vetores, dtype=np.float32),
+    }
+
+
+def carregar_matriz_vagas(df, encoder, cache, caminho=MATRIZ_VAGAS_FILE):
+    """Carrega a matriz do disco, reconstruindo-a apenas se as vagas mudaram"""
+    vagas = extrair_vagas(df)
+    impressao = impressao_digital_vagas(vagas, cache.identificador)
+    if os.path.exists(caminho):
+        with np.load(caminho) as dados:
+            if str(dados["impressao"]) == impressao:
+                return {chave: dados[chave] for chave in dados.files}
+
+    matriz = construir_matriz_vagas(vagas, encoder, cache, cache.identificador)
+    np.savez(caminho, **matriz)
+    return matriz
+
+
+def recomendar_vagas(matriz, vetor_cv, k=10, excluir_vaga_ids=()):
+    """Ranking das vagas para um CV: um produto matriz-vetor sobre os textos distintos"""
+    scores = (matriz["vetores"] @ vetor_cv)[matriz["linha_texto"]]
+    if len(excluir_vaga_ids) > 0:
+        scores[np.isin(matriz["vaga_ids"], list(excluir_vaga_ids))] = -np.inf
+    k = min(k, len(scores))
+    if k == 0:
+        return pd.DataFrame(columns=["vaga_id", "vaga_titulo", "compatibilidade"])
+    melhores = np.argpartition(-scores, k - 1)[:k]
+    melhores = melhores[np.argsort(-scores[melhores])]
+    melhores = melhores[np.isfinite(scores[melhores])]
+    return pd.DataFrame({
+        "vaga_id": matriz["vaga_ids"][melhores],
+        "vaga_titulo": matriz["vaga_titulos"][melhores],
+        "compatibilidade": scores[melhores],
+    })
@@ -1,140 +1,236 @@
 import streamlit as st
 import pandas as pd
 import re
+import os
+import numpy as np
+
+from busca_hibrida import CodificadorConsultas, buscar_hibrido, construir_matriz_cvs
+from cache_embeddings import CacheEmbeddings
+from compatibilidade import mascara_textos_validos
+from competencias import nomes_da_mascara
+from encoders import criar_encoder
+from indice_busca import IndiceBusca, IndiceIds
+from indice_nomes import IndiceNomes
+from ingestao import PROCESSED_DATA_FILE, competencias_da_base, finalizar_base, ler_base_processada
+from matriz_vagas import carregar_matriz_vagas, recomendar_vagas
 
 st.set_page_config(layout="wide", page_title="Busca de Candidatos")
 st.title("👩‍💻 Busca de Candidatos")
 st.markdown("Use um ou mais campos abaixo para buscar candidatos. **Não é necessário preencher todos os campos.**")
 
+CAMINHO_DADOS = PROCESSED_DATA_FILE
+TIPOS_BUSCA = ['habilidades', 'nome', 'id']
+MODOS_BUSCA_NOME = {"parcial": "Parcial (contém o texto)", "aproximada": "Aproximada (tolera erros de digitação)"}
+
 @st.cache_data
-def carregar_dados(caminho_arquivo="dados_processados.parquet"):
+def carregar_dados(caminho_arquivo=CAMINHO_DADOS):
     try:
-        df = pd.read_parquet(caminho_arquivo)
+        df = finalizar_base(ler_base_processada(caminho_arquivo))
         # Debug: mostrar informações sobre os dados
         st.sidebar.write("📊 Informações dos dados:")
         st.sidebar.write(f"- Total de candidatos: {len(df)}")
         st.sidebar.write(f"- CVs não vazios: {df['candidato_cv'].notna().sum()}")
-        st.sidebar.write(f"- CVs com conteúdo: {(df['candidato_cv'] != 'Não informado').sum()}")
+        st.sidebar.write(f"- CVs com conteúdo: {mascara_textos_validos(df['candidato_cv']).sum()}")
         return df
     except FileNotFoundError:
         st.error(f"Ficheiro '{caminho_arquivo}' não encontrado! Execute o 'preprocess.py' primeiro.")
         return None
 
-def buscar_por_habilidades(df, keywords):
-    """Busca candidatos que contenham as keywords APENAS nas informações do candidato"""
-    resultados = []
+@st.cache_resource
+def carregar_encoder():
+    return criar_encoder()
+
+@st.cache_resource
+def carregar_cache_embeddings():
+    return CacheEmbeddings()
+
+@st.cache_resource
+def carregar_codificador_consultas():
+    """Encoder das buscas híbridas com cache LRU das consultas já vistas"""
+    return CodificadorConsultas(carregar_encoder())
+
+@st.cache_data
+def carregar_nomes_competencias(caminho_arquivo=CAMINHO_DADOS):
+    """Nomes das competências na ordem dos bits de competencias_mascara"""
+    return competencias_da_base(caminho_arquivo)
+
+@st.cache_resource(show_spinner="Preparando matriz de vagas...")
+def obter_matriz_vagas(_df, versao_dados):
+    """Matriz de embeddings das vagas (reconstruída apenas quando as vagas mudam)"""
+    return carregar_matriz_vagas(_df, carregar_encoder(), carregar_cache_embeddings())
+
+def exibir_vagas_recomendadas(candidato, n_vagas=10):
+    """Ranking de todas as vagas para o CV do candidato"""
+    st.write("### 🧭 Vagas Recomendadas")
+    cv_texto = candidato.get('candidato_cv', '')
+    if not mascara_textos_validos([cv_texto])[0]:
+        st.info("ℹ️ Sem CV para recomendar vagas.")
+        return
     
-    for idx, candidato in df.iterrows():
-        # Dicionário para rastrear onde cada keyword foi encontrada
-        encontrado_em = {keyword: [] for keyword in keywords}
-        
-        # VERIFICAR APENAS INFORMAÇÕES DO CANDIDATO (remover informações da vaga)
-        
-        # Campo: CV (informação do candidato)
-        cv_texto = candidato.get('candidato_cv', '')
-        if pd.notna(cv_texto) and cv_texto != 'Não informado':
-            cv_lower = str(cv_texto).lower()
-            for keyword in keywords:
-                if keyword.lower() in cv_lower:
-                    encontrado_em[keyword].append('CV do Candidato')
-        
-        # Campo: Nome do Candidato (informação do candidato)
-        nome_candidato = candidato.get('candidato_nome', '')
-        if pd.notna(nome_candidato) and nome_candidato != 'Não informado':
-            nome_lower = str(nome_candidato).lower()
-            for keyword in keywords:
-                if keyword.lower() in nome_lower:
-                    encontrado_em[keyword].append('Nome do Candidato')
-        
-        # Campo: Situação (informação do candidato)
-        situacao = candidato.get('situacao_candidado', '')
-        if pd.notna(situacao) and situacao != 'Não informado':
-            situacao_lower = str(situacao).lower()
-            for keyword in keywords:
-                if keyword.lower() in situacao_lower:
-                    encontrado_em[keyword].append('Situação da Candidatura')
-        
-        # Verificar se TODAS as keywords foram encontradas em pelo menos um campo DO CANDIDATO
-        todas_encontradas = all(len(encontrado_em[keyword]) > 0 for keyword in keywords)
-        
-        if todas_encontradas:
-            # Contar número de palavras encontradas (não ocorrências)
-            palavras_encontradas = sum(1 for keyword in keywords if len(encontrado_em[keyword]) > 0)
-            resultados.append({
-                'candidato': candidato,
-                'matches': palavras_encontradas,
-                'encontrado_em': encontrado_em,
-                'tipo_busca': 'habilidades'
-            })
+    matriz = obter_matriz_vagas(df_completo, os.path.getmtime(CAMINHO_DADOS))
+    vetor_cv = carregar_cache_embeddings().codificar(carregar_encoder(), [cv_texto])[0]
+    recomendadas = recomendar_vagas(matriz, vetor_cv, k=n_vagas)
     
-    return resultados
+    for _, vaga in recomendadas.iterrows():
+        col_vaga, col_score = st.columns([4, 1])
+        with col_vaga:
+            marcador = " 📌 *(vaga desta candidatura)*" if vaga['vaga_id'] == str(candidato.get('vaga_id')) else ""
+            st.write(f"**{vaga['vaga_titulo']}** (ID: {vaga['vaga_id']}){marcador}")
+        with col_score:
+            st.write(f"{vaga['compatibilidade'] * 100:.1f}%")
+
+@st.cache_resource(show_spinner="Indexando as informações dos candidatos...")
+def obter_indice_busca(_df, versao_dados):
+    """Índice invertido dos campos do candidato (reconstruído quando o parquet muda)"""
+    return IndiceBusca(_df)
+
+@st.cache_resource(show_spinner="Indexando os IDs dos candidatos...")
+def obter_indice_ids(_df, versao_dados):
+    """Hash candidato_id -> linhas (reconstruído quando o parquet muda)"""
+    return IndiceIds(_df['candidato_id'])
+
+def criar_resultados(linhas, tipo_busca, matches=1, similaridade=1.0, flags=0, score=0.0):
+    """Resultados em colunas numpy: uma posição por linha encontrada, sem copiar as linhas do DataFrame"""
+    n = len(linhas)
+    return {
+        'linhas': np.asarray(linhas, dtype=np.int64),
+        'tipo': np.full(n, TIPOS_BUSCA.index(tipo_busca), dtype=np.int8),
+        'matches': np.broadcast_to(np.asarray(matches, dtype=np.int16), (n,)).copy(),
+        'similaridade': np.broadcast_to(np.asarray(similaridade, dtype=np.float32), (n,)).copy(),
+        'flags': np.broadcast_to(np.asarray(flags), (n,)).copy(),
+        'score': np.broadcast_to(np.asarray(score, dtype=np.float32), (n,)).copy(),
+    }
+
+def filtrar_resultados(resultados, mascara):
+    return {coluna: valores[mascara] for coluna, valores in resultados.items()}
+
+def concatenar_resultados(partes):
+    return {coluna: np.concatenate([parte[coluna] for parte in partes]) for coluna in partes[0]}
+
+def versao_cache_embeddings():
+    """Data de modificação do índice do cache de embeddings (muda a cada lote gravado)"""
+    caminho = carregar_cache_embeddings().caminho_indice
+    return os.path.getmtime(caminho) if os.path.exists(caminho) else 0.0
 
-def buscar_por_nome(df, nome_busca):
-    """Busca candidatos por nome (busca parcial)"""
-    resultados = []
+@st.cache_resource(show_spinner="Carregando os embeddings dos CVs...", max_entries=1)
+def obter_matriz_cvs(_df, versao_dados, versao_cache):
+    """(matriz, faltantes) dos CVs distintos já no cache (reconstruída quando o parquet ou o cache mudam)"""
+    cache = carregar_cache_embeddings()
+    cache.recarregar()
+    return construir_matriz_cvs(obter_indice_busca(_df, versao_dados), cache)
+
+def buscar_por_habilidades(df, keywords, estrito=False, hibrida=False):
+    """Busca candidatos pelas keywords APENAS nas informações do candidato, ordenados por BM25 do CV.
     
-    for idx, candidato in df.iterrows():
-        nome_candidato = candidato.get('candidato_nome', '')
-        if pd.notna(nome_candidato) and nome_candidato != 'Não informado':
-            if nome_busca.lower() in nome_candidato.lower():
-                resultados.append({
-                    'candidato': candidato,
-                    'matches': 1,
-                    'encontrado_em': {'nome': ['Nome do Candidato']},
-                    'tipo_busca': 'nome'
-                })
+    No modo híbrido o ranking BM25 é fundido (RRF) com a similaridade semântica entre
+    as keywords e os CVs. Retorna (resultados, total): os mais relevantes e quantos
+    candidatos passaram pelo filtro.
+    """
+    # Postings de cada keyword em vez de percorrer todas as linhas
+    versao_dados = os.path.getmtime(CAMINHO_DADOS)
+    indice = obter_indice_busca(df, versao_dados)
+    if hibrida:
+        vetor_consulta = carregar_codificador_consultas().vetor(", ".join(keywords))
+        matriz_cvs, _ = obter_matriz_cvs(df, versao_dados, versao_cache_embeddings())
+        linhas, scores, flags, matches = buscar_hibrido(
+            indice, matriz_cvs, vetor_consulta, keywords, estrito=estrito
+        )
+        total = len(linhas)
+    else:
+        linhas, scores, flags, matches, total = indice.ranquear(keywords, estrito=estrito)
+    return criar_resultados(linhas, 'habilidades', matches=matches, flags=flags, score=scores), total
+
+@st.cache_resource(show_spinner="Indexando os nomes dos candidatos...")
+def obter_indice_nomes(_df, versao_dados):
+    """Índice de trigramas dos nomes (reconstruído quando o parquet muda)"""
+    return IndiceNomes(_df['candidato_nome'])
+
+def buscar_por_nome(df, nome_busca, modo='parcial'):
+    """Busca candidatos por nome, sem diferenciar acentos e maiúsculas (parcial ou aproximada)"""
+    indice = obter_indice_nomes(df, os.path.getmtime(CAMINHO_DADOS))
+    if modo == 'aproximada':
+        linhas, similaridades = indice.semelhantes(nome_busca)
+    else:
+        linhas = indice.exatos(nome_busca)
+        similaridades = [1.0] * len(linhas)
     
-    return resultados
+    return criar_resultados(linhas, 'nome', similaridade=similaridades)
 
 def buscar_por_id(df, id_busca):
     """Busca candidatos por ID exato"""
-    resultados = []
-    
-    for idx, candidato in df.iterrows():
-        candidato_id = candidato.get('candidato_id', '')
-        if pd.notna(candidato_id) and str(candidato_id) == str(id_busca):
-            resultados.append({
-                'candidato': candidato,
-                'matches': 1,
-                'encontrado_em': {'id': ['ID do Candidato']},
-                'tipo_busca': 'id'
-            })
-    
-    return resultados
+    indice = obter_indice_ids(df, os.path.getmtime(CAMINHO_DADOS))
+    return criar_resultados(indice.linhas_do_id(id_busca), 'id')
 
-def buscar_candidatos(df, keywords=None, nome=None, id_candidato=None):
-    """Busca candidatos usando os critérios fornecidos"""
+def sem_candidatos_repetidos(resultados, codigos_id, vistos):
+    """Remove candidatos já vistos (e repetições dentro do próprio critério); IDs nulos nunca repetem"""
+    codigos = codigos_id[resultados['linhas']]
+    _, primeiros = np.unique(codigos, return_index=True)
+    primeira_vez = np.zeros(len(codigos), dtype=bool)
+    primeira_vez[primeiros] = True
+    mascara = (codigos < 0) | (primeira_vez & ~np.isin(codigos, list(vistos)))
+    return filtrar_resultados(resultados, mascara)
+
+def buscar_candidatos(df, keywords=None, nome=None, id_candidato=None, modo_nome='parcial', estrito=False,
+                      hibrida=False):
+    """Busca candidatos usando os critérios fornecidos (resultados em colunas numpy, já ordenados).
+    
+    Retorna (resultados, omitidos), com omitidos = candidatos por habilidades além do limite do ranking.
+    """
+    resultados = criar_resultados([], 'habilidades')
+    omitidos = 0
     
-    # Se nenhum critério foi fornecido, retornar lista vazia
+    # Se nenhum critério foi fornecido, retornar resultado vazio
     if not any([keywords, nome, id_candidato]):
-        return []
+        return resultados, omitidos
     
-    resultados = []
+    # Um candidato aparece uma única vez: conjunto dos IDs já incluídos
+    codigos_id = obter_indice_ids(df, os.path.getmtime(CAMINHO_DADOS)).codigos
+    partes = [resultados]
     
     # Buscar por habilidades (se keywords fornecidas)
     if keywords:
-        resultados_habilidades = buscar_por_habilidades(df, keywords)
-        resultados.extend(resultados_habilidades)
+        resultados_habilidades, total = buscar_por_habilidades(df, keywords, estrito, hibrida)
+        partes.append(resultados_habilidades)
+        omitidos = total - len(resultados_habilidades['linhas'])
+    
+    vistos = set(codigos_id[partes[-1]['linhas']].tolist())
     
-    # Buscar por nome (se nome fornecido)
+    # Buscar por nome (se nome fornecido), evitando duplicados
     if nome:
-        resultados_nome = buscar_por_nome(df, nome)
-        # Evitar duplicados
-        for resultado in resultados_nome:
-            candidato_id = resultado['candidato'].get('candidato_id')
-            if not any(r['candidato'].get('candidato_id') == candidato_id for r in resultados):
-                resultados.append(resultado)
+        partes.append(sem_candidatos_repetidos(buscar_por_nome(df, nome, modo_nome), codigos_id, vistos))
+        vistos.update(codigos_id[partes[-1]['linhas']].tolist())
     
-    # Buscar por ID (se ID fornecido)
+    # Buscar por ID (se ID fornecido), evitando duplicados
     if id_candidato:
-        resultados_id = buscar_por_id(df, id_candidato)
-        # Evitar duplicados
-        for resultado in resultados_id:
-            candidato_id = resultado['candidato'].get('candidato_id')
-            if not any(r['candidato'].get('candidato_id') == candidato_id for r in resultados):
-                resultados.append(resultado)
+        partes.append(sem_candidatos_repetidos(buscar_por_id(df, id_candidato), codigos_id, vistos))
     
-    return resultados
+    resultados = concatenar_resultados(partes)
+    
+    # Habilidades primeiro (já vêm ordenadas por relevância), depois nome e ID
+    ordem = np.argsort(resultados['tipo'] != 0, kind='stable')
+    return filtrar_resultados(resultados, ordem), omitidos
+
+def materializar_resultados(df, resultados, inicio, fim, keywords):
+    """Linhas completas apenas da página visível"""
+    indice = obter_indice_busca(df, os.path.getmtime(CAMINHO_DADOS)) if keywords else None
+    pagina = []
+    for posicao in range(inicio, min(fim, len(resultados['linhas']))):
+        tipo_busca = TIPOS_BUSCA[resultados['tipo'][posicao]]
+        if tipo_busca == 'habilidades':
+            encontrado_em = indice.encontrado_em(keywords, resultados['flags'][posicao])
+        elif tipo_busca == 'nome':
+            encontrado_em = {'nome': ['Nome do Candidato']}
+        else:
+            encontrado_em = {'id': ['ID do Candidato']}
+        pagina.append({
+            'candidato': df.iloc[resultados['linhas'][posicao]],
+            'matches': int(resultados['matches'][posicao]),
+            'similaridade': float(resultados['similaridade'][posicao]),
+            'score': float(resultados['score'][posicao]),
+            'encontrado_em': encontrado_em,
+            'tipo_busca': tipo_busca
+        })
+    return pagina
 
 def exibir_descricao_completa(candidato, keywords, encontrado_em, tipo_busca):
     """Exibe a descrição completa do candidato"""
@@ -179,6 +275,8 @@ def exibir_descricao_completa(candidato, keywords, encontrado_em, tipo_busca):
     with col_vaga2:
         st.write(f"**ID da Vaga:** {candidato.get('vaga_id', 'N/A')}")
     
+    exibir_vagas_recomendadas(candidato)
+    
     # Currículo Completo
     st.write("### 📝 Currículo Completo")
     cv_texto = candidato.get('candidato_cv', '')
@@ -213,6 +311,12 @@ def exibir_descricao_completa(candidato, keywords, encontrado_em, tipo_busca):
             linhas = cv_texto.count('\n') + 1
             st.write(f"**📊 Número de linhas:** {linhas}")
         
+        # Competências técnicas extraídas no pré-processamento (mesmas do perfil dos contratados)
+        mascara = candidato.get('competencias_mascara')
+        competencias = nomes_da_mascara(mascara, carregar_nomes_competencias()) if pd.notna(mascara) else []
+        if competencias:
+            st.write(f"**🧩 Competências técnicas:** {', '.join(competencias)}")
+        
         # Detalhamento das palavras-chave encontradas no CV (apenas para busca por habilidades)
         if tipo_busca == 'habilidades' and keywords:
             st.write("### 🔍 Detalhamento das Palavras-chave no CV:")
@@ -275,6 +379,10 @@ if 'pagina_atual' not in st.session_state:
     st.session_state.pagina_atual = 1
 if 'resultados_busca' not in st.session_state:
     st.session_state.resultados_busca = None
+if 'resultados_omitidos' not in st.session_state:
+    st.session_state.resultados_omitidos = 0
+if 'busca_hibrida' not in st.session_state:
+    st.session_state.busca_hibrida = False
 
 ITENS_POR_PAGINA = 10
 
@@ -303,6 +411,19 @@ if df_completo is not None:
                 "Palavras-chave (separadas por vírgula)",
                 placeholder="ex: python, java, gestão"
             )
+            estrito = st.checkbox(
+                "Exigir todas as palavras",
+                help="Sem esta opção basta uma das palavras; os resultados são ordenados pela relevância no CV (BM25)"
+            )
+            # Os embeddings dos CVs vêm só do cache: sem cobertura completa o modo híbrido fica desativado
+            _, cvs_sem_vetor = obter_matriz_cvs(df_completo, os.path.getmtime(CAMINHO_DADOS), versao_cache_embeddings())
+            hibrida = st.checkbox(
+                "Busca semântica (híbrida)",
+                disabled=cvs_sem_vetor > 0,
+                help="Também encontra CVs com o mesmo sentido em outras palavras (ex.: \"engenheiro de dados\" e \"data engineer\")"
+                if cvs_sem_vetor == 0 else
+                f"Indisponível: {cvs_sem_vetor} CVs ainda sem embedding. Execute 'python codificacao_paralela.py' para preencher o cache."
+            )
             if keywords_input:
                 st.caption("Busca nas informações do candidato (CV, nome, situação)")
         
@@ -312,8 +433,14 @@ if df_completo is not None:
                 "Nome do candidato",
                 placeholder="ex: Maria, João Silva"
             )
+            modo_nome = st.radio(
+                "Modo da busca por nome",
+                options=list(MODOS_BUSCA_NOME),
+                format_func=MODOS_BUSCA_NOME.get,
+                horizontal=True
+            )
             if nome_input:
-                st.caption("Busca parcial no nome do candidato")
+                st.caption("Ignora acentos e maiúsculas (\"joao\" encontra \"João\")")
         
         with col3:
             st.subheader("🆔 Por ID")
@@ -338,8 +465,12 @@ if df_completo is not None:
                 st.session_state.id_busca = id_candidato
                 
                 # Realizar busca
-                resultados = buscar_candidatos(df_completo, keywords, nome, id_candidato)
+                resultados, omitidos = buscar_candidatos(
+                    df_completo, keywords, nome, id_candidato, modo_nome, estrito, hibrida
+                )
+                st.session_state.busca_hibrida = hibrida
                 st.session_state.resultados_busca = resultados
+                st.session_state.resultados_omitidos = omitidos
                 st.session_state.pagina_atual = 1
                 
             else:
@@ -363,19 +494,21 @@ if df_completo is not None:
             if criterios:
                 st.info(" | ".join(criterios))
             
-            # Ordenar resultados (priorizar busca por habilidades)
-            resultados.sort(key=lambda x: (x['tipo_busca'] == 'habilidades', x['matches']), reverse=True)
-            
-            # Paginação
-            total_paginas = max(1, (len(resultados) + ITENS_POR_PAGINA - 1) // ITENS_POR_PAGINA)
+            # Paginação (resultados já ordenados; só a página visível vira linhas completas)
+            total_resultados = len(resultados['linhas'])
+            total_paginas = max(1, (total_resultados + ITENS_POR_PAGINA - 1) // ITENS_POR_PAGINA)
             inicio = (st.session_state.pagina_atual - 1) * ITENS_POR_PAGINA
             fim = inicio + ITENS_POR_PAGINA
-            resultados_pagina = resultados[inicio:fim]
+            resultados_pagina = materializar_resultados(
+                df_completo, resultados, inicio, fim, st.session_state.keywords_busca
+            )
             
-            st.metric("Candidatos Encontrados", f"{len(resultados)}")
+            st.metric("Candidatos Encontrados", f"{total_resultados + st.session_state.resultados_omitidos}")
+            if st.session_state.resultados_omitidos:
+                st.caption(f"Exibindo os {total_resultados} mais relevantes.")
             
-            if resultados:
-                st.success(f"✅ Encontrados {len(resultados)} candidatos!")
+            if total_resultados:
+                st.success(f"✅ Encontrados {total_resultados} candidatos!")
                 
                 # Controles de paginação
                 if total_paginas > 1:
@@ -432,12 +565,12 @@ if df_completo is not None:
                         
                         with col3:
                             if tipo_busca == 'habilidades':
-                                st.write("**Score:**")
-                                score_percent = min((resultado['matches'] / len(st.session_state.keywords_busca)) * 100, 100)
-                                st.write(f"**{int(score_percent)}%**")
+                                st.write("**Score híbrido:**" if st.session_state.busca_hibrida else "**Score BM25:**")
+                                casas = 4 if st.session_state.busca_hibrida else 2
+                                st.write(f"**{resultado['score']:.{casas}f}**")
                             else:
                                 st.write("**Match:**")
-                                st.write("**100%**")
+                                st.write(f"**{int(resultado.get('similaridade', 1.0) * 100)}%**")
                         
                         with col4:
                             if st.button("📄 Ver Descrição Completa", key=f"btn_{inicio + i}"):
@@ -452,9 +585,7 @@ if df_completo is not None:
                 col_stats1, col_stats2, col_stats3 = st.columns(3)
                 with col_stats1:
                     # Contar por tipo de busca
-                    por_habilidades = sum(1 for r in resultados if r['tipo_busca'] == 'habilidades')
-                    por_nome = sum(1 for r in resultados if r['tipo_busca'] == 'nome')
-                    por_id = sum(1 for r in resultados if r['tipo_busca'] == 'id')
+                    por_habilidades, por_nome, por_id = np.bincount(resultados['tipo'], minlength=len(TIPOS_BUSCA))
                     st.metric("Por Habilidades", por_habilidades)
                 with col_stats2:
                     st.metric("Por Nome", por_nome)
@@ -466,6 +597,6 @@ if df_completo is not None:
                 
                 # Sugerir buscas alternativas
                 st.info("💡 **Dicas para melhorar a busca:**")
-                st.write("- Para busca por nome: use apenas parte do nome")
+                st.write("- Para busca por nome: use apenas parte do nome ou o modo aproximado")
                 st.write("- Para busca por ID: verifique se o ID está correto")
                 st.write("- Para busca por habilidades: use palavras mais genéricas")
\ No newline at end of file
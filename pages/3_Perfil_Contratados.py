@@ -1,139 +1,76 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from collections import Counter
-import re
+
+from agregados import (
+    COLUNAS_ORIGEM, caminho_agregados_para, carregar_cubo, construir_cubo, contagem_por_situacao, resumir,
+)
+from competencias import nomes_da_mascara
+from ingestao import (
+    COLUNAS_PERFIL, PROCESSED_DATA_FILE, colunas_da_base, competencias_da_base, finalizar_base,
+    ler_base_processada,
+)
+from perfil_cv import ROTULO_NAO_ESPECIFICADO, TIPO_NIVEL_FORMACAO, TIPO_NIVEL_INGLES
 
 st.set_page_config(layout="wide", page_title="Perfil dos Contratados")
 st.title("📊 Perfil dos Candidatos Contratados")
 st.markdown("Análise das **características e competências** dos candidatos que foram contratados.")
 
+COLUNAS_ANALISE = ['candidato_id', 'candidato_nome', 'candidato_cv', 'situacao_candidado', 'vaga_titulo'] + COLUNAS_PERFIL
+
+# STATUS QUE REALMENTE REPRESENTAM CONTRATAÇÃO
+STATUS_CONTRATACAO = [
+    'Contratado pela Decision',
+    'Aprovado', 
+    'Contratado como Hunting'
+]
+
 @st.cache_data
-def carregar_dados(caminho_arquivo="dados_processados.parquet"):
+def carregar_dados(caminho_arquivo=PROCESSED_DATA_FILE):
     try:
-        df = pd.read_parquet(caminho_arquivo)
+        if not set(COLUNAS_ANALISE) <= set(colunas_da_base(caminho_arquivo)):
+            st.error(f"Arquivo '{caminho_arquivo}' sem as colunas de perfil! Execute o 'preprocess.py' novamente.")
+            return None
+        # Só as colunas usadas pela análise
+        df = finalizar_base(ler_base_processada(caminho_arquivo, colunas=COLUNAS_ANALISE))
         return df
     except FileNotFoundError:
         st.error(f"Arquivo '{caminho_arquivo}' não encontrado! Execute o 'preprocess.py' primeiro.")
         return None
 
-def extrair_experiencia(texto_cv):
-    """Extrai tempo de experiência do texto do CV"""
-    if not isinstance(texto_cv, str) or texto_cv == 'Não informado':
-        return "Não especificado"
-    
-    texto_cv = texto_cv.lower()
-    
-    # Padrões para encontrar experiência
-    padroes = [
-        r'(\d+)\s*anos?\s*(?:de\s*)?experiência',
-        r'experiência\s*de\s*(\d+)\s*anos?',
-        r'(\d+)\s*anos?\s*(?:de\s*)?exp',
-        r'exp\s*de\s*(\d+)\s*anos?',
-        r'(\d+)\s*anos?\s*na\s*área',
-        r'(\d+)\s*anos?\s*em\s*[a-záéíóúâêîôûãõç\s]+',
-    ]
-    
-    for padrao in padroes:
-        matches = re.findall(padrao, texto_cv)
-        if matches:
-            anos = max([int(match) for match in matches if match.isdigit()])
-            return f"{anos} anos"
-    
-    return "Não especificado"
-
-def detectar_nivel_ingles(texto_cv):
-    """Detecta nível de inglês no CV"""
-    if not isinstance(texto_cv, str) or texto_cv == 'Não informado':
-        return "Não especificado"
-    
-    texto_cv = texto_cv.lower()
-    
-    niveis = {
-        'avançado': ['avançado', 'advanced', 'fluente', 'fluent', 'c2', 'c1'],
-        'intermediário': ['intermediário', 'intermediate', 'b2', 'b1', 'intermediario'],
-        'básico': ['básico', 'basic', 'iniciante', 'beginner', 'a2', 'a1', 'basico'],
-        'nativo': ['nativo', 'native']
-    }
-    
-    for nivel, palavras in niveis.items():
-        for palavra in palavras:
-            if palavra in texto_cv:
-                return nivel.capitalize()
-    
-    return "Não especificado"
-
-def extrair_competencias_tecnicas(texto_cv):
-    """Extrai competências técnicas do CV"""
-    if not isinstance(texto_cv, str) or texto_cv == 'Não informado':
-        return []
-    
-    texto_cv = texto_cv.lower()
-    
-    competencias_comuns = [
-        'python', 'java', 'javascript', 'sql', 'html', 'css', 'react', 'angular', 'vue',
-        'node.js', 'docker', 'kubernetes', 'aws', 'azure', 'gcp', 'git', 'jenkins',
-        'machine learning', 'ai', 'data science', 'big data', 'tableau', 'power bi',
-        'excel', 'word', 'powerpoint', 'project management', 'scrum', 'agile',
-        'linux', 'windows', 'macos', 'oracle', 'mysql', 'postgresql', 'mongodb',
-        'php', 'c#', 'c++', 'ruby', 'go', 'rust', 'swift', 'kotlin'
-    ]
-    
-    encontradas = []
-    for competencia in competencias_comuns:
-        if competencia in texto_cv:
-            encontradas.append(competencia)
-    
-    return encontradas
+@st.cache_data
+def carregar_nomes_competencias(caminho_arquivo=PROCESSED_DATA_FILE):
+    """Nomes das competências na ordem dos bits de competencias_mascara"""
+    return competencias_da_base(caminho_arquivo)
 
-def extrair_formacao(texto_cv):
-    """Extrai informações de formação do CV"""
-    if not isinstance(texto_cv, str) or texto_cv == 'Não informado':
-        return "Não especificado"
-    
-    texto_cv = texto_cv.lower()
-    
-    formacoes = {
-        'doutorado': ['doutorado', 'phd', 'doutor'],
-        'mestrado': ['mestrado', 'mestre'],
-        'pós-graduação': ['pós-graduação', 'pos-graduacao', 'especialização', 'especializacao'],
-        'graduação': ['graduação', 'graduacao', 'bacharelado', 'licenciatura', 'tecnólogo', 'tecnologo'],
-        'técnico': ['técnico', 'tecnico', 'curso técnico'],
-        'ensino médio': ['ensino médio', 'ensino medio']
-    }
-    
-    for formacao, palavras in formacoes.items():
-        for palavra in palavras:
-            if palavra in texto_cv:
-                return formacao.capitalize()
-    
-    return "Não especificado"
+@st.cache_data
+def carregar_agregados(caminho_arquivo=PROCESSED_DATA_FILE):
+    """Cubo de contagens do preprocess.py (montado a partir da base se estiver ausente ou antigo)"""
+    caminho_cubo = caminho_agregados_para(caminho_arquivo)
+    if os.path.exists(caminho_cubo) and os.path.getmtime(caminho_cubo) >= os.path.getmtime(caminho_arquivo):
+        return carregar_cubo(caminho_cubo)
+    origem = ler_base_processada(caminho_arquivo, colunas=COLUNAS_ORIGEM)
+    return construir_cubo(origem, competencias_da_base(caminho_arquivo))
 
-def criar_analise_contratados(df):
+def criar_analise_contratados(df, cubo, vaga_titulo=None):
     """Cria análise completa dos candidatos contratados"""
     
-    # DEBUG: Mostrar todos os status únicos disponíveis
+    # DEBUG: Mostrar todos os status únicos disponíveis (contagens vêm do cubo)
     st.sidebar.write("🔍 **Status disponíveis:**")
-    status_unicos = df['situacao_candidado'].dropna().unique()
-    for status in sorted(status_unicos):
-        count = len(df[df['situacao_candidado'] == status])
-        st.sidebar.write(f"- {status}: {count}")
-    
-    # STATUS QUE REALMENTE REPRESENTAM CONTRATAÇÃO
-    status_contratacao_exatos = [
-        'Contratado pela Decision',
-        'Aprovado', 
-        'Contratado como Hunting'
-    ]
+    status_disponiveis = contagem_por_situacao(cubo, vaga_titulo)
+    for status in sorted(status_disponiveis.index):
+        st.sidebar.write(f"- {status}: {status_disponiveis[status]}")
     
     # Filtrar apenas os status exatos de contratação
-    df_contratados = df[df['situacao_candidado'].isin(status_contratacao_exatos)].copy()
+    df_contratados = df[df['situacao_candidado'].isin(STATUS_CONTRATACAO)].copy()
     
     # DEBUG: Mostrar o que foi encontrado
     st.sidebar.write("🎯 **Status identificados como contratação:**")
     if len(df_contratados) > 0:
-        status_contratados = df_contratados['situacao_candidado'].value_counts()
+        status_contratados = status_disponiveis[status_disponiveis.index.isin(STATUS_CONTRATACAO)]
         for status, count in status_contratados.items():
             st.sidebar.write(f"- {status}: {count}")
         
@@ -149,90 +86,62 @@ def criar_analise_contratados(df):
     
     st.success(f"✅ Encontrados **{len(df_contratados)}** candidatos contratados!")
     
-    # Aplicar análise aos CVs
-    st.info(f"📈 Analisando o perfil de **{len(df_contratados)}** candidatos contratados...")
-    
-    with st.spinner("Processando currículos..."):
-        # Extrair informações dos CVs
-        df_contratados['experiencia'] = df_contratados['candidato_cv'].apply(extrair_experiencia)
-        df_contratados['ingles'] = df_contratados['candidato_cv'].apply(detectar_nivel_ingles)
-        df_contratados['formacao'] = df_contratados['candidato_cv'].apply(extrair_formacao)
-        df_contratados['competencias'] = df_contratados['candidato_cv'].apply(extrair_competencias_tecnicas)
-    
     return df_contratados
 
-def exibir_metricas_gerais(df_contratados):
+def exibir_metricas_gerais(resumo):
     """Exibe métricas gerais dos contratados"""
     st.subheader("📊 Métricas Gerais")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_contratados = len(df_contratados)
+        total_contratados = int(resumo['total'].sum())
         st.metric("Total de Contratados", total_contratados)
     
     with col2:
         # Experiência média (apenas dos que especificaram)
-        df_com_experiencia = df_contratados[df_contratados['experiencia'] != 'Não especificado']
-        if len(df_com_experiencia) > 0:
-            anos_lista = []
-            for exp in df_com_experiencia['experiencia']:
-                numeros = re.findall(r'\d+', exp)
-                if numeros:
-                    anos_lista.append(int(numeros[0]))
-            
-            if anos_lista:
-                media_experiencia = sum(anos_lista) / len(anos_lista)
-                st.metric("Experiência Média", f"{media_experiencia:.1f} anos")
-            else:
-                st.metric("Experiência Média", "N/A")
+        experiencia = resumo['anos_experiencia']
+        if experiencia.sum() > 0:
+            media_experiencia = (experiencia.index.astype(int) * experiencia).sum() / experiencia.sum()
+            st.metric("Experiência Média", f"{media_experiencia:.1f} anos")
         else:
             st.metric("Experiência Média", "N/A")
     
     with col3:
         # Percentual com inglês avançado (apenas dos que especificaram)
-        df_com_ingles = df_contratados[df_contratados['ingles'] != 'Não especificado']
-        if len(df_com_ingles) > 0:
-            ingles_avancado = len(df_com_ingles[df_com_ingles['ingles'].str.contains('Avançado|Nativo', case=False, na=False)])
-            percent_ingles = (ingles_avancado / len(df_com_ingles)) * 100
+        ingles = resumo['nivel_ingles']
+        if ingles.sum() > 0:
+            avancado = pd.Categorical(ingles.index, dtype=TIPO_NIVEL_INGLES) >= 'Avançado'
+            percent_ingles = ingles[avancado].sum() / ingles.sum() * 100
             st.metric("Inglês Avançado/Nativo", f"{percent_ingles:.1f}%")
         else:
             st.metric("Inglês Avançado/Nativo", "N/A")
     
     with col4:
         # Percentual com ensino superior (apenas dos que especificaram)
-        df_com_formacao = df_contratados[df_contratados['formacao'] != 'Não especificado']
-        if len(df_com_formacao) > 0:
-            formacao_superior = len(df_com_formacao[df_com_formacao['formacao'].str.contains('Graduação|Mestrado|Doutorado|Pós-graduação', case=False, na=False)])
-            percent_formacao = (formacao_superior / len(df_com_formacao)) * 100
+        formacao = resumo['nivel_formacao']
+        if formacao.sum() > 0:
+            superior = pd.Categorical(formacao.index, dtype=TIPO_NIVEL_FORMACAO) >= 'Graduação'
+            percent_formacao = formacao[superior].sum() / formacao.sum() * 100
             st.metric("Ensino Superior", f"{percent_formacao:.1f}%")
         else:
             st.metric("Ensino Superior", "N/A")
 
-def exibir_distribuicao_experiencia(df_contratados):
+def exibir_distribuicao_experiencia(resumo):
     """Exibe gráfico de distribuição de experiência"""
     st.subheader("⏳ Distribuição de Experiência Profissional")
     
-    # Filtrar apenas experiências especificadas
-    df_com_experiencia = df_contratados[df_contratados['experiencia'] != 'Não especificado']
+    # Apenas experiências especificadas, ordenadas por anos
+    experiencia_counts = resumo['anos_experiencia']
     
-    if len(df_com_experiencia) == 0:
+    if experiencia_counts.sum() == 0:
         st.info("ℹ️ Nenhuma experiência profissional especificada nos currículos.")
         return
     
-    # Agrupar experiências
-    experiencia_counts = df_com_experiencia['experiencia'].value_counts()
-    
-    # Ordenar por anos de experiência
-    def ordenar_experiencia(exp):
-        numeros = re.findall(r'\d+', exp)
-        return int(numeros[0]) if numeros else 0
-    
-    experiencia_ordenada = sorted(experiencia_counts.index, key=ordenar_experiencia)
-    experiencia_counts = experiencia_counts.reindex(experiencia_ordenada)
+    experiencia_counts = experiencia_counts.iloc[experiencia_counts.index.astype(int).argsort()]
     
     fig = px.bar(
-        x=experiencia_counts.index,
+        x=[f"{anos} anos" for anos in experiencia_counts.index],
         y=experiencia_counts.values,
         title="Distribuição de Anos de Experiência",
         labels={'x': 'Anos de Experiência', 'y': 'Número de Contratados'}
@@ -240,19 +149,17 @@ def exibir_distribuicao_experiencia(df_contratados):
     fig.update_layout(xaxis_tickangle=-45)
     st.plotly_chart(fig, use_container_width=True)
 
-def exibir_nivel_ingles(df_contratados):
+def exibir_nivel_ingles(resumo):
     """Exibe gráfico de nível de inglês"""
     st.subheader("🌐 Nível de Inglês dos Contratados")
     
-    # Filtrar apenas níveis de inglês especificados
-    df_com_ingles = df_contratados[df_contratados['ingles'] != 'Não especificado']
+    # Apenas níveis de inglês especificados
+    ingles_counts = resumo['nivel_ingles'].sort_values(ascending=False, kind='stable')
     
-    if len(df_com_ingles) == 0:
+    if ingles_counts.sum() == 0:
         st.info("ℹ️ Nenhum nível de inglês especificado nos currículos.")
         return
     
-    ingles_counts = df_com_ingles['ingles'].value_counts()
-    
     fig = px.pie(
         values=ingles_counts.values,
         names=ingles_counts.index,
@@ -260,19 +167,17 @@ def exibir_nivel_ingles(df_contratados):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def exibir_formacao(df_contratados):
+def exibir_formacao(resumo):
     """Exibe gráfico de formação acadêmica"""
     st.subheader("🎓 Nível de Formação Acadêmica")
     
-    # Filtrar apenas formações especificadas
-    df_com_formacao = df_contratados[df_contratados['formacao'] != 'Não especificado']
+    # Apenas formações especificadas
+    formacao_counts = resumo['nivel_formacao'].sort_values(ascending=False, kind='stable')
     
-    if len(df_com_formacao) == 0:
+    if formacao_counts.sum() == 0:
         st.info("ℹ️ Nenhuma formação acadêmica especificada nos currículos.")
         return
     
-    formacao_counts = df_com_formacao['formacao'].value_counts()
-    
     fig = px.bar(
         x=formacao_counts.index,
         y=formacao_counts.values,
@@ -282,25 +187,18 @@ def exibir_formacao(df_contratados):
     fig.update_layout(xaxis_tickangle=-45)
     st.plotly_chart(fig, use_container_width=True)
 
-def exibir_competencias_populares(df_contratados):
+def exibir_competencias_populares(resumo):
     """Exibe competências técnicas mais populares"""
     st.subheader("💻 Competências Técnicas Mais Frequentes")
     
-    # Contar todas as competências
-    todas_competencias = []
-    for competencias in df_contratados['competencias']:
-        todas_competencias.extend(competencias)
-    
-    competencias_counts = Counter(todas_competencias)
-    top_competencias = competencias_counts.most_common(15)
+    # Contagens do cubo, desempate na ordem do dicionário de competências
+    competencias_counts = resumo['competencia'].reindex(carregar_nomes_competencias()).dropna().astype(int)
+    top_competencias = competencias_counts[competencias_counts > 0].sort_values(ascending=False, kind='stable').head(15)
     
-    if top_competencias:
-        competencias_nomes = [comp[0] for comp in top_competencias]
-        competencias_quantidades = [comp[1] for comp in top_competencias]
-        
+    if len(top_competencias) > 0:
         fig = px.bar(
-            x=competencias_nomes,
-            y=competencias_quantidades,
+            x=top_competencias.index,
+            y=top_competencias.values,
             title="Top 15 Competências Técnicas",
             labels={'x': 'Competência', 'y': 'Frequência'}
         )
@@ -322,12 +220,15 @@ def exibir_perfil_completo(candidato):
         st.write(f"**Situação:** {candidato.get('situacao_candidado', 'Não informado')}")
         
         st.write("### 🎯 Perfil Extraído")
-        st.write(f"**Experiência:** {candidato.get('experiencia', 'Não informado')}")
-        st.write(f"**Inglês:** {candidato.get('ingles', 'Não informado')}")
-        st.write(f"**Formação:** {candidato.get('formacao', 'Não informado')}")
+        anos = candidato.get('anos_experiencia')
+        ingles = candidato.get('nivel_ingles')
+        formacao = candidato.get('nivel_formacao')
+        st.write(f"**Experiência:** {f'{anos} anos' if pd.notna(anos) else ROTULO_NAO_ESPECIFICADO}")
+        st.write(f"**Inglês:** {ingles if pd.notna(ingles) else ROTULO_NAO_ESPECIFICADO}")
+        st.write(f"**Formação:** {formacao if pd.notna(formacao) else ROTULO_NAO_ESPECIFICADO}")
         
-        # Competências técnicas
-        competencias = candidato.get('competencias', [])
+        # Competências técnicas (máscara de bits gravada no pré-processamento)
+        competencias = nomes_da_mascara(candidato.get('competencias_mascara', 0), carregar_nomes_competencias())
         if competencias:
             st.write("**Competências Técnicas:**")
             for competencia in competencias:
@@ -428,6 +329,7 @@ if 'pagina_contratados' not in st.session_state:
 
 # MAIN EXECUTION
 df_completo = carregar_dados()
+cubo = carregar_agregados() if df_completo is not None else None
 
 if df_completo is not None:
     # Se estiver mostrando perfil individual, exibir e sair
@@ -445,15 +347,20 @@ if df_completo is not None:
         )
         
         if vaga_filtro != 'Todas as Vagas':
-            df_filtrado = df_completo[df_completo['vaga_titulo'] == vaga_filtro].copy()
+            vaga_cubo = vaga_filtro
+            df_filtrado = df_completo[df_completo['vaga_titulo'] == vaga_filtro]
             st.sidebar.info(f"Filtrando por: **{vaga_filtro}**")
         else:
-            df_filtrado = df_completo.copy()
+            vaga_cubo = None
+            df_filtrado = df_completo
             st.sidebar.info("Mostrando **todas as vagas**")
         
+        # Gráficos e métricas: consulta ao cubo, sem reprocessar as linhas
+        resumo = resumir(cubo, vaga_cubo, STATUS_CONTRATACAO)
+        
         # Botão para gerar análise
         if st.button("🚀 Gerar Análise dos Contratados", type="primary"):
-            df_contratados = criar_analise_contratados(df_filtrado)
+            df_contratados = criar_analise_contratados(df_filtrado, cubo, vaga_cubo)
             
             if df_contratados is not None:
                 # Guardar no session state
@@ -461,26 +368,26 @@ if df_completo is not None:
                 st.session_state.pagina_contratados = 1
                 
                 # Exibir todas as seções de análise
-                exibir_metricas_gerais(df_contratados)
+                exibir_metricas_gerais(resumo)
                 st.divider()
                 
                 col_graf1, col_graf2 = st.columns(2)
                 
                 with col_graf1:
-                    exibir_distribuicao_experiencia(df_contratados)
+                    exibir_distribuicao_experiencia(resumo)
                 
                 with col_graf2:
-                    exibir_nivel_ingles(df_contratados)
+                    exibir_nivel_ingles(resumo)
                 
                 st.divider()
                 
                 col_graf3, col_graf4 = st.columns(2)
                 
                 with col_graf3:
-                    exibir_formacao(df_contratados)
+                    exibir_formacao(resumo)
                 
                 with col_graf4:
-                    exibir_competencias_populares(df_contratados)
+                    exibir_competencias_populares(resumo)
                 
                 st.divider()
                 exibir_lista_contratados(df_contratados)
@@ -498,26 +405,26 @@ if df_completo is not None:
                     st.session_state.pagina_contratados = 1
                     st.rerun()
             
-            exibir_metricas_gerais(df_contratados)
+            exibir_metricas_gerais(resumo)
             st.divider()
             
             col_graf1, col_graf2 = st.columns(2)
             
             with col_graf1:
-                exibir_distribuicao_experiencia(df_contratados)
+                exibir_distribuicao_experiencia(resumo)
             
             with col_graf2:
-                exibir_nivel_ingles(df_contratados)
+                exibir_nivel_ingles(resumo)
             
             st.divider()
             
             col_graf3, col_graf4 = st.columns(2)
             
             with col_graf3:
-                exibir_formacao(df_contratados)
+                exibir_formacao(resumo)
             
             with col_graf4:
-                exibir_competencias_populares(df_contratados)
+                exibir_competencias_populares(resumo)
             
             st.divider()
             exibir_lista_contratados(df_contratados)
@@ -527,8 +434,8 @@ if df_completo is not None:
             
             # Mostrar estatísticas rápidas
             st.sidebar.header("📈 Estatísticas Rápidas")
-            total_candidatos = len(df_filtrado)
-            status_counts = df_filtrado['situacao_candidado'].value_counts()
+            status_counts = contagem_por_situacao(cubo, vaga_cubo)
+            total_candidatos = int(status_counts.sum())
             
             st.sidebar.write(f"**Total de candidatos:** {total_candidatos}")
             for status, count in status_counts.head(10).items():
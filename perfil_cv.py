@@ -0,0 +1,137 @@
+# perfil_cv.py
+# Extração do perfil do CV (experiência, inglês e formação) em uma passada por CV, com padrões pré-compilados.
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from compatibilidade import VALOR_NAO_INFORMADO
+
+# CONFIGURAÇÕES
+ROTULO_NAO_ESPECIFICADO = "Não especificado"
+LIMIAR_PARALELO = 20000
+TAMANHO_BLOCO_PARALELO = 5000
+
+# Padrões de experiência em ordem de prioridade: vale o primeiro que casar, com o maior número
+PADROES_EXPERIENCIA = [
+    r'(\d+)\s*anos?\s*(?:de\s*)?experiência',
+    r'experiência\s*de\s*(\d+)\s*anos?',
+    r'(\d+)\s*anos?\s*(?:de\s*)?exp',
+    r'exp\s*de\s*(\d+)\s*anos?',
+    r'(\d+)\s*anos?\s*na\s*área',
+    r'(\d+)\s*anos?\s*em\s*[a-záéíóúâêîôûãõç\s]+',
+]
+
+# Nível -> termos, na ordem em que os níveis são verificados
+TERMOS_INGLES = {
+    'Avançado': ['avançado', 'advanced', 'fluente', 'fluent', 'c2', 'c1'],
+    'Intermediário': ['intermediário', 'intermediate', 'b2', 'b1', 'intermediario'],
+    'Básico': ['básico', 'basic', 'iniciante', 'beginner', 'a2', 'a1', 'basico'],
+    'Nativo': ['nativo', 'native'],
+}
+TERMOS_FORMACAO = {
+    'Doutorado': ['doutorado', 'phd', 'doutor'],
+    'Mestrado': ['mestrado', 'mestre'],
+    'Pós-graduação': ['pós-graduação', 'pos-graduacao', 'especialização', 'especializacao'],
+    'Graduação': ['graduação', 'graduacao', 'bacharelado', 'licenciatura', 'tecnólogo', 'tecnologo'],
+    'Técnico': ['técnico', 'tecnico', 'curso técnico'],
+    'Ensino médio': ['ensino médio', 'ensino medio'],
+}
+
+# Escalas ordinais (do menor para o maior nível)
+TIPO_NIVEL_INGLES = pd.CategoricalDtype(['Básico', 'Intermediário', 'Avançado', 'Nativo'], ordered=True)
+TIPO_NIVEL_FORMACAO = pd.CategoricalDtype(
+    ['Ensino médio', 'Técnico', 'Graduação', 'Pós-graduação', 'Mestrado', 'Doutorado'], ordered=True
+)
+
+
+# Pré-compilados uma única vez; a ordem da lista é a prioridade
+PADROES_EXPERIENCIA_COMPILADOS = [re.compile(padrao) for padrao in PADROES_EXPERIENCIA]
+
+
+def _anos_experiencia(texto):
+    # Todos os padrões exigem "ano(s)": CVs sem o termo dispensam as expressões
+    if 'ano' not in texto:
+        return None
+    for padrao in PADROES_EXPERIENCIA_COMPILADOS:
+        matches = padrao.findall(texto)
+        if matches:
+            return max(int(match) for match in matches)
+    return None
+
+
+def _nivel(texto, termos_por_nivel):
+    # Busca de substring em C com saída no primeiro nível encontrado
+    for nivel, termos in termos_por_nivel.items():
+        for termo in termos:
+            if termo in texto:
+                return nivel
+    return None
+
+
+def extrair_perfil(texto_cv):
+    """(anos de experiência, nível de inglês, nível de formação) de um CV; None quando ausente"""
+    if not isinstance(texto_cv, str) or texto_cv == VALOR_NAO_INFORMADO:
+        return None, None, None
+    texto = texto_cv.lower()
+    return (
+        _anos_experiencia(texto),
+        _nivel(texto, TERMOS_INGLES),
+        _nivel(texto, TERMOS_FORMACAO),
+    )
+
+
+def _extrair_bloco(textos, extrator=None):
+    if extrator is None:
+        return [extrair_perfil(texto) for texto in textos]
+    return [(*extrair_perfil(texto), extrator.mascara(texto)) for texto in textos]
+
+
+def extrair_perfis(textos, n_processos=None, extrator=None):
+    """Perfis de uma coluna inteira de CVs como colunas tipadas.
+
+    Colunas: anos_experiencia (Int16), nivel_ingles e nivel_formacao (categorias
+    ordinais) e, se um ExtratorCompetencias for informado, competencias_mascara
+    (uint64, um bit por competência). Acima de LIMIAR_PARALELO CVs o trabalho é
+    dividido entre processos.
+    """
+    serie = pd.Series(textos)
+    # O mesmo CV aparece em várias candidaturas: extrair cada texto distinto uma vez
+    codigos, unicos = pd.factorize(serie)
+    valores = list(unicos)
+    n_processos = n_processos or os.cpu_count() or 1
+
+    if n_processos > 1 and len(valores) >= LIMIAR_PARALELO:
+        blocos = [valores[i:i + TAMANHO_BLOCO_PARALELO] for i in range(0, len(valores), TAMANHO_BLOCO_PARALELO)]
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            perfis = [perfil for bloco in executor.map(_extrair_bloco, blocos, repeat(extrator)) for perfil in bloco]
+    else:
+        perfis = _extrair_bloco(valores, extrator)
+
+    # Nulos (código -1) apontam para um perfil vazio no fim
+    vazio = (None, None, None) if extrator is None else (None, None, None, 0)
+    colunas = list(zip(*perfis, vazio))
+    limite = np.iinfo(np.int16).max
+    anos = [valor if valor is None else min(valor, limite) for valor in colunas[0]]
+    resultado = pd.DataFrame({
+        'anos_experiencia': pd.array(anos, dtype='Int16')[codigos],
+        'nivel_ingles': pd.Categorical(colunas[1], dtype=TIPO_NIVEL_INGLES)[codigos],
+        'nivel_formacao': pd.Categorical(colunas[2], dtype=TIPO_NIVEL_FORMACAO)[codigos],
+    }, index=serie.index)
+    if extrator is not None:
+        resultado['competencias_mascara'] = np.array(colunas[3], dtype=np.uint64)[codigos]
+    return resultado
+
+
+def rotulos_perfil(perfis):
+    """Rótulos de exibição ('5 anos', 'Avançado', ... ou 'Não especificado')"""
+    anos = perfis['anos_experiencia']
+    experiencia = np.where(anos.isna(), ROTULO_NAO_ESPECIFICADO, anos.astype('string') + ' anos')
+    return pd.DataFrame({
+        'experiencia': experiencia,
+        'ingles': perfis['nivel_ingles'].astype(object).fillna(ROTULO_NAO_ESPECIFICADO),
+        'formacao': perfis['nivel_formacao'].astype(object).fillna(ROTULO_NAO_ESPECIFICADO),
+    }, index=perfis.index)
@@ -1,30 +1,39 @@
 # preprocess.py (Versão Compatível com Streamlit)
-import pandas as pd
-import requests
+import argparse
 import json
 import warnings
 import io
+import pyarrow.parquet as pq
 import streamlit as st
+from streamlit import runtime
+
+from fontes_dados import resolver_fontes, sincronizar_fontes
+from incremental import atualizar_base_incremental, descartar_manifesto
+from ingestao import (
+    PROCESSED_DATA_FILE, TAMANHO_ROW_GROUP, carregar_fontes_em_memoria, criar_base_streaming,
+    escrever_base_streaming, finalizar_base, gravar_base_processada, unificar_registros,
+)
 
 warnings.filterwarnings('ignore', category=FutureWarning)
 
 # =============================================================================
-# CONFIGURAÇÕES DO GOOGLE DRIVE
+# CONFIGURAÇÕES DAS FONTES
 # =============================================================================
-PROSPECTS_URL = "https://drive.google.com/uc?id=1f_NPd0qA0iqqo9Im9FfQi78esPOlf1Bu"
-APPLICANTS_URL = "https://drive.google.com/uc?id=1jgiuRW402WUp-b5w1yE6nHrfR4KjFuzT"
-VAGAS_URL = "https://drive.google.com/uc?id=1hmUUdyuAd9hoM84drSXJrQ8EbvFsPEDb"
+# Google Drive por padrão; defina TALENTMATCH_FONTE_DADOS para usar um diretório
+# local, uma URL file:// ou outro servidor HTTP com os 3 JSONs
+FONTES = resolver_fontes()
 
 # --- CONTROLE DE AMOSTRAGEM PARA TESTES ---
 TAMANHO_AMOSTRA = 5000 
 
+# --- LEITURA EM STREAMING (memória limitada, sem carregar os JSONs inteiros) ---
+MODO_STREAMING = True
+
 @st.cache_data(show_spinner=False, ttl=3600)
-def baixar_json_direto(url):
-    """Baixa JSON diretamente sem salvar arquivo (compatível com Streamlit)"""
+def sincronizar_dados_brutos():
+    """Atualiza o cache local dos JSONs (só transfere o que mudou) e retorna os caminhos"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return sincronizar_fontes(FONTES)
     except Exception as e:
         st.error(f"❌ ERRO ao baixar dados: {e}")
         return None
@@ -34,47 +43,21 @@ def criar_base_de_dados_unificada():
     """Carrega, combina e limpa os 3 arquivos JSON do Google Drive"""
     
     with st.spinner("📥 Baixando dados do Google Drive..."):
-        # Baixar todos os arquivos diretamente
-        prospects_data = baixar_json_direto(PROSPECTS_URL)
-        applicants_data = baixar_json_direto(APPLICANTS_URL)
-        vagas_data = baixar_json_direto(VAGAS_URL)
+        caminhos = sincronizar_dados_brutos()
     
-    if not all([prospects_data, applicants_data, vagas_data]):
+    if caminhos is None:
         st.error("❌ Falha no download de um ou mais arquivos.")
         return None
+    
+    if MODO_STREAMING:
+        with st.spinner("🔄 Processando e combinando candidaturas..."):
+            return criar_base_streaming(caminhos, TAMANHO_AMOSTRA)
 
     with st.spinner("🔄 Processando e combinando candidaturas..."):
-        candidaturas_list = []
-        
-        for vaga_id, data in prospects_data.items():
-            for prospect in data.get('prospects', []):
-                candidato_id = str(prospect.get('codigo'))
-                applicant_details = applicants_data.get(candidato_id, {})
-                vaga_details = vagas_data.get(vaga_id, {})
-                
-                infos_basicas = applicant_details.get('infos_basicas', {})
-                nome_candidato = infos_basicas.get('nome')
-
-                candidaturas_list.append({
-                    'candidato_id': candidato_id,
-                    'vaga_id': vaga_id,
-                    'situacao_candidado': prospect.get('situacao_candidado'),
-                    'candidato_nome': nome_candidato,
-                    'candidato_cv': applicant_details.get('cv_pt'),
-                    'vaga_titulo': vaga_details.get('informacoes_basicas', {}).get('titulo_vaga'),
-                    'vaga_competencias': vaga_details.get('perfil_vaga', {}).get('competencia_tecnicas_e_comportamentais'),
-                })
-                
-        df_final = pd.DataFrame(candidaturas_list)
-        
-        # Aplicar amostragem se necessário
-        if TAMANHO_AMOSTRA and len(df_final) > TAMANHO_AMOSTRA:
-            df_final = df_final.sample(n=TAMANHO_AMOSTRA, random_state=42)
-        
-        # Limpeza final
-        for col in df_final.columns:
-            if df_final[col].dtype == 'object':
-                df_final[col] = df_final[col].fillna('Não informado')
+        prospects_data, applicants_data, vagas_data = carregar_fontes_em_memoria(caminhos)
+        df_final = unificar_registros(prospects_data, applicants_data, vagas_data)
+        # Amostragem (se necessário) e limpeza final
+        df_final = finalizar_base(df_final, TAMANHO_AMOSTRA)
     
     return df_final
 
@@ -124,5 +107,46 @@ def main():
         situacao_counts = df['situacao_candidado'].value_counts()
         st.bar_chart(situacao_counts.head(10))
 
+# =============================================================================
+# LINHA DE COMANDO (sem Streamlit)
+# =============================================================================
+
+def executar_cli(argv=None):
+    """Gera o parquet processado que as páginas do Streamlit leem"""
+    parser = argparse.ArgumentParser(description="Gera o arquivo processado a partir dos JSONs brutos.")
+    parser.add_argument('--saida', default=PROCESSED_DATA_FILE, help="Caminho do parquet gerado")
+    parser.add_argument('--amostra', type=int, default=None, help="Número de candidaturas sorteadas (padrão: base completa)")
+    parser.add_argument('--incremental', action='store_true', help="Recalcula apenas as candidaturas alteradas desde a última execução")
+    parser.add_argument('--row-group', type=int, default=TAMANHO_ROW_GROUP, help="Linhas por row group do parquet")
+    parser.add_argument('--processos', type=int, default=None, help="Processos para extrair o perfil dos CVs (padrão: todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    print("A sincronizar as fontes de dados...")
+    caminhos = sincronizar_fontes(FONTES)
+
+    print(f"A gerar '{args.saida}'...")
+    if args.incremental:
+        try:
+            _, delta = atualizar_base_incremental(caminhos, args.saida, args.row_group, args.processos)
+        except ValueError as erro:
+            parser.error(str(erro))
+        if not delta['completo']:
+            print(f"{len(delta['vaga_id'])} vagas e {len(delta['candidato_id'])} candidatos alterados.")
+    elif args.amostra:
+        # O manifesto descreveria a base anterior, não a regravada aqui
+        descartar_manifesto(args.saida)
+        df = criar_base_streaming(caminhos, args.amostra, preencher_nulos=False)
+        gravar_base_processada(df, args.saida, args.row_group, args.processos, amostra=args.amostra)
+    else:
+        descartar_manifesto(args.saida)
+        escrever_base_streaming(caminhos, args.saida, tamanho_row_group=args.row_group, n_processos=args.processos)
+
+    total = pq.ParquetFile(args.saida).metadata.num_rows
+    print(f"\n✅ '{args.saida}' gravado com {total} candidaturas.")
+
 if __name__ == "__main__":
-    main()
+    # `streamlit run preprocess.py` abre a página; `python preprocess.py` gera o parquet
+    if runtime.exists():
+        main()
+    else:
+        executar_cli()
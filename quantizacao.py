@@ -0,0 +1,61 @@
+# quantizacao.py
+# Armazenamento compacto dos embeddings (float16 ou int8 com escala por vetor) e pontuação direto sobre os códigos.
+import numpy as np
+
+# CONFIGURAÇÕES
+TIPOS_QUANTIZACAO = ["float32", "float16", "int8"]
+BLOCO_PONTUACAO = 4096
+FATOR_RESCORE = 4
+
+
+def quantizar(vetores, tipo):
+    """(códigos, escalas) dos vetores: int8 usa uma escala por vetor (máximo absoluto / 127).
+
+    float32 e float16 não têm escala (None).
+    """
+    vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+    if tipo == "float32":
+        return vetores, None
+    if tipo == "float16":
+        return vetores.astype(np.float16), None
+    if tipo == "int8":
+        escalas = np.abs(vetores).max(axis=1) / 127
+        escalas[escalas == 0] = 1.0
+        codigos = np.rint(vetores / escalas[:, None]).astype(np.int8)
+        return codigos, escalas.astype(np.float32)
+    raise ValueError(f"Quantização desconhecida: {tipo} (use {', '.join(TIPOS_QUANTIZACAO)}).")
+
+
+def pontuar(codigos, escalas, vetor_consulta, posicoes=None, bloco=BLOCO_PONTUACAO):
+    """Produto interno da consulta com os vetores quantizados (todos ou só `posicoes`).
+
+    Cada bloco de códigos é convertido para float32 e multiplicado pela consulta,
+    então só um bloco existe em float32 por vez; a escala do int8 é aplicada
+    depois, sobre os scores.
+    """
+    vetor_consulta = np.asarray(vetor_consulta, dtype=np.float32)
+    n = len(codigos) if posicoes is None else len(posicoes)
+    scores = np.empty(n, dtype=np.float32)
+    for inicio in range(0, n, bloco):
+        fatia = slice(inicio, min(inicio + bloco, n))
+        trecho = codigos[fatia] if posicoes is None else codigos[posicoes[fatia]]
+        scores[fatia] = trecho.astype(np.float32, copy=False) @ vetor_consulta
+    if escalas is not None:
+        scores *= escalas if posicoes is None else escalas[posicoes]
+    return scores
+
+
+def top_k(scores, k):
+    """Posições dos k maiores scores, em ordem decrescente"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    melhores = np.argpartition(-scores, k - 1)[:k]
+    return melhores[np.argsort(-scores[melhores], kind="stable")]
+
+
+def reordenar_exato(candidatos, vetores_exatos, vetor_consulta, k):
+    """Reordena os candidatos aproximados pelo produto interno em float32; retorna (posições, scores)"""
+    exatos = np.asarray(vetores_exatos, dtype=np.float32) @ np.asarray(vetor_consulta, dtype=np.float32)
+    melhores = top_k(exatos, k)
+    return candidatos[melhores], exatos[melhores]
@@ -1,71 +1,104 @@
 # train_model.py (Versão Final Verificada)
-import pandas as pd
+import sys
 import numpy as np
 import lightgbm as lgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, accuracy_score
-from sentence_transformers import SentenceTransformer
-import joblib
 import warnings
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from cache_embeddings import CacheEmbeddings, identificador_encoder
+from codificacao_paralela import codificar_em_processos
+from encoders import criar_encoder
+from features import DIRETORIO_FEATURES, carregar_features, gravar_features, impressao_base, textos_features
+from inferencia import META_FILE, MODEL_FILE, salvar_modelo
+from ingestao import PROCESSED_DATA_FILE, ler_base_processada
+
 warnings.filterwarnings('ignore', category=FutureWarning)
 
 # CONFIGURAÇÕES
-PROCESSED_DATA_FILE = "dados_processados.parquet"
-MODEL_OUTPUT_FILE = "modelo_contratacao.pkl"
-COLUMNS_OUTPUT_FILE = "model_columns.pkl"
 RANDOM_STATE = 42
+# Mesmo número de árvores do padrão do LGBMClassifier
+NUM_BOOST_ROUND = 100
+BLOCO_PREDICAO = 8192
 
 def prepare_data_for_modeling(file_path):
-    print(f"A carregar dados de '{file_path}'...")
-    df = pd.read_parquet(file_path)
-    df = df[df['sucesso'].isin([0, 1])] # Garantir que o alvo é binário
-    y = df['sucesso'].astype(int)
+    """(X float32 mapeado do disco, y int8, nomes das colunas), sem cópias da matriz"""
+    # A matriz de features fica em disco (features.py) e só é refeita quando a base ou o encoder mudam
+    impressao = impressao_base(file_path)
+    features = carregar_features(impressao)
+    if features is None:
+        print(f"A carregar dados de '{file_path}'...")
+        df = ler_base_processada(file_path)
+        # Primeira codificação em massa: um encoder por núcleo, com checkpoint no cache
+        cache = CacheEmbeddings()
+        codificar_em_processos(textos_features(df), cache)
+        print("A gerar a matriz de features (embeddings via cache + colunas numéricas)...")
+        model_st = criar_encoder()
+        gravar_features(df, model_st, cache, impressao)
+        features = carregar_features(impressao)
+    else:
+        print(f"A usar a matriz de features em cache de '{DIRETORIO_FEATURES}'...")
+    return features
 
-    print("A gerar embeddings de texto para usar como features...")
-    model_st = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model_st.encode(df["texto_completo"].tolist(), show_progress_bar=True)
-    
-    # Substituir 'Não informado' por 0 e converter para numérico
-    numeric_cols = ['anos_experiencia', 'pretensao_salarial', 'candidato_nivel_ingles_num', 'candidato_nivel_academico_num']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    features_numericas = df[numeric_cols]
-    
-    X = np.concatenate([embeddings, features_numericas.values], axis=1)
-    
-    embedding_cols = [f'embed_{i}' for i in range(embeddings.shape[1])]
-    all_cols = embedding_cols + numeric_cols
-    
-    return pd.DataFrame(X, columns=all_cols), y
+def indices_treino_teste(y):
+    """Divide as posições das linhas (não a matriz): treino e teste estratificados, em ordem crescente"""
+    posicoes = np.arange(len(y))
+    treino, teste = train_test_split(posicoes, test_size=0.25, random_state=RANDOM_STATE, stratify=y)
+    # Posições ordenadas = leitura sequencial do memmap
+    return np.sort(treino), np.sort(teste)
+
+def prever_em_blocos(model, X, posicoes, bloco=BLOCO_PREDICAO):
+    """Probabilidades das linhas indicadas, copiando só um bloco da matriz por vez"""
+    return np.concatenate([model.predict(X[posicoes[i:i + bloco]]) for i in range(0, len(posicoes), bloco)])
 
-def train_and_evaluate_model(X, y):
+def pico_memoria_mb():
+    """Pico de memória residente do processo (None onde o módulo resource não existe, ex.: Windows)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+def train_and_evaluate_model(X, y, colunas):
     print("A dividir dados e a treinar o modelo...")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=RANDOM_STATE, stratify=y)
-    
-    if len(y_train.value_counts()) < 2:
+    treino, teste = indices_treino_teste(y)
+    y_train, y_test = y[treino], y[teste]
+
+    if len(np.unique(y_train)) < 2:
         raise ValueError("Apenas uma classe presente nos dados de treino. Não é possível treinar o modelo.")
-        
-    scale_pos_weight = y_train.value_counts().get(0, 0) / y_train.value_counts().get(1, 1) if y_train.value_counts().get(1, 0) > 0 else 1
-    
-    model = lgb.LGBMClassifier(objective='binary', random_state=RANDOM_STATE, scale_pos_weight=scale_pos_weight)
-    model.fit(X_train, y_train)
+
+    positivos = np.count_nonzero(y_train == 1)
+    scale_pos_weight = float(len(y_train) - positivos) / positivos if positivos > 0 else 1.0
+
+    # Única cópia da matriz: as linhas de treino em float32, já com os nomes das colunas
+    dataset = lgb.Dataset(X[treino], label=y_train, feature_name=colunas, free_raw_data=True)
+    params = {'objective': 'binary', 'seed': RANDOM_STATE, 'scale_pos_weight': scale_pos_weight, 'verbose': -1}
+    model = lgb.train(params, dataset, num_boost_round=NUM_BOOST_ROUND)
+    del dataset
 
     print("\n--- Avaliação do Modelo ---")
-    auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
-    accuracy = accuracy_score(y_test, model.predict(X_test))
+    probabilidades = prever_em_blocos(model, X, teste)
+    auc = roc_auc_score(y_test, probabilidades)
+    accuracy = accuracy_score(y_test, probabilidades >= 0.5)
     print(f"AUC Score (Teste): {auc:.4f}")
     print(f"Acurácia (Teste): {accuracy:.4f}")
     print("--------------------------\n")
     return model
 
 def main():
-    X, y = prepare_data_for_modeling(PROCESSED_DATA_FILE)
-    trained_model = train_and_evaluate_model(X, y)
+    X, y, colunas = prepare_data_for_modeling(PROCESSED_DATA_FILE)
+    trained_model = train_and_evaluate_model(X, y, colunas)
     
-    print("A salvar modelo e colunas...")
-    joblib.dump(trained_model, MODEL_OUTPUT_FILE)
-    joblib.dump(X.columns.tolist(), COLUMNS_OUTPUT_FILE)
+    print(f"A salvar modelo em '{MODEL_FILE}' e versão/colunas das features em '{META_FILE}'...")
+    salvar_modelo(trained_model, colunas, identificador_encoder())
+    pico = pico_memoria_mb()
+    if pico is not None:
+        print(f"Pico de memória do treino: {pico:.0f} MB")
     print("\n✅ Treino concluído e modelo salvo com sucesso!")
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# worker_analise.py
+# Análises em segundo plano: tarefas com id, progresso, cancelamento e resultados parciais, compartilhadas entre sessões.
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from compatibilidade import calcular_compatibilidade_lote
+from inferencia import probabilidade_contratacao
+
+# CONFIGURAÇÕES
+MAX_ANALISES_SIMULTANEAS = 2
+BLOCO_ANALISE = 512
+# Segundos que uma tarefa encerrada continua disponível para as sessões buscarem o resultado
+TEMPO_RETENCAO = 600
+ESTADOS_ATIVOS = ("pendente", "executando")
+
+
+class AnaliseCancelada(Exception):
+    """Interrompe a função da tarefa quando nenhuma sessão espera mais pelo resultado"""
+
+
+class Tarefa:
+    """Estado de uma análise, lido pelas sessões enquanto uma thread do pool a executa"""
+
+    def __init__(self, chave, total):
+        self.id = uuid.uuid4().hex
+        self.chave = chave
+        self.total = total
+        self.concluidos = 0
+        self.estado = "pendente"
+        self.parcial = None
+        self.resultado = None
+        self.erro = None
+        self.assinantes = 1
+        self.encerrada_em = None
+        self._cancelamento = threading.Event()
+
+    @property
+    def ativa(self):
+        return self.estado in ESTADOS_ATIVOS
+
+    @property
+    def progresso(self):
+        return min(1.0, self.concluidos / self.total) if self.total else 0.0
+
+    def verificar_cancelamento(self):
+        if self._cancelamento.is_set():
+            raise AnaliseCancelada()
+
+    def avancar(self, quantidade, parcial=None):
+        """Registra o avanço e publica o resultado parcial (se houver)"""
+        if parcial is not None:
+            self.parcial = parcial
+        self.concluidos += quantidade
+
+
+class PoolAnalises:
+    """Pool de threads do processo do Streamlit, compartilhado por todas as sessões.
+
+    Pedidos idênticos (mesma chave) enquanto uma análise está em andamento
+    recebem a mesma tarefa; ela só é cancelada quando todas as sessões que a
+    pediram desistem.
+    """
+
+    def __init__(self, max_workers=MAX_ANALISES_SIMULTANEAS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analise")
+        self._lock = threading.Lock()
+        self._tarefas = {}
+        self._em_andamento = {}
+
+    def submeter(self, chave, total, funcao, *args):
+        """Agenda funcao(tarefa, *args) e retorna a tarefa (ou a já em andamento para a mesma chave)"""
+        with self._lock:
+            self._remover_expiradas()
+            tarefa = self._em_andamento.get(chave)
+            if tarefa is not None:
+                tarefa.assinantes += 1
+                return tarefa
+            tarefa = Tarefa(chave, total)
+            self._tarefas[tarefa.id] = tarefa
+            self._em_andamento[chave] = tarefa
+        self._executor.submit(self._executar, tarefa, funcao, args)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args):
+        try:
+            tarefa.verificar_cancelamento()
+            tarefa.estado = "executando"
+            tarefa.resultado = funcao(tarefa, *args)
+            tarefa.estado = "concluida"
+        except AnaliseCancelada:
+            tarefa.estado = "cancelada"
+        except Exception as erro:
+            tarefa.erro = str(erro)
+            tarefa.estado = "erro"
+        finally:
+            tarefa.encerrada_em = time.monotonic()
+            self._liberar_chave(tarefa)
+
+    def _liberar_chave(self, tarefa):
+        with self._lock:
+            if self._em_andamento.get(tarefa.chave) is tarefa:
+                del self._em_andamento[tarefa.chave]
+
+    def _remover_expiradas(self):
+        limite = time.monotonic() - TEMPO_RETENCAO
+        for id_tarefa in [i for i, t in self._tarefas.items() if t.encerrada_em is not None and t.encerrada_em < limite]:
+            del self._tarefas[id_tarefa]
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def cancelar(self, id_tarefa):
+        """Retira uma sessão da tarefa; sem nenhuma, a análise para no próximo bloco"""
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is None or not tarefa.ativa:
+                return
+            tarefa.assinantes -= 1
+            if tarefa.assinantes > 0:
+                return
+            tarefa._cancelamento.set()
+            # Um novo pedido igual não deve reaproveitar a tarefa cancelada
+            if self._em_andamento.get(tarefa.chave) is tarefa:
+                del self._em_andamento[tarefa.chave]
+
+
+def _ordenar_resultado(df, compatibilidade, probabilidade):
+    resultado = df.copy()
+    resultado['compatibilidade'] = compatibilidade[:len(df)]
+    if probabilidade is not None:
+        resultado['probabilidade_contratacao'] = probabilidade[:len(df)]
+    return resultado.sort_values('compatibilidade', ascending=False)
+
+
+def analisar_candidatos(tarefa, df_vaga, texto_vaga, encoder, cache, modelo=None, bloco=BLOCO_ANALISE):
+    """Compatibilidade (e probabilidade de contratação) dos candidatos de uma vaga, bloco a bloco.
+
+    Depois de cada bloco o progresso avança e os candidatos já pontuados são
+    publicados, ordenados, como resultado parcial.
+    """
+    compatibilidade = np.zeros(len(df_vaga), dtype=np.float32)
+    probabilidade = np.zeros(len(df_vaga), dtype=np.float32) if modelo is not None else None
+    for inicio in range(0, len(df_vaga), bloco):
+        tarefa.verificar_cancelamento()
+        trecho = df_vaga.iloc[inicio:inicio + bloco]
+        fim = inicio + len(trecho)
+        compatibilidade[inicio:fim] = calcular_compatibilidade_lote(encoder, cache, texto_vaga, trecho['candidato_cv'])
+        if modelo is not None:
+            probabilidade[inicio:fim] = probabilidade_contratacao(modelo, encoder, cache, trecho)
+        tarefa.avancar(len(trecho), _ordenar_resultado(df_vaga.iloc[:fim], compatibilidade, probabilidade))
+    return _ordenar_resultado(df_vaga, compatibilidade, probabilidade)